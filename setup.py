@@ -1,7 +1,15 @@
-from setuptools import setup
+from setuptools import Extension, setup
 
-from Cython.Build import cythonize
+try:
+    from Cython.Build import cythonize
+except ImportError:  # guardian.kernels falls back to pure Python
+    ext_modules = []
+else:
+    ext_modules = cythonize([
+        # a failed compile (e.g. no C compiler) must not fail the install
+        Extension("guardian.cy", ["src/guardian/cy.pyx"], optional=True),
+    ])
 
 setup(
-    ext_modules=cythonize("src/guardian/cy.pyx"),
-)
\ No newline at end of file
+    ext_modules=ext_modules,
+)
@@ -0,0 +1,263 @@
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+import heapq
+import itertools
+import os
+
+from guardian.connectivity import (
+    GITLINK_MODE,
+    TREE_MODE,
+    object_references,
+    parse_tree,
+)
+
+from guardian.object_database import ObjectDatabase
+from guardian.object_scanner import (
+    OFS_DELTA,
+    REF_DELTA,
+    TYPE_IDS,
+    TYPE_MAP,
+    PackReader,
+    read_loose_header,
+)
+from guardian.scan_cache import loose_sha
+
+PERCENTILES = (50, 90, 99)
+
+
+class TypeCensus:
+    """Counts and sizes of the objects of one type"""
+
+    def __init__(self):
+        self.sizes = array("Q")
+        self.compressed = 0
+        self.deltas = 0
+
+    def add(self, size: int, compressed: int, is_delta: bool = False) -> None:
+        self.sizes.append(size)
+        self.compressed += compressed
+        self.deltas += is_delta
+
+    def summary(self) -> Dict[str, int]:
+        sizes = sorted(self.sizes)
+        result = {
+            "count": len(sizes),
+            "size": sum(sizes),
+            "compressed": self.compressed,
+            "deltas": self.deltas,
+            "max": sizes[-1] if sizes else 0,
+        }
+        for percentile in PERCENTILES:
+            result[f"p{percentile}"] = _percentile(sizes, percentile)
+        return result
+
+
+def _percentile(sorted_sizes: List[int], percentile: int) -> int:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_sizes:
+        return 0
+    rank = -(-percentile * len(sorted_sizes) // 100)
+    return sorted_sizes[max(rank, 1) - 1]
+
+
+# (binary sha, type id, object size, bytes on disk, stored as a delta)
+Entry = Tuple[bytes, int, int, int, bool]
+
+
+def iter_pack_entries(pack: PackReader) -> Iterator[Entry]:
+    """
+    Yield every object of a pack reading entry headers only.
+
+    Compressed sizes are the distance to the next entry in pack order;
+    for deltas the object size comes from the first bytes of the delta.
+    """
+    index = pack.index
+    positions = pack.pack_order()
+    offsets = [index.offset_at(position) for position in positions]
+    offsets.append(len(pack) - 20)
+    delta_types: Dict[int, int] = {}
+    pack.advise(sequential=True)
+    try:
+        for i, position in enumerate(positions):
+            offset = offsets[i]
+            try:
+                entry_type, _, _ = pack.read_header(offset)
+                type_id, size = pack.object_info(offset, delta_types)
+            except Exception as e:
+                print(f"Error! reading header at offset {offset}: {e}")
+                continue
+            yield index.sha_at(position), type_id, size, \
+                offsets[i + 1] - offset, entry_type in (OFS_DELTA, REF_DELTA)
+    finally:
+        pack.advise(sequential=False)
+
+
+def iter_loose_entries(loose_paths: Iterable[Path]) -> Iterator[Entry]:
+    """Yield loose objects inflating only their headers"""
+    for path in loose_paths:
+        try:
+            obj_type, size = read_loose_header(path)
+            compressed = os.path.getsize(path)
+        except (ValueError, OSError) as e:
+            print(f"Error! reading header of {path}: {e}")
+            continue
+        yield loose_sha(path), TYPE_IDS[obj_type], size, compressed, False
+
+
+def iter_packed_entries(odb: ObjectDatabase) -> Iterator[Entry]:
+    """
+    Header-only entries of every pack of odb. Packs that can't be read
+    (no idx, not a pack) are reported and skipped.
+    """
+    for pack_path in odb.pack_paths:
+        try:
+            yield from iter_pack_entries(odb.reader(pack_path))
+        except Exception as e:
+            print(f"Error reading packfile {pack_path}: {e}")
+
+
+def iter_entries(odb: ObjectDatabase) -> Iterator[Entry]:
+    """Header-only entries of every loose and packed object of odb"""
+    yield from iter_loose_entries(odb.loose_objects())
+    yield from iter_packed_entries(odb)
+
+
+def object_census(odb: ObjectDatabase) -> Dict[str, Dict[str, int]]:
+    """
+    Count the objects of a repository by type without inflating bodies.
+
+    Args:
+        odb: Open ObjectDatabase of the repository
+
+    Returns:
+        dict of type name to its summary: count, size (inflated bytes),
+        compressed (bytes on disk), deltas, max and p50/p90/p99 sizes
+    """
+    census = {name: TypeCensus() for name in TYPE_IDS}
+    for _, type_id, size, compressed, is_delta in iter_entries(odb):
+        census[TYPE_MAP[type_id]].add(size, compressed, is_delta)
+    return {name: type_census.summary() for name, type_census in census.items()}
+
+
+def _push_bounded(heap: list, limit: int, item: tuple) -> None:
+    if len(heap) < limit:
+        heapq.heappush(heap, item)
+    elif item > heap[0]:
+        heapq.heapreplace(heap, item)
+
+
+def largest_objects(
+    odb: ObjectDatabase, limit: int
+) -> Dict[str, object]:
+    """
+    The largest objects of a repository, found from headers and offset
+    gaps alone, keeping only the top entries in bounded heaps.
+
+    Args:
+        odb: Open ObjectDatabase of the repository
+        limit: How many objects to list for each ranking
+
+    Returns:
+        dict with by_disk and by_size (lists of dicts with sha, type,
+        size, disk and delta, largest first) and storage: count and disk
+        bytes of the objects stored as deltas, in full in packs, and loose
+    """
+    by_disk: list = []
+    by_size: list = []
+    storage = {
+        kind: {"count": 0, "disk": 0} for kind in ("delta", "full", "loose")
+    }
+    loose_entries = (
+        ("loose", entry) for entry in iter_loose_entries(odb.loose_objects())
+    )
+    pack_entries = (
+        ("delta" if entry[4] else "full", entry)
+        for entry in iter_packed_entries(odb)
+    )
+    for kind, entry in itertools.chain(loose_entries, pack_entries):
+        binsha, _, size, compressed, _ = entry
+        storage[kind]["count"] += 1
+        storage[kind]["disk"] += compressed
+        if limit > 0:
+            _push_bounded(by_disk, limit, (compressed, binsha, entry))
+            _push_bounded(by_size, limit, (size, binsha, entry))
+
+    def ranked(heap: list) -> List[Dict[str, object]]:
+        return [
+            {
+                "sha": binsha.hex(), "type": TYPE_MAP[type_id], "size": size,
+                "disk": compressed, "delta": is_delta,
+            }
+            for _, _, (binsha, type_id, size, compressed, is_delta)
+            in sorted(heap, reverse=True)
+        ]
+
+    return {
+        "by_disk": ranked(by_disk),
+        "by_size": ranked(by_size),
+        "storage": storage,
+    }
+
+
+def object_paths(
+    odb: ObjectDatabase, wanted: Set[bytes], tips: Iterable[str]
+) -> Dict[bytes, str]:
+    """
+    Attribute objects to a path by walking the trees of the commits
+    reachable from tips, stopping once every wanted object is named.
+    Each tree is read once; an object under several paths gets the
+    first one met. Trees are named with a trailing slash.
+
+    Args:
+        odb: Open ObjectDatabase of the repository
+        wanted: Binary SHAs of the objects to name
+        tips: SHAs of the commits (or tags) to start from
+
+    Returns:
+        dict of binary SHA to path for the wanted objects found
+    """
+    paths: Dict[bytes, str] = {}
+    seen: Set[bytes] = set()
+    pending = [bytes.fromhex(sha) for sha in tips]
+    trees: List[Tuple[bytes, str]] = []
+    while (pending or trees) and len(paths) < len(wanted):
+        if trees:
+            binsha, path = trees.pop()
+        else:
+            binsha, path = pending.pop(), None
+        if binsha in seen:
+            continue
+        seen.add(binsha)
+        if binsha in wanted and path is not None:
+            paths.setdefault(binsha, path or "/")
+        try:
+            obj = odb.read_object(binsha)
+        except (ValueError, KeyError) as e:
+            print(f"Error! reading obj {binsha.hex()}: {e}")
+            continue
+        if path is None and obj.obj_type != "tree":
+            try:
+                refs = object_references(obj.obj_type, obj.content)
+            except (ValueError, KeyError, IndexError) as e:
+                print(f"Error! reading obj {binsha.hex()}: {e}")
+                continue
+            for ref, ref_type in refs:
+                if ref_type == "tree":
+                    trees.append((ref, ""))
+                elif ref_type in ("commit", "tag"):
+                    pending.append(ref)
+            continue
+        prefix = path or ""
+        try:
+            entries = list(parse_tree(obj.content))
+        except ValueError as e:
+            print(f"Error! reading tree {binsha.hex()}: {e}")
+            continue
+        for mode, name, entry_sha in entries:
+            entry_path = prefix + name.decode("utf-8", "replace")
+            if mode == TREE_MODE:
+                trees.append((entry_sha, entry_path + "/"))
+            elif mode != GITLINK_MODE and entry_sha in wanted:
+                paths.setdefault(entry_sha, entry_path)
+    return paths
@@ -1,10 +1,21 @@
 import typer
 import click
 from pathlib import Path
+from contextlib import nullcontext
+from typing import Annotated, ContextManager, Dict, List, Optional
 import networkx as nx
 
-from guardian.object_scanner import read_loose, read_packfile
-from guardian.utils import get_git_dir, find_loose_object_dirs, find_packfiles
+from guardian.census import largest_objects, object_census, object_paths
+from guardian.commit_graph import write_commit_graph
+from guardian.connectivity import check_connectivity, connectivity_tips
+from guardian.delta_chains import DEFAULT_MAX_DEPTH, analyze_delta_chains
+from guardian.index_pack import index_is_usable, index_pack
+from guardian.integrity import verify_pack_fast
+from guardian.object_database import ObjectDatabase
+from guardian.object_scanner import TYPE_MAP, scan_loose_objects, iter_packfile
+from guardian.pipeline import verify_loose_objects, verify_pack_objects
+from guardian.scan_cache import ScanCache
+from guardian.utils import find_packfiles, get_git_dir
 
 from guardian.dag_builder import (
     build_dag_from_git_commits,
@@ -36,51 +47,281 @@ from guardian.merge import (
 app = typer.Typer()
 
 
+NO_CACHE_OPTION = typer.Option(
+    "--no-cache", help="Ignore and don't update .git/guardian/scan-cache.sqlite"
+)
+
+
+def _scan_cache(
+    git_repo_path: Path, no_cache: bool
+) -> ContextManager[Optional[ScanCache]]:
+    cache = None if no_cache else ScanCache.open(git_repo_path)
+    return cache if cache is not None else nullcontext()
+
+
 @app.command()
-def scan(repo_path: str):
+def scan(
+    repo_path: str,
+    verify: Annotated[Optional[str], typer.Option(
+        "--verify",
+        click_type=click.Choice(["fast", "sha"]),
+        help="fast: check packs against idx CRC32s and checksums "
+        "instead of inflating every object; sha: inflate and SHA-1 "
+        "verify every object, reading and hashing in parallel",
+    )] = None,
+    no_cache: Annotated[bool, NO_CACHE_OPTION] = False,
+    cached_verify: Annotated[bool, typer.Option(
+        "--cached-verify",
+        help="With --verify fast, reuse the results of packs whose size "
+        "and mtime haven't changed instead of reading them again",
+    )] = False,
+    jobs: Annotated[Optional[int], typer.Option(
+        "--jobs", "-j",
+        help="Workers per pack: processes over contiguous offset ranges "
+        "when scanning, inflating threads with --verify sha",
+    )] = None,
+    summary: Annotated[bool, typer.Option(
+        "--summary",
+        help="Only print counts and sizes per type, read from object headers",
+    )] = False,
+    top: Annotated[Optional[int], typer.Option(
+        "--top", min=1,
+        help="Only list the N largest objects on disk and inflated",
+    )] = None,
+):
     """
     Scan a Git repository for loose objects and packfiles.
     Prints the type, SHA, and size of each object found.
+    With --verify fast packs are only checked for corruption, at disk
+    speed, and the exit code is 1 when any pack is damaged. Every pack
+    is read again unless --cached-verify is given: the cache only notices
+    packs that were replaced, not bits that rotted in place.
+    With --verify sha every object is inflated and its SHA-1 checked,
+    bypassing the cache; the exit code is 1 when any object fails.
+    Results for packs and unchanged loose objects are cached, so re-runs
+    only read what's new.
+    With --summary no object body is inflated: counts, sizes and
+    compressed sizes per type come from the object headers.
+    With --top N the largest objects are listed instead, with the path
+    they appear under when a commit reaches them. --summary, --top and
+    --verify are separate modes and can't be combined.
     """
+    if sum((summary, top is not None, verify is not None)) > 1:
+        typer.echo("--summary, --top and --verify can't be combined")
+        raise typer.Exit(code=2)
     repo_path = Path(repo_path)
     git_repo_path = get_git_dir(repo_path)
     if not git_repo_path:
         typer.echo(f"Path {repo_path} is not a git repository!")
         raise typer.Exit(code=2)
-    loose_dirs = find_loose_object_dirs(git_repo_path)
-    pack_dirs = find_packfiles(git_repo_path)
-    typer.secho(
-        f"Tenemos {len(loose_dirs)} loose objects y {len(pack_dirs)} packs",
-        fg=typer.colors.BLUE,
-        bold=True,
-    )
-    if loose_dirs:
-        try:
-            for obj_dir in loose_dirs:
-                obj = read_loose(obj_dir)
+    with ObjectDatabase.open(git_repo_path) as odb, \
+            _scan_cache(git_repo_path, no_cache) as cache:
+        loose_objects = odb.loose_objects()
+        pack_dirs = odb.pack_paths
+        typer.secho(
+            f"Tenemos {len(loose_objects)} loose objects y {len(pack_dirs)} packs",
+            fg=typer.colors.BLUE,
+            bold=True,
+        )
+        if summary:
+            _print_census(object_census(odb))
+            return
+        if top:
+            _print_largest(odb, git_repo_path, top)
+            return
+        if verify == "sha":
+            if not _verify_objects(odb, loose_objects, pack_dirs, jobs):
+                raise typer.Exit(code=1)
+            return
+        if loose_objects:
+            known, new = cache.split_loose(loose_objects) if cache \
+                else ([], loose_objects)
+            for path, type_id, size in known:
                 typer.secho(
-                    f"o: t={obj.obj_type}, sha={obj.sha}, size={obj.size}",
+                    f"o: t={TYPE_MAP[type_id]}, sha={path.parent.name}{path.name}, "
+                    f"size={size}",
                     fg=typer.colors.BRIGHT_RED,
                     bold=True,
                 )
-        except Exception as e:
-            typer.echo(f"err en obj loose: {e}")
-    if pack_dirs:
-        try:
-            for pack_dir in pack_dirs:
-                pack = read_packfile(pack_dir)
-                for obj in pack:
+            scanned = []
+            try:
+                for path, obj in zip(
+                    new, scan_loose_objects(new, skip_errors=False)
+                ):
                     typer.secho(
-                        f"p: t={obj.obj_type}, sha={obj.sha}, size={obj.size}",
-                        fg=typer.colors.YELLOW,
+                        f"o: t={obj.obj_type}, sha={obj.sha}, size={obj.size}",
+                        fg=typer.colors.BRIGHT_RED,
                         bold=True,
                     )
+                    scanned.append((path, obj.type_id, obj.size))
+            except Exception as e:
+                typer.echo(f"err en obj loose: {e}")
+            if cache:
+                cache.store_loose_objects(scanned)
+                cache.prune_loose(loose_objects)
+        if cache:
+            cache.prune_packs(pack_dirs)
+        if pack_dirs and verify == "fast":
+            corrupt = False
+            for pack_dir in pack_dirs:
+                problems = None
+                if cache and cached_verify:
+                    problems = cache.pack_problems(pack_dir)
+                label = " (cached)" if problems is not None else ""
+                if problems is None:
+                    try:
+                        problems = verify_pack_fast(
+                            pack_dir, odb.reader(pack_dir).index
+                        )
+                    except Exception as e:
+                        problems = [str(e)]
+                    if cache:
+                        cache.store_pack_problems(pack_dir, problems)
+                for problem in problems:
+                    typer.secho(
+                        f"{pack_dir.name}: {problem}{label}", fg=typer.colors.RED
+                    )
+                if not problems:
+                    typer.secho(f"{pack_dir.name}: ok{label}", fg=typer.colors.GREEN)
+                corrupt = corrupt or bool(problems)
+            if corrupt:
+                raise typer.Exit(code=1)
+        elif pack_dirs:
+            try:
+                for pack_dir in pack_dirs:
+                    _scan_pack(odb, cache, pack_dir, jobs)
+            except Exception as e:
+                typer.echo(f"err     packfile: {e}")
+
+
+def _print_census(census: Dict[str, Dict[str, int]]) -> None:
+    columns = ["count", "size", "compressed", "deltas", "p50", "p90", "p99", "max"]
+    typer.secho(
+        f"{'type':<8}" + "".join(f"{column:>14}" for column in columns),
+        bold=True,
+    )
+    totals = dict.fromkeys(["count", "size", "compressed", "deltas"], 0)
+    for obj_type, row in census.items():
+        typer.echo(
+            f"{obj_type:<8}" + "".join(f"{row[column]:>14}" for column in columns)
+        )
+        for column in totals:
+            totals[column] += row[column]
+    typer.secho(
+        f"{'total':<8}" + "".join(
+            f"{totals.get(column, ''):>14}" for column in columns
+        ).rstrip(),
+        bold=True,
+    )
+
+
+def _print_largest(odb: ObjectDatabase, git_dir: Path, limit: int) -> None:
+    report = largest_objects(odb, limit)
+    wanted = {
+        bytes.fromhex(row["sha"])
+        for ranking in ("by_disk", "by_size") for row in report[ranking]
+        if row["type"] in ("blob", "tree")
+    }
+    paths = object_paths(odb, wanted, connectivity_tips(git_dir).values())
+    for ranking, title in (("by_disk", "on disk"), ("by_size", "inflated")):
+        typer.secho(f"Largest {len(report[ranking])} objects {title}:", bold=True)
+        for row in report[ranking]:
+            stored = "delta" if row["delta"] else "full"
+            path = paths.get(bytes.fromhex(row["sha"]), "")
+            typer.echo(
+                f"{row['sha']} {row['type']:<6} {row['disk']:>12} "
+                f"{row['size']:>12} {stored:<5} {path}".rstrip()
+            )
+    for kind, totals in report["storage"].items():
+        typer.echo(f"{kind}: {totals['count']} objects, {totals['disk']} bytes")
+
+
+def _verify_objects(
+    odb: ObjectDatabase,
+    loose_objects: List[Path],
+    pack_dirs: List[Path],
+    jobs: Optional[int],
+) -> bool:
+    """Print every object that verifies; False when any one didn't"""
+    verified = 0
+    for obj in verify_loose_objects(loose_objects, jobs):
+        typer.secho(
+            f"o: t={obj.obj_type}, sha={obj.sha}, size={obj.size}",
+            fg=typer.colors.BRIGHT_RED,
+            bold=True,
+        )
+        verified += 1
+    ok = verified == len(loose_objects)
+    for pack_dir in pack_dirs:
+        try:
+            pack = odb.reader(pack_dir)
         except Exception as e:
             typer.echo(f"err     packfile: {e}")
+            ok = False
+            continue
+        verified = 0
+        for obj in verify_pack_objects(pack, jobs):
+            typer.secho(
+                f"p: t={obj.obj_type}, sha={obj.sha}, size={obj.size}",
+                fg=typer.colors.YELLOW,
+                bold=True,
+            )
+            verified += 1
+        # objects of a pack that can't be read at all count as failed too
+        if verified != pack.object_count:
+            typer.secho(
+                f"{pack_dir.name}: {pack.object_count - verified} objects "
+                "failed verification",
+                fg=typer.colors.RED,
+            )
+            ok = False
+    return ok
+
+
+def _scan_pack(
+    odb: ObjectDatabase,
+    cache: Optional[ScanCache],
+    pack_dir: Path,
+    jobs: Optional[int] = None,
+) -> None:
+    cached = cache.pack_objects(pack_dir) if cache else None
+    if cached is not None:
+        for binsha, type_id, size in cached:
+            typer.secho(
+                f"p: t={TYPE_MAP[type_id]}, sha={binsha.hex()}, size={size}",
+                fg=typer.colors.YELLOW,
+                bold=True,
+            )
+        return
+
+    pack = odb.reader(pack_dir)
+    objects = []
+    # every entry is inflated to check it, but only metadata is printed
+    for obj in iter_packfile(pack_dir, pack=pack, jobs=jobs, content=False):
+        typer.secho(
+            f"p: t={obj.obj_type}, sha={obj.sha}, size={obj.size}",
+            fg=typer.colors.YELLOW,
+            bold=True,
+        )
+        objects.append((obj.binsha, obj.type_id, obj.size))
+    # packs with unreadable objects are scanned again next time
+    if cache and len(objects) == pack.object_count:
+        cache.store_pack_objects(pack_dir, objects)
 
 
 @app.command()
-def build_dag(repo_path: str):
+def build_dag(
+    repo_path: str,
+    write_graph: Annotated[bool, typer.Option(
+        "--write-commit-graph",
+        help="Also write objects/info/commit-graph for later runs and git",
+    )] = False,
+    split: Annotated[bool, typer.Option(
+        "--split",
+        help="Append only new commits as a layer of a split commit-graph",
+    )] = False,
+    no_cache: Annotated[bool, NO_CACHE_OPTION] = False,
+):
     """
     Build a DAG from Git commits in a repository.
     Prints the number of nodes and edges in the DAG,
@@ -97,7 +338,9 @@ def build_dag(repo_path: str):
         fg=typer.colors.MAGENTA,
         bold=True,
     )
-    dag = build_dag_from_git_commits(git_repo_path)
+    with ObjectDatabase.open(git_repo_path) as odb, \
+            _scan_cache(git_repo_path, no_cache) as cache:
+        dag = build_dag_from_git_commits(git_repo_path, odb, cache)
     typer.echo(f"DAG with {len(dag.nodes())} nodes and {len(dag.edges())} edges")
 
     typer.secho("Calculating generation numbers...", fg=typer.colors.BLUE)
@@ -110,6 +353,20 @@ def build_dag(repo_path: str):
         bold=True,
     )
 
+    if write_graph:
+        try:
+            graph_path = write_commit_graph(
+                git_repo_path / "objects", dag, gen_numbers, split
+            )
+        except ValueError as e:
+            typer.secho(f"Commit-graph not written: {e}", fg=typer.colors.RED)
+        else:
+            typer.secho(
+                f"Commit-graph written to {graph_path}" if graph_path
+                else "Commit-graph is already up to date",
+                fg=typer.colors.GREEN,
+            )
+
     stats = get_dag_stats(dag)
 
     typer.secho(
@@ -127,7 +384,10 @@ def build_dag(repo_path: str):
 
 
 @app.command()
-def detect_rewrites(repo_path: str):
+def detect_rewrites(
+    repo_path: str,
+    no_cache: Annotated[bool, NO_CACHE_OPTION] = False,
+):
     """
     Detect potential history rewrites using Jaro-Winkler distance
     """
@@ -140,7 +400,9 @@ def detect_rewrites(repo_path: str):
     typer.secho(
         f"Building DAG from {git_repo_path}...", fg=typer.colors.BLUE, bold=True
     )
-    dag = build_dag_from_git_commits(git_repo_path)
+    with ObjectDatabase.open(git_repo_path) as odb, \
+            _scan_cache(git_repo_path, no_cache) as cache:
+        dag = build_dag_from_git_commits(git_repo_path, odb, cache)
 
     typer.secho("Detecting potential history rewrites...", fg=typer.colors.BLUE)
     results = detect_history_rewrites(dag)
@@ -166,6 +428,153 @@ def detect_rewrites(repo_path: str):
     return 3 if results["rewrites"] else 0
 
 
+@app.command()
+def connectivity(repo_path: str):
+    """
+    Check that every commit, tree and blob reachable from the refs
+    exists, and list the dangling objects nothing points to.
+    The exit code is 1 when objects are missing or objects or packs
+    can't be read.
+    """
+    repo_path = Path(repo_path)
+    git_repo_path = get_git_dir(repo_path)
+    if not git_repo_path:
+        typer.echo(f"Path {repo_path} is not a git repository!")
+        raise typer.Exit(code=2)
+
+    with ObjectDatabase.open(git_repo_path) as odb:
+        results = check_connectivity(odb, connectivity_tips(git_repo_path))
+
+    typer.secho(
+        f"{results['reachable']} reachable objects", fg=typer.colors.BLUE
+    )
+    for obj in results["missing"]:
+        typer.secho(
+            f"missing {obj['type']} {obj['sha']} (from {obj['referrer']})",
+            fg=typer.colors.RED,
+            bold=True,
+        )
+    for obj in results["dangling"]:
+        typer.secho(f"dangling {obj['type']} {obj['sha']}", fg=typer.colors.YELLOW)
+    for obj in results["unreadable"]:
+        typer.secho(
+            f"unreadable {obj['type']} {obj['sha']}: {obj['error']}",
+            fg=typer.colors.RED,
+            bold=True,
+        )
+    for pack_path, error in results["unreadable_packs"].items():
+        typer.secho(
+            f"unreadable pack {pack_path}: {error}",
+            fg=typer.colors.RED,
+            bold=True,
+        )
+    if (results["missing"] or results["unreadable"]
+            or results["unreadable_packs"]):
+        raise typer.Exit(code=1)
+    typer.secho("All reachable objects are present.", fg=typer.colors.GREEN)
+
+
+@app.command("delta-chains")
+def delta_chains(
+    repo_path: str,
+    worst: Annotated[int, typer.Option(
+        "--worst", min=0, help="Deepest chains and most shared bases to list"
+    )] = 10,
+    max_depth: Annotated[int, typer.Option(
+        "--max-depth", min=1, help="Chain depth a repack would allow"
+    )] = DEFAULT_MAX_DEPTH,
+):
+    """
+    Report the delta chains of every pack, read from entry headers only:
+    a depth histogram, the deepest chains and the bases most deltas
+    share, and how much reading would gain from git repack -f.
+    """
+    repo_path = Path(repo_path)
+    git_repo_path = get_git_dir(repo_path)
+    if not git_repo_path:
+        typer.echo(f"Path {repo_path} is not a git repository!")
+        raise typer.Exit(code=2)
+
+    with ObjectDatabase.open(git_repo_path) as odb:
+        for pack_path in odb.pack_paths:
+            try:
+                report = analyze_delta_chains(
+                    odb.reader(pack_path), worst, max_depth
+                )
+            except Exception as e:
+                typer.echo(f"err     packfile: {e}")
+                continue
+            typer.secho(
+                f"{pack_path.name}: {report['objects']} objects, "
+                f"{report['deltas']} deltas, max depth {report['max_depth']}",
+                fg=typer.colors.BLUE,
+                bold=True,
+            )
+            typer.echo("depth histogram:")
+            for depth, count in report["histogram"].items():
+                typer.echo(f"  {depth:>4}: {count}")
+            for chain in report["worst"]:
+                typer.echo(
+                    f"depth {chain['depth']:>4} {chain['sha']} "
+                    f"(root {chain['root']})"
+                )
+            for base in report["shared_bases"]:
+                typer.echo(f"base {base['sha']}: {base['dependents']} deltas")
+            typer.echo(
+                f"read amplification: {report['amplification']:.2f} entries, "
+                f"{report['byte_amplification']:.2f}x bytes per object"
+            )
+            saved = 1 - report["repacked_byte_amplification"] \
+                / report["byte_amplification"] \
+                if report["byte_amplification"] else 0
+            color = typer.colors.YELLOW if saved > 0 else typer.colors.GREEN
+            typer.secho(
+                f"after repack -f --depth={max_depth}: "
+                f"{report['repacked_amplification']:.2f} entries, "
+                f"{report['repacked_byte_amplification']:.2f}x bytes "
+                f"({saved:.0%} less to inflate)",
+                fg=color,
+            )
+
+
+@app.command("index-pack")
+def index_pack_command(
+    repo_path: str,
+    rev: Annotated[bool, typer.Option(
+        "--rev", help="Also write the .rev reverse index"
+    )] = False,
+    force: Annotated[bool, typer.Option(
+        "--force", help="Rebuild every idx, not only missing or corrupt ones"
+    )] = False,
+    jobs: Annotated[Optional[int], typer.Option(
+        "--jobs", "-j", help="Processes resolving deltas (default: CPU count)"
+    )] = None,
+):
+    """
+    Rebuild the .idx of packs whose index is missing or corrupt,
+    like git index-pack, so their objects can be read again.
+    """
+    repo_path = Path(repo_path)
+    git_repo_path = get_git_dir(repo_path)
+    if not git_repo_path:
+        typer.echo(f"Path {repo_path} is not a git repository!")
+        raise typer.Exit(code=2)
+
+    failed = False
+    for pack_path in sorted(find_packfiles(git_repo_path)):
+        if not force and index_is_usable(pack_path):
+            continue
+        try:
+            idx_path = index_pack(pack_path, write_rev=rev, workers=jobs)
+        except (ValueError, OSError) as e:
+            typer.secho(f"{pack_path.name}: {e}", fg=typer.colors.RED)
+            failed = True
+        else:
+            typer.secho(f"Wrote {idx_path.name}", fg=typer.colors.GREEN)
+    if failed:
+        raise typer.Exit(code=1)
+
+
 @app.command()
 def bisect(
     repo_path: str,
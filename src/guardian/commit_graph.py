@@ -0,0 +1,412 @@
+from hashlib import sha1
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import networkx as nx
+
+from guardian.object_scanner import bisect_sha_table
+
+GRAPH_MAGIC = b"CGPH"
+GRAPH_VERSION = 1
+HASH_VERSION_SHA1 = 1
+
+PARENT_NONE = 0x70000000
+PARENT_OCTOPUS = 0x80000000  # parent2 points into the EDGE chunk
+EDGE_LAST = 0x80000000
+
+CDAT_WIDTH = 36  # tree oid, 2 parent positions, generation + commit time
+
+
+class CommitGraphFile:
+    """
+    One memory-mapped commit-graph file: a whole graph
+    or one layer of a split chain.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty files can't be mapped
+                raise ValueError(f"Invalid commit-graph file: {path}")
+        try:
+            self._parse()
+        except (ValueError, struct.error, KeyError) as e:
+            self.close()
+            raise ValueError(f"Invalid commit-graph file {path}: {e}")
+
+    def _parse(self) -> None:
+        buf = self._map
+        if buf[:4] != GRAPH_MAGIC:
+            raise ValueError("bad signature")
+        version, hash_version, chunk_count, base_count = \
+            struct.unpack_from(">BBBB", buf, 4)
+        if version != GRAPH_VERSION:
+            raise ValueError(f"unsupported version {version}")
+        if hash_version != HASH_VERSION_SHA1:
+            raise ValueError("only SHA-1 is supported")
+
+        chunks = {}
+        for i in range(chunk_count + 1):
+            chunk_id, offset = struct.unpack_from(">4sQ", buf, 8 + 12 * i)
+            chunks[chunk_id] = offset
+
+        self.base_count = base_count
+        self.fanout = struct.unpack_from(">256I", buf, chunks[b"OIDF"])
+        self.commit_count = self.fanout[255]
+        self._sha_start = chunks[b"OIDL"]
+        self._data_start = chunks[b"CDAT"]
+        self._edge_start = chunks.get(b"EDGE")
+        self.base_hashes = []
+        if base_count:
+            base = chunks[b"BASE"]
+            self.base_hashes = [
+                buf[base + 20 * i:base + 20 * (i + 1)].hex()
+                for i in range(base_count)
+            ]
+        if self._data_start + CDAT_WIDTH * self.commit_count > len(buf):
+            raise ValueError("truncated CDAT chunk")
+
+    def close(self) -> None:
+        if not self._map.closed:
+            self._map.close()
+
+    def sha_at(self, position: int) -> bytes:
+        start = self._sha_start + 20 * position
+        return self._map[start:start + 20]
+
+    def find_position(self, sha) -> Optional[int]:
+        return bisect_sha_table(self._map, self._sha_start, self.fanout, sha)
+
+    def commit_data(self, position: int) -> Tuple[bytes, int, int, int, int]:
+        """(tree oid, parent1, parent2, generation, commit time)"""
+        start = self._data_start + CDAT_WIDTH * position
+        tree = self._map[start:start + 20]
+        parent1, parent2, high, low = struct.unpack_from(
+            ">IIII", self._map, start + 20
+        )
+        generation = high >> 2
+        commit_time = ((high & 3) << 32) | low
+        return tree, parent1, parent2, generation, commit_time
+
+    def extra_edges(self, edge_index: int) -> List[int]:
+        """Parent positions listed in the EDGE chunk from edge_index on"""
+        if self._edge_start is None:
+            raise ValueError("Octopus merge without an EDGE chunk")
+        parents = []
+        pos = self._edge_start + 4 * edge_index
+        while True:
+            value = struct.unpack_from(">I", self._map, pos)[0]
+            parents.append(value & ~EDGE_LAST)
+            if value & EDGE_LAST:
+                return parents
+            pos += 4
+
+
+class CommitGraph:
+    """
+    A repository's commit-graph, either objects/info/commit-graph or a
+    split chain under objects/info/commit-graphs/. Positions are global:
+    the base layer comes first and each layer continues the numbering.
+    """
+
+    def __init__(self, layers: List[CommitGraphFile]):
+        self.layers = layers
+        self._starts = []
+        total = 0
+        for layer in layers:
+            self._starts.append(total)
+            total += layer.commit_count
+        self.commit_count = total
+
+    def __enter__(self) -> "CommitGraph":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.commit_count
+
+    def __contains__(self, sha) -> bool:
+        return self.find_position(sha) is not None
+
+    def close(self) -> None:
+        for layer in self.layers:
+            layer.close()
+
+    def _locate(self, position: int) -> Tuple[CommitGraphFile, int]:
+        for layer, start in zip(reversed(self.layers), reversed(self._starts)):
+            if position >= start:
+                return layer, position - start
+        raise ValueError(f"Commit-graph position out of range: {position}")
+
+    def find_position(self, sha) -> Optional[int]:
+        for layer, start in zip(self.layers, self._starts):
+            position = layer.find_position(sha)
+            if position is not None:
+                return start + position
+        return None
+
+    def sha_at(self, position: int) -> bytes:
+        layer, local = self._locate(position)
+        return layer.sha_at(local)
+
+    def commit_data(self, position: int) -> Tuple[bytes, List[int], int, int]:
+        """(tree oid, parent positions, generation, commit time)"""
+        layer, local = self._locate(position)
+        tree, parent1, parent2, generation, commit_time = \
+            layer.commit_data(local)
+        return tree, _parents(layer, parent1, parent2), generation, commit_time
+
+    def __iter__(self) -> Iterator[Tuple[bytes, bytes, List[int], int, int]]:
+        """
+        Yield (sha, tree, parent positions, generation, commit time)
+        for every commit in position order
+        """
+        for layer in self.layers:
+            for local in range(layer.commit_count):
+                tree, parent1, parent2, generation, commit_time = \
+                    layer.commit_data(local)
+                yield (layer.sha_at(local), tree,
+                       _parents(layer, parent1, parent2),
+                       generation, commit_time)
+
+
+def _parents(layer: CommitGraphFile, parent1: int, parent2: int) -> List[int]:
+    parents = []
+    if parent1 != PARENT_NONE:
+        parents.append(parent1)
+    if parent2 & PARENT_OCTOPUS:
+        parents.extend(layer.extra_edges(parent2 & ~PARENT_OCTOPUS))
+    elif parent2 != PARENT_NONE:
+        parents.append(parent2)
+    return parents
+
+
+def read_graph_chain(objects_dir: Path) -> List[str]:
+    """Hashes of the layers listed in commit-graphs/commit-graph-chain"""
+    chain_file = objects_dir / "info" / "commit-graphs" / "commit-graph-chain"
+    if not chain_file.is_file():
+        return []
+    return [line.strip() for line in chain_file.read_text().splitlines()
+            if line.strip()]
+
+
+def load_commit_graph(objects_dir: Path) -> Optional[CommitGraph]:
+    """
+    Open the commit-graph of an objects directory, preferring
+    info/commit-graph and falling back to a split chain like git does.
+    Returns None when there is none or it can't be read.
+    """
+    single = objects_dir / "info" / "commit-graph"
+    try:
+        if single.is_file():
+            layer = CommitGraphFile(single)
+            if layer.base_count:
+                layer.close()
+                raise ValueError(f"{single} must not have base graphs")
+            return CommitGraph([layer])
+
+        layers: List[CommitGraphFile] = []
+        graphs_dir = objects_dir / "info" / "commit-graphs"
+        chain = read_graph_chain(objects_dir)
+        for i, graph_hash in enumerate(chain):
+            layers.append(
+                CommitGraphFile(graphs_dir / f"graph-{graph_hash}.graph"))
+            if layers[-1].base_hashes != chain[:i]:
+                for layer in layers:
+                    layer.close()
+                raise ValueError(f"Commit-graph chain is inconsistent at {i}")
+        return CommitGraph(layers) if layers else None
+    except (ValueError, OSError) as e:
+        print(f"Ignoring commit-graph: {e}")
+        return None
+
+
+def commit_graph_records(
+    graph: CommitGraph,
+) -> Iterator[Tuple[str, List[str], Dict[str, object]]]:
+    """
+    Yield (sha, parent shas, node attributes) for every commit in the graph
+    """
+    shas = [
+        layer.sha_at(local).hex()
+        for layer in graph.layers
+        for local in range(layer.commit_count)
+    ]
+    for position, (_, tree, parents, generation, commit_time) in \
+            enumerate(graph):
+        yield shas[position], [shas[p] for p in parents], {
+            "tree": tree.hex(),
+            "parent_count": len(parents),
+            "generation": generation,
+            "commit_time": commit_time,
+        }
+
+
+GENERATION_MAX = 0x3FFFFFFF
+CHUNK_ENTRY = struct.Struct(">4sQ")
+
+
+def _graph_bytes(
+    commits: List[Tuple[bytes, bytes, List[int], int, int]],
+    base_hashes: List[str],
+) -> bytes:
+    """
+    Serialize one commit-graph file. commits are (sha, tree, parent
+    positions, generation, commit time) sorted by sha, with parent
+    positions already global (base layers first).
+    """
+    fanout = [0] * 256
+    for sha, *_ in commits:
+        fanout[sha[0]] += 1
+    for i in range(1, 256):
+        fanout[i] += fanout[i - 1]
+
+    cdat = bytearray()
+    edge = bytearray()
+    for _, tree, parents, generation, commit_time in commits:
+        parent1 = parents[0] if parents else PARENT_NONE
+        if len(parents) <= 1:
+            parent2 = PARENT_NONE
+        elif len(parents) == 2:
+            parent2 = parents[1]
+        else:
+            parent2 = PARENT_OCTOPUS | (len(edge) // 4)
+            for parent in parents[1:-1]:
+                edge += struct.pack(">I", parent)
+            edge += struct.pack(">I", EDGE_LAST | parents[-1])
+        generation = min(generation, GENERATION_MAX)
+        cdat += tree
+        cdat += struct.pack(
+            ">IIII", parent1, parent2,
+            (generation << 2) | (commit_time >> 32) & 3,
+            commit_time & 0xFFFFFFFF,
+        )
+
+    chunks = [
+        (b"OIDF", struct.pack(">256I", *fanout)),
+        (b"OIDL", b"".join(sha for sha, *_ in commits)),
+        (b"CDAT", bytes(cdat)),
+    ]
+    if edge:
+        chunks.append((b"EDGE", bytes(edge)))
+    if base_hashes:
+        chunks.append(
+            (b"BASE", b"".join(bytes.fromhex(h) for h in base_hashes)))
+
+    out = bytearray(GRAPH_MAGIC)
+    out += struct.pack(">BBBB", GRAPH_VERSION, HASH_VERSION_SHA1,
+                       len(chunks), len(base_hashes))
+    offset = len(out) + CHUNK_ENTRY.size * (len(chunks) + 1)
+    for chunk_id, data in chunks:
+        out += CHUNK_ENTRY.pack(chunk_id, offset)
+        offset += len(data)
+    out += CHUNK_ENTRY.pack(b"\0\0\0\0", offset)
+    for _, data in chunks:
+        out += data
+    out += sha1(out).digest()
+    return bytes(out)
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp_path = path.with_name(f"tmp_{path.name}_{os.getpid()}")
+    tmp_path.write_bytes(data)
+    os.chmod(tmp_path, 0o444)
+    os.replace(tmp_path, path)
+
+
+def write_commit_graph(
+    objects_dir: Path,
+    dag: nx.DiGraph,
+    generations: Dict[str, int],
+    split: bool = False,
+) -> Optional[Path]:
+    """
+    Write the commits of a DAG (as built by dag_builder) as a commit-graph
+    git can read too.
+
+    Without split the whole history goes to objects/info/commit-graph.
+    With split only the commits the existing chain doesn't cover are
+    appended as a new layer under objects/info/commit-graphs/, so the
+    layers already written are never rewritten.
+
+    Args:
+        objects_dir: The repository's objects directory
+        dag: Commit DAG whose nodes carry tree and commit_time attributes
+            and whose edges into a commit were added in parent order
+        generations: Output of calculate_generation_numbers for dag
+        split: Append a layer to the split chain instead
+
+    Returns:
+        Path of the file written, or None when the chain was up to date
+    """
+    graph = load_commit_graph(objects_dir) if split else None
+    if graph is not None and objects_dir.joinpath(
+            "info", "commit-graph").is_file():
+        # a plain commit-graph shadows the chain; start a new one instead
+        graph.close()
+        graph = None
+    base_hashes = read_graph_chain(objects_dir) if graph is not None else []
+
+    try:
+        new_shas = sorted(
+            bytes.fromhex(sha) for sha in dag.nodes()
+            if graph is None or sha not in graph
+        )
+        if split and not new_shas:
+            return None
+        base_count = len(graph) if graph is not None else 0
+        positions = {sha.hex(): base_count + i
+                     for i, sha in enumerate(new_shas)}
+
+        commits = []
+        for binsha in new_shas:
+            sha = binsha.hex()
+            attrs = dag.nodes[sha]
+            if "tree" not in attrs or "commit_time" not in attrs:
+                raise ValueError(f"Commit {sha} has no tree or commit time")
+            missing = attrs.get("parent_count", 0) - dag.in_degree(sha)
+            if missing > 0:
+                raise ValueError(
+                    f"Commit {sha} is missing {missing} parent(s) in the DAG")
+            parents = []
+            for parent in dag.predecessors(sha):
+                position = positions.get(parent)
+                if position is None and graph is not None:
+                    position = graph.find_position(parent)
+                if position is None:
+                    raise ValueError(
+                        f"Parent {parent} of commit {sha} is not in the DAG")
+                parents.append(position)
+            commits.append((
+                binsha, bytes.fromhex(attrs["tree"]), parents,
+                generations[sha] + 1, attrs["commit_time"],
+            ))
+    finally:
+        if graph is not None:
+            graph.close()
+
+    data = _graph_bytes(commits, base_hashes)
+    info_dir = objects_dir / "info"
+    if not split:
+        info_dir.mkdir(exist_ok=True)
+        path = info_dir / "commit-graph"
+        _write_atomic(path, data)
+        return path
+
+    graphs_dir = info_dir / "commit-graphs"
+    graphs_dir.mkdir(parents=True, exist_ok=True)
+    graph_hash = data[-20:].hex()
+    path = graphs_dir / f"graph-{graph_hash}.graph"
+    _write_atomic(path, data)
+    chain = "".join(f"{h}\n" for h in base_hashes + [graph_hash])
+    _write_atomic(graphs_dir / "commit-graph-chain", chain.encode())
+    (info_dir / "commit-graph").unlink(missing_ok=True)
+    return path
+
@@ -0,0 +1,248 @@
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+import re
+
+from guardian.dag_builder import parse_commit_content
+from guardian.object_database import ObjectDatabase
+from guardian.object_scanner import Body
+from guardian.utils import read_reflog_shas, read_refs
+
+TREE_MODE = b"40000"
+GITLINK_MODE = b"160000"
+
+# "<mode> <name>\0<20-byte SHA>", matched in place over the tree buffer
+TREE_ENTRY = re.compile(rb"([0-7]+) ([^\0]*)\0(.{20})", re.DOTALL)
+
+
+def parse_tree(content: Body) -> Iterator[Tuple[bytes, bytes, bytes]]:
+    """
+    Parse the entries of a tree object, which may be a memoryview.
+    Yields (mode, name, binary SHA) for each entry.
+    """
+    pos = 0
+    while pos < len(content):
+        entry = TREE_ENTRY.match(content, pos)
+        if entry is None:
+            raise ValueError("Truncated tree entry")
+        yield entry.groups()
+        pos = entry.end()
+
+
+def object_references(obj_type: str, content: bytes) -> List[Tuple[bytes, str]]:
+    """
+    Objects a commit, tree or tag points to, as (binary SHA, expected type).
+    Submodule entries are skipped since they live in another repository.
+    """
+    if obj_type == "tree":
+        refs = []
+        for mode, _, sha in parse_tree(content):
+            if mode == GITLINK_MODE:
+                continue
+            refs.append((sha, "tree" if mode == TREE_MODE else "blob"))
+        return refs
+    metadata = parse_commit_content(content)
+    if obj_type == "commit":
+        return [(bytes.fromhex(metadata["tree"][0]), "tree")] + [
+            (bytes.fromhex(parent), "commit")
+            for parent in metadata.get("parent", [])
+        ]
+    if obj_type == "tag":
+        target_type = metadata.get("type", ["commit"])[0]
+        return [(bytes.fromhex(metadata["object"][0]), target_type)]
+    return []
+
+
+class ObjectBitmap:
+    """
+    Compact set of the objects of an ObjectDatabase. Packed objects are
+    one bit at their idx position in a per-pack bitmap; only loose
+    objects are kept as 20-byte SHAs.
+    """
+
+    def __init__(self):
+        self._packs: Dict[Path, bytearray] = {}
+        self._loose: Set[bytes] = set()
+
+    def _slot(self, binsha: bytes, found) -> Tuple[Optional[bytearray], int]:
+        odb, location = found
+        if isinstance(location, Path):
+            return None, 0
+        pack_path = location[0]
+        index = odb.packs.index(pack_path)
+        if index is None:  # no idx positions, kept by SHA like loose ones
+            return None, 0
+        bitmap = self._packs.get(pack_path)
+        if bitmap is None:
+            bitmap = self._packs[pack_path] = bytearray((len(index) + 7) // 8)
+        return bitmap, index.find_position(binsha)
+
+    def add(self, binsha: bytes, found) -> bool:
+        """
+        Mark an object located by ObjectDatabase.locate.
+        Returns False when it was already marked.
+        """
+        bitmap, position = self._slot(binsha, found)
+        if bitmap is None:
+            if binsha in self._loose:
+                return False
+            self._loose.add(binsha)
+            return True
+        mask = 1 << (position & 7)
+        if bitmap[position >> 3] & mask:
+            return False
+        bitmap[position >> 3] |= mask
+        return True
+
+    def contains(self, binsha: bytes, found) -> bool:
+        bitmap, position = self._slot(binsha, found)
+        if bitmap is None:
+            return binsha in self._loose
+        return bool(bitmap[position >> 3] & (1 << (position & 7)))
+
+    def unmarked_positions(self, pack_path: Path, count: int) -> Iterator[int]:
+        """idx positions of a pack (with count objects) not marked"""
+        bitmap = self._packs.get(pack_path)
+        if bitmap is None:
+            yield from range(count)
+            return
+        for byte_pos, byte in enumerate(bitmap):
+            if byte == 0xFF:
+                continue
+            for bit in range(8):
+                position = (byte_pos << 3) | bit
+                if position < count and not byte & (1 << bit):
+                    yield position
+
+    def __len__(self) -> int:
+        return len(self._loose) + sum(
+            int.from_bytes(bitmap, "big").bit_count()
+            for bitmap in self._packs.values()
+        )
+
+
+def _unmarked(odb: ObjectDatabase, marked: ObjectBitmap) -> Iterator[bytes]:
+    """SHAs of the database's own objects (not alternates) never marked"""
+    for path in odb.loose_objects():
+        binsha = bytes.fromhex(path.parent.name + path.name)
+        found = odb.locate(binsha)
+        if found is not None and not marked.contains(binsha, found):
+            yield binsha
+    for pack_path in odb.pack_paths:
+        index = odb.packs.index(pack_path)
+        if index is None:
+            continue
+        for position in marked.unmarked_positions(pack_path, len(index)):
+            binsha = index.sha_at(position)
+            # the copy locate() prefers (e.g. loose) may be the marked one
+            found = odb.locate(binsha)
+            if found is not None and not marked.contains(binsha, found):
+                yield binsha
+
+
+def _unreadable_packs(odb: ObjectDatabase) -> Dict[str, str]:
+    unreadable = {
+        str(pack_path): error
+        for pack_path, error in odb.packs.unreadable.items()
+    }
+    for alternate in odb.alternates:
+        unreadable.update(_unreadable_packs(alternate))
+    return unreadable
+
+
+def check_connectivity(
+    odb: ObjectDatabase, tips: Dict[str, str]
+) -> Dict[str, object]:
+    """
+    Walk every commit, tree and blob reachable from tips and report what
+    is missing, and which objects nothing reaches or points to (dangling).
+
+    Blobs are only looked up, never inflated, and the visited objects are
+    kept in ObjectBitmap, so memory stays around one bit per object.
+
+    Packs whose idx can't be read are skipped and reported; objects
+    only they hold show up as missing. Objects that exist but can't be
+    read are reported as unreadable. When a reachable one can't be read,
+    what it points to is unknown, so no dangling objects are reported.
+
+    Args:
+        odb: Open ObjectDatabase of the repository
+        tips: Mapping of ref name (or other label) to the SHA it points to
+
+    Returns:
+        dict with reachable (count), missing (list of dicts with sha,
+        type and the first referrer found), dangling (list of dicts with
+        sha and type), unreadable (list of dicts with sha, type and
+        error) and unreadable_packs (pack path -> error)
+    """
+    reached = ObjectBitmap()
+    missing: Dict[bytes, Dict[str, str]] = {}
+    unreadable: List[Dict[str, str]] = []
+    pending: List[Tuple[bytes, str, str]] = [
+        (bytes.fromhex(sha), "commit", name)
+        for name, sha in sorted(tips.items())
+    ]
+    while pending:
+        binsha, expected_type, referrer = pending.pop()
+        found = odb.locate(binsha)
+        if found is None:
+            missing.setdefault(binsha, {
+                "sha": binsha.hex(), "type": expected_type,
+                "referrer": referrer,
+            })
+            continue
+        if not reached.add(binsha, found) or expected_type == "blob":
+            continue
+        try:
+            obj = odb.read_object(binsha)
+            refs = object_references(obj.obj_type, obj.content)
+        except (ValueError, KeyError, IndexError) as e:
+            print(f"Error! reading obj {binsha.hex()}: {e}")
+            unreadable.append({
+                "sha": binsha.hex(), "type": expected_type, "error": str(e),
+            })
+            continue
+        sha = binsha.hex()
+        pending.extend((ref, ref_type, sha) for ref, ref_type in refs)
+    reachable_unreadable = bool(unreadable)
+
+    unreachable = list(_unmarked(odb, reached))
+    referenced: Set[bytes] = set()
+    types = {}
+    for binsha in unreachable:
+        obj_type = None
+        try:
+            obj_type, _ = odb.object_info(binsha)
+            if obj_type == "blob":
+                types[binsha] = obj_type
+                continue
+            obj = odb.read_object(binsha)
+            refs = object_references(obj_type, obj.content)
+        except (ValueError, KeyError, IndexError) as e:
+            print(f"Error! reading obj {binsha.hex()}: {e}")
+            unreadable.append({
+                "sha": binsha.hex(), "type": obj_type or "unknown",
+                "error": str(e),
+            })
+            continue
+        types[binsha] = obj_type
+        referenced.update(ref for ref, _ in refs)
+
+    return {
+        "reachable": len(reached),
+        "missing": list(missing.values()),
+        "dangling": [] if reachable_unreadable else [
+            {"sha": binsha.hex(), "type": types[binsha]}
+            for binsha in unreachable
+            if binsha in types and binsha not in referenced
+        ],
+        "unreadable": unreadable,
+        "unreadable_packs": _unreadable_packs(odb),
+    }
+
+
+def connectivity_tips(git_dir: Path) -> Dict[str, str]:
+    """Refs, HEAD and reflog entries: where a connectivity walk starts"""
+    tips = read_refs(git_dir)
+    for sha in read_reflog_shas(git_dir):
+        tips.setdefault(f"reflog:{sha[:8]}", sha)
+    return tips
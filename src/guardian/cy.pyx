@@ -1,2 +1,161 @@
-def foo():
-    return 1
\ No newline at end of file
+# cython: language_level=3
+# Compiled versions of the kernels in guardian.pykernels, which document
+# them. They accept the same buffers (bytes, memoryview, mmap) and raise
+# the same errors; varints too long for 64 bits are left to the
+# pure-Python versions.
+from cpython.unicode cimport PyUnicode_DecodeUTF8
+from libc.string cimport memcpy
+
+from guardian import pykernels
+
+cdef enum:
+    # shifting 7 more bits past this could overflow 64 bits
+    MAX_SHIFT = 57
+
+
+def parse_entry_header(buffer, Py_ssize_t offset):
+    cdef const unsigned char[:] buf = buffer
+    cdef unsigned char first = buf[offset]
+    cdef unsigned char byte = first
+    cdef unsigned long long size = byte & 15
+    cdef int shift = 4
+    cdef Py_ssize_t pos = offset + 1
+    while byte & 0x80:
+        if shift > MAX_SHIFT:
+            return pykernels.parse_entry_header(buffer, offset)
+        byte = buf[pos]
+        pos += 1
+        size |= (<unsigned long long>(byte & 0x7f)) << shift
+        shift += 7
+    return (first >> 4) & 7, size, pos
+
+
+def decode_ofs_distance(buffer, Py_ssize_t pos):
+    cdef const unsigned char[:] buf = buffer
+    cdef Py_ssize_t start = pos
+    cdef unsigned char byte = buf[pos]
+    cdef unsigned long long distance = byte & 0x7f
+    cdef int shift = 0
+    pos += 1
+    while byte & 0x80:
+        shift += 7
+        if shift > MAX_SHIFT:
+            return pykernels.decode_ofs_distance(buffer, start)
+        byte = buf[pos]
+        pos += 1
+        distance = ((distance + 1) << 7) | (byte & 0x7f)
+    return distance, pos
+
+
+cdef bint _delta_size(
+    const unsigned char[:] delta, Py_ssize_t *pos, unsigned long long *size
+) except -1:
+    """Read a delta header varint; False when it doesn't fit 64 bits"""
+    cdef unsigned char byte
+    cdef int shift = 0
+    size[0] = 0
+    while True:
+        if shift > MAX_SHIFT:
+            return False
+        byte = delta[pos[0]]
+        pos[0] += 1
+        size[0] |= (<unsigned long long>(byte & 0x7f)) << shift
+        shift += 7
+        if not byte & 0x80:
+            return True
+
+
+def apply_delta(base, delta):
+    cdef const unsigned char[:] src = base
+    cdef const unsigned char[:] ops = delta
+    cdef const unsigned char *source
+    cdef unsigned char[:] out
+    cdef Py_ssize_t pos = 0
+    cdef Py_ssize_t delta_len = ops.shape[0]
+    cdef unsigned long long src_size, dest_size, written = 0
+    cdef unsigned long long copy_offset, copy_size, n
+    cdef unsigned char opcode
+    cdef int i
+
+    if not _delta_size(ops, &pos, &src_size):
+        return pykernels.apply_delta(base, delta)
+    if src_size != <unsigned long long>src.shape[0]:
+        raise ValueError(
+            f"Delta base size mismatch! {src_size} != {src.shape[0]}"
+        )
+    if not _delta_size(ops, &pos, &dest_size):
+        return pykernels.apply_delta(base, delta)
+
+    result = bytearray(dest_size)
+    out = result
+    while pos < delta_len:
+        opcode = ops[pos]
+        pos += 1
+        if opcode & 0x80:  # copy from base
+            copy_offset = 0
+            copy_size = 0
+            for i in range(4):
+                if opcode & (1 << i):
+                    copy_offset |= (<unsigned long long>ops[pos]) << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if opcode & (0x10 << i):
+                    copy_size |= (<unsigned long long>ops[pos]) << (8 * i)
+                    pos += 1
+            if copy_size == 0:
+                copy_size = 0x10000
+            if copy_offset + copy_size > src_size:
+                raise ValueError("Delta copy out of base bounds")
+            source = &src[copy_offset]
+            n = copy_size
+        elif opcode:  # insert literal data
+            if pos + opcode > delta_len:
+                raise ValueError("Truncated delta insert")
+            source = &ops[pos]
+            n = opcode
+            pos += opcode
+        else:
+            raise ValueError("Invalid delta opcode 0")
+        if written + n > dest_size:
+            raise ValueError(
+                f"Delta size mismatch! {dest_size} < {written + n}"
+            )
+        memcpy(&out[written], source, n)
+        written += n
+
+    if written != dest_size:
+        raise ValueError(f"Delta size mismatch! {dest_size} != {written}")
+    return memoryview(result).toreadonly()
+
+
+cdef str _decode(const unsigned char[:] buf, Py_ssize_t start, Py_ssize_t end):
+    if start == end:
+        return ""
+    return PyUnicode_DecodeUTF8(<const char *>&buf[start], end - start, NULL)
+
+
+def parse_commit_content(content):
+    cdef const unsigned char[:] buf = content
+    cdef Py_ssize_t pos = 0
+    cdef Py_ssize_t end = buf.shape[0]
+    cdef Py_ssize_t line_end, space
+    result = {}
+    while pos < end:
+        line_end = pos
+        while line_end < end and buf[line_end] != ord("\n"):
+            line_end += 1
+        if line_end == pos:
+            break
+        space = pos
+        while space < line_end and buf[space] != ord(" "):
+            space += 1
+        if space < line_end:
+            try:
+                # like the defaultdict there, the key is added even when
+                # its value can't be decoded
+                values = result.setdefault(_decode(buf, pos, space), [])
+                values.append(_decode(buf, space + 1, line_end))
+            except UnicodeDecodeError:
+                pass
+        pos = line_end + 1
+    return result
@@ -1,33 +1,19 @@
 import networkx as nx
 from pathlib import Path
-from collections import defaultdict, deque
-from guardian.object_scanner import GitObject, read_loose, read_packfile
-from typing import Dict, List, Tuple
+from itertools import chain
+from guardian.kernels import parse_commit_content
+from guardian.object_scanner import GitObject, TYPE_IDS, iter_packfile, \
+    scan_loose_objects
+from guardian.object_database import ObjectDatabase
+from guardian.commit_graph import (
+    CommitGraph,
+    commit_graph_records,
+    load_commit_graph,
+)
+from guardian.scan_cache import CommitRecord, ScanCache, loose_sha
+from guardian.utils import read_reflog_shas, read_refs
+from typing import Dict, Iterator, List, Tuple, Iterable, Optional
 import textdistance
-import re
-
-
-def parse_commit_content(content: bytes) -> Dict[str, List[str]]:
-    """
-    Parse a commit object content to extract metadata including parent commits.
-    Returns a dictionary with keys tree, parent, author, committer.
-    """
-    result = defaultdict(list)
-    lines = content.split(b'\n')
-
-    for line in lines:
-        if not line:
-            break
-
-        try:
-            key_value = line.split(b' ', 1)
-            if len(key_value) == 2:
-                key, value = key_value
-                result[key.decode('utf-8')].append(value.decode('utf-8'))
-        except Exception:
-            continue
-
-    return dict(result)
 
 
 def get_parent_commits(commit_obj: GitObject) -> List[str]:
@@ -42,32 +28,44 @@ def get_parent_commits(commit_obj: GitObject) -> List[str]:
     return metadata.get('parent', [])
 
 
-def build_graph(commits: List[GitObject]) -> nx.DiGraph:
+def get_commit_attributes(commit_obj: GitObject) -> Tuple[List[str], Dict]:
+    """
+    Parse a commit object once for the parents and the node attributes
+    the commit-graph needs (tree SHA, committer timestamp, parent count).
+    Returns a tuple of (parent SHAs, attributes).
     """
-    Build a directed acyclic graph (DAG) from a list of Git commits.
+    metadata = parse_commit_content(commit_obj.content)
+    parents = metadata.get("parent", [])
+    attrs = {
+        "type": commit_obj.obj_type,
+        "size": commit_obj.size,
+        "parent_count": len(parents),
+    }
+    if metadata.get("tree"):
+        attrs["tree"] = metadata["tree"][0]
+    committer = metadata.get("committer", [""])[0].rsplit(" ", 2)
+    if len(committer) == 3 and committer[1].isdigit():
+        attrs["commit_time"] = int(committer[1])
+    return parents, attrs
 
-    Args:
-        commits: List of GitObject instances representing commits
 
-    Returns:
-        A Networkx digraph where nodes are commit SHAs
-        and edges point from parent to child
+# (sha, parent shas, node attributes): what a DAG node is built from
+NodeRecord = Tuple[str, List[str], Dict]
+
+
+def graph_from_records(records: Iterable[NodeRecord]) -> nx.DiGraph:
+    """
+    Build the commit DAG from (sha, parent shas, node attributes) records.
+    Edges to parents that never show up are left out.
     """
     dag = nx.DiGraph()
+    parents_map = {}
 
-    for commit in commits:
-        if commit.obj_type == "commit":
-            dag.add_node(
-                commit.sha,
-                type=commit.obj_type,
-                size=commit.size)
-
-    commit_map = {
-        commit.sha: commit for commit in commits
-        if commit.obj_type == "commit"}
-
-    for sha, commit_obj in commit_map.items():
-        parents = get_parent_commits(commit_obj)
+    for sha, parents, attrs in records:
+        dag.add_node(sha, **attrs)
+        parents_map[sha] = parents
+
+    for sha, parents in parents_map.items():
         for parent_sha in parents:
             if parent_sha in dag:
                 dag.add_edge(parent_sha, sha)
@@ -75,77 +73,269 @@ def build_graph(commits: List[GitObject]) -> nx.DiGraph:
     return dag
 
 
-def build_dag_from_git_commits(repo_path: Path) -> nx.DiGraph:
+def build_graph(commits: Iterable[GitObject]) -> nx.DiGraph:
     """
-    Build a DAG from all Git commits in a repository.
+    Build a directed acyclic graph (DAG) from Git commits.
+
+    Commits are consumed one at a time and only their parent lists are
+    kept, so any iterable (including a generator) works. Commits whose
+    content can't be read are reported and left out.
 
     Args:
-        repo_path: Path to the repository (with Git)
+        commits: Iterable of GitObject instances representing commits
 
     Returns:
         A Networkx digraph where nodes are commit SHAs
-        and edges represent parent-child relationships
+        and edges point from parent to child
     """
-    commits = []
-
-    git_dir = repo_path / ".git"
-    if not git_dir.is_dir():
-        git_dir = repo_path
-
-    objects_dir = git_dir / "objects"
-    if objects_dir.is_dir():
-        hex_pattern = re.compile(r'^[0-9a-f]{2}$')
-        for dir_path in objects_dir.iterdir():
-            if dir_path.is_dir() and hex_pattern.match(dir_path.name):
-                try:
-                    obj = read_loose(dir_path)
-                    commits.append(obj)
-                except Exception as e:
-                    print(f"Error reading loose object in {dir_path}: {e}")
-
-    pack_dir = git_dir / "objects" / "pack"
-    if pack_dir.is_dir():
-        for pack_file in pack_dir.glob("*.pack"):
-            try:
-                pack_objects = read_packfile(pack_file)
-                commits.extend(pack_objects)
-            except Exception as e:
-                print(f"Error reading packfile {pack_file}: {e}")
-    return build_graph([obj for obj in commits if obj.obj_type == "commit"])
+    return graph_from_records(_commit_nodes(commits))
 
 
-def calculate_generation_numbers(dag: nx.DiGraph) -> Dict[str, int]:
+def _commit_nodes(commits: Iterable[GitObject]) -> Iterator[NodeRecord]:
+    for commit in commits:
+        if commit.obj_type != "commit":
+            continue
+        # lazily loaded commits are only inflated here
+        try:
+            parents, attrs = get_commit_attributes(commit)
+        except Exception as e:
+            print(f"Error! reading commit {commit.sha}: {e}")
+            continue
+        yield commit.sha, parents, attrs
+
+
+def _walk_new_commits(
+    graph: CommitGraph, odb: ObjectDatabase, tips: Iterable[str]
+) -> Iterator[NodeRecord]:
+    """Commits reachable from tips that the commit-graph doesn't have"""
+    seen = set()
+    pending = [sha for sha in tips if sha not in graph]
+    while pending:
+        sha = pending.pop()
+        if sha in seen:
+            continue
+        seen.add(sha)
+        try:
+            obj = odb.read_object(sha)
+        except ValueError as e:
+            print(f"Skipping {sha}: {e}")
+            continue
+        if obj.obj_type == "tag":
+            target = parse_commit_content(obj.content).get("object", [])
+            pending.extend(target[:1])
+            continue
+        if obj.obj_type != "commit":
+            continue
+        parents, attrs = get_commit_attributes(obj)
+        yield sha, parents, attrs
+        pending.extend(p for p in parents if p not in graph)
+
+
+def build_graph_from_commit_graph(
+    graph: CommitGraph, odb: ObjectDatabase, tips: Iterable[str] = ()
+) -> nx.DiGraph:
     """
-    Calculate Generation Number (GN) for each commit in the DAG.
-    GN is the maximum distance from any root node to this node.
+    Build the commit DAG from a commit-graph file without inflating the
+    commits it covers. Commits reachable from tips that the graph doesn't
+    know about yet (made after it was written) are read from odb.
 
     Args:
-        dag: A Networkx digraph representing the commit history
+        graph: Open CommitGraph of the repository
+        odb: ObjectDatabase used for commits missing from the graph
+        tips: SHAs to walk from, usually refs and reflog entries
 
     Returns:
-        dict mapping commit SHA to its generation number
+        A Networkx digraph where nodes are commit SHAs
+        and edges point from parent to child
+    """
+    return graph_from_records(chain(
+        (
+            (sha, parents, {"type": "commit", **attrs})
+            for sha, parents, attrs in commit_graph_records(graph)
+        ),
+        _walk_new_commits(graph, odb, tips),
+    ))
+
+
+def _to_commit_record(commit: GitObject) -> CommitRecord:
+    parents, attrs = get_commit_attributes(commit)
+    tree = attrs.get("tree")
+    return (
+        commit.binsha,
+        bytes.fromhex(tree) if tree else None,
+        [bytes.fromhex(parent) for parent in parents],
+        attrs.get("commit_time"),
+        commit.size,
+    )
+
+
+def _read_commit_record(commit: GitObject) -> Optional[CommitRecord]:
+    """
+    Commit record of a lazily loaded commit, or None (the error printed)
+    when its content can't be inflated or parsed.
+    """
+    try:
+        return _to_commit_record(commit)
+    except Exception as e:
+        print(f"Error! reading commit {commit.sha}: {e}")
+        return None
+
+
+def _from_commit_record(record: CommitRecord) -> NodeRecord:
+    sha, tree, parents, commit_time, size = record
+    attrs = {"type": "commit", "size": size, "parent_count": len(parents)}
+    if tree is not None:
+        attrs["tree"] = tree.hex()
+    if commit_time is not None:
+        attrs["commit_time"] = commit_time
+    return sha.hex(), [parent.hex() for parent in parents], attrs
+
+
+def _read_pack_commits(
+    odb: ObjectDatabase, pack_path: Path
+) -> Tuple[List[CommitRecord], bool]:
     """
-    roots = [node for node in dag.nodes() if dag.in_degree(node) == 0]
+    Commit records of one pack, and whether every entry of the pack
+    could be read. Every entry's type has to be read from its header
+    anyway to pick out the commits, so they're counted too.
+    """
+    records = []
+    entries = 0
+    complete = True
+    try:
+        pack = odb.reader(pack_path)
+        for obj in iter_packfile(pack_path, pack=pack, lazy=True):
+            entries += 1
+            if obj.obj_type != "commit":
+                continue
+            record = _read_commit_record(obj)
+            if record is None:
+                complete = False
+            else:
+                records.append(record)
+    except Exception as e:
+        print(f"Error reading packfile {pack_path}: {e}")
+        return records, False
+    return records, complete and entries == pack.object_count
 
-    generation_numbers = {node: 0 for node in dag.nodes()}
 
-    for root in roots:
-        visited = set()
-        queue = deque([(root, 0)])
+def iter_cached_commit_records(
+    odb: ObjectDatabase, cache: ScanCache
+) -> Iterator[NodeRecord]:
+    """
+    Commit records of every pack and loose object, taken from the scan
+    cache where possible. Only packs and loose objects the cache hasn't
+    seen are read, and what they hold is added to it.
+    """
+    pack_paths = odb.pack_paths
+    for pack_path in pack_paths:
+        records = cache.pack_commits(pack_path)
+        if records is None:
+            records, complete = _read_pack_commits(odb, pack_path)
+            # packs with unreadable objects are read again next time
+            if complete:
+                cache.store_pack_commits(pack_path, records)
+        yield from map(_from_commit_record, records)
+    cache.prune_packs(pack_paths)
+
+    loose_paths = odb.loose_objects()
+    known, new = cache.split_loose(loose_paths)
+    known_commits = [
+        loose_sha(path) for path, type_id, _ in known
+        if type_id == TYPE_IDS["commit"]
+    ]
+    records = cache.commits(known_commits)
+    new.extend(
+        odb.objects_dir / sha.hex()[:2] / sha.hex()[2:]
+        for sha in known_commits if sha not in records
+    )
+
+    scanned, new_records = [], []
+    for obj in scan_loose_objects(new, lazy=True):
+        if obj.obj_type == "commit":
+            record = _read_commit_record(obj)
+            # left out of the cache, so it's read again next time
+            if record is None:
+                continue
+            new_records.append(record)
+        path = odb.objects_dir / obj.sha[:2] / obj.sha[2:]
+        scanned.append((path, obj.type_id, obj.size))
+    cache.store_loose_objects(scanned)
+    cache.store_commits(new_records)
+    cache.prune_loose(loose_paths)
+    yield from map(_from_commit_record, chain(records.values(), new_records))
+
+    for alternate in odb.alternates:
+        for commit in alternate.iter_objects(types={"commit"}, lazy=True):
+            record = _read_commit_record(commit)
+            if record is not None:
+                yield _from_commit_record(record)
+
+
+def build_dag_from_git_commits(
+    repo_path: Path,
+    odb: Optional[ObjectDatabase] = None,
+    cache: Optional[ScanCache] = None,
+) -> nx.DiGraph:
+    """
+    Build a DAG from all Git commits in a repository.
 
-        while queue:
-            node, distance = queue.popleft()
+    When the repository has a commit-graph (objects/info/commit-graph or
+    a split chain) the DAG is loaded from it and only the commits newer
+    than the graph are parsed; commits nothing points to any more (not
+    even a reflog) are then left out, as git itself does.
 
-            if node in visited:
-                continue
+    Otherwise objects are streamed, so memory use doesn't grow with the
+    repository, packed blobs and trees are skipped without being inflated
+    and each commit body is only loaded while its parents are read. With
+    a scan cache only packs and loose objects it hasn't seen are read.
 
-            visited.add(node)
+    Args:
+        repo_path: Path to the repository (with Git)
+        odb: Already open ObjectDatabase of the repository
+        cache: ScanCache of the repository
+
+    Returns:
+        A Networkx digraph where nodes are commit SHAs
+        and edges represent parent-child relationships
+    """
+    if odb is None:
+        git_dir = repo_path / ".git"
+        if not git_dir.is_dir():
+            git_dir = repo_path
+        with ObjectDatabase.open(git_dir) as odb:
+            return build_dag_from_git_commits(git_dir, odb, cache)
+
+    graph = load_commit_graph(odb.objects_dir)
+    if graph is None:
+        if cache is not None:
+            return graph_from_records(iter_cached_commit_records(odb, cache))
+        return build_graph(odb.iter_objects(types={"commit"}, lazy=True))
+
+    git_dir = odb.objects_dir.parent
+    tips = set(read_refs(git_dir).values()) | read_reflog_shas(git_dir)
+    with graph:
+        return build_graph_from_commit_graph(graph, odb, sorted(tips))
 
-            generation_numbers[node] = max(generation_numbers[node], distance)
 
-            for child in dag.successors(node):
-                queue.append((child, distance + 1))
+def calculate_generation_numbers(dag: nx.DiGraph) -> Dict[str, int]:
+    """
+    Calculate Generation Number (GN) for each commit in the DAG.
+    GN is the maximum distance from any root node to this node, so it is
+    one less than git's topological level (where roots are 1).
 
+    Args:
+        dag: A Networkx digraph representing the commit history
+
+    Returns:
+        dict mapping commit SHA to its generation number
+    """
+    generation_numbers = {}
+    for node in nx.topological_sort(dag):
+        generation_numbers[node] = max(
+            (generation_numbers[p] + 1 for p in dag.predecessors(node)),
+            default=0,
+        )
     return generation_numbers
 
 
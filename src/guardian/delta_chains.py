@@ -0,0 +1,184 @@
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+import heapq
+
+from guardian.object_scanner import PackReader
+
+# git repack's default --depth
+DEFAULT_MAX_DEPTH = 50
+
+
+def delta_bases(pack: PackReader) -> Dict[int, Optional[int]]:
+    """
+    Map the offset of every entry of a pack to the offset of its delta
+    base (None for objects stored whole), from entry headers alone.
+    ref_delta bases outside the pack (thin packs) are left out.
+    """
+    index = pack.index
+    bases: Dict[int, Optional[int]] = {}
+    pack.advise(sequential=True)
+    try:
+        for position in pack.pack_order():
+            offset = index.offset_at(position)
+            try:
+                _, _, _, base = pack.read_entry(offset)
+            except ValueError as e:
+                print(f"Error! reading header at offset {offset}: {e}")
+                continue
+            if isinstance(base, bytes):
+                base = index.find_offset(base)
+                if base is None:
+                    print(f"Error! delta at offset {offset} has no base in pack")
+                    continue
+            bases[offset] = base
+    finally:
+        pack.advise(sequential=False)
+    return bases
+
+
+def chain_depths(bases: Dict[int, Optional[int]]) -> Dict[int, int]:
+    """
+    Depth of every entry's delta chain: 0 for whole objects, 1 for a
+    delta on top of one, and so on. Entries whose chain is broken (a
+    base that failed to read, or a cycle) are left out.
+    """
+    depths: Dict[int, int] = {}
+    for offset in bases:
+        chain: List[int] = []
+        current: Optional[int] = offset
+        while current is not None and current not in depths:
+            if current not in bases or current in chain:
+                chain = []
+                break
+            chain.append(current)
+            current = bases[current]
+        else:
+            depth = -1 if current is None else depths[current]
+            for link in reversed(chain):
+                depth += 1
+                depths[link] = depth
+    return depths
+
+
+def entry_sizes(pack: PackReader) -> Dict[int, int]:
+    """
+    Bytes on disk of every entry of a pack, from the gaps between the
+    offsets of all its entries in pack order.
+    """
+    index = pack.index
+    offsets = [index.offset_at(position) for position in pack.pack_order()]
+    offsets.append(len(pack) - 20)
+    return {offset: next_offset - offset
+            for offset, next_offset in zip(offsets, offsets[1:])}
+
+
+def _chain_costs(
+    bases: Dict[int, Optional[int]],
+    depths: Dict[int, int],
+    sizes: Dict[int, int],
+    limit: int,
+) -> Tuple[int, int]:
+    """
+    Bytes inflated to read every object once with a cold cache, with the
+    chains as they are and with them capped at limit.
+
+    The delta forest is walked once from its roots, keeping the cost of
+    every chain prefix on the current path, so no chain is walked again
+    for each object on it.
+    """
+    children: Dict[int, List[int]] = defaultdict(list)
+    stack: List[Tuple[int, int]] = []
+    for offset in depths:
+        base = bases[offset]
+        if base is None:
+            stack.append((offset, 0))
+        else:
+            children[base].append(offset)
+
+    total = capped = 0
+    # path[d]: bytes inflated to read the entry at depth d of the path
+    path: List[int] = []
+    while stack:
+        offset, depth = stack.pop()
+        del path[depth:]
+        cost = sizes[offset] + (path[-1] if path else 0)
+        path.append(cost)
+        total += cost
+        # a capped chain stops limit entries below this one
+        capped += cost - (path[depth - limit - 1] if depth > limit else 0)
+        stack.extend((child, depth + 1) for child in children[offset])
+    return total, capped
+
+
+def analyze_delta_chains(
+    pack: PackReader, worst: int = 10, max_depth: int = DEFAULT_MAX_DEPTH
+) -> Dict[str, object]:
+    """
+    Build the delta dependency forest of a pack from headers alone and
+    measure what its chains cost readers.
+
+    Read amplification is the number of entries (and of compressed bytes)
+    inflated per object read with a cold cache, averaged over the pack.
+    The repacked estimate caps every chain at max_depth, as
+    git repack -f --depth=max_depth would, keeping the same entry sizes.
+
+    Args:
+        pack: Open PackReader
+        worst: How many of the deepest chains and most shared bases to list
+        max_depth: Chain depth a repack would allow
+
+    Returns:
+        dict with objects, deltas, max_depth, histogram (depth -> count),
+        worst (dicts with sha, depth, chain and root), shared_bases (dicts
+        with sha and dependents, the deltas whose chain ends there),
+        amplification, byte_amplification and their repacked_ estimates
+    """
+    index = pack.index
+    shas = {index.offset_at(position): index.sha_at(position)
+            for position in range(len(index))}
+    bases = delta_bases(pack)
+    depths = chain_depths(bases)
+    sizes = entry_sizes(pack)
+
+    roots: Dict[int, int] = {}
+    for offset in sorted(depths, key=depths.get):
+        base = bases[offset]
+        roots[offset] = offset if base is None else roots[base]
+    dependents = Counter(
+        roots[offset] for offset, depth in depths.items() if depth)
+
+    deepest = heapq.nlargest(worst, depths, key=lambda offset: (
+        depths[offset], -offset))
+    worst_chains = []
+    for offset in deepest:
+        chain = [shas[offset].hex()]
+        link = bases[offset]
+        while link is not None:
+            chain.append(shas[link].hex())
+            link = bases[link]
+        worst_chains.append({
+            "sha": shas[offset].hex(), "depth": depths[offset],
+            "chain": chain, "root": chain[-1],
+        })
+
+    count = len(depths)
+    total_bytes = sum(sizes[offset] for offset in depths) or 1
+    chain_bytes, capped_bytes = _chain_costs(bases, depths, sizes, max_depth)
+    return {
+        "objects": count,
+        "deltas": sum(1 for depth in depths.values() if depth),
+        "max_depth": max(depths.values(), default=0),
+        "histogram": dict(sorted(Counter(depths.values()).items())),
+        "worst": worst_chains,
+        "shared_bases": [
+            {"sha": shas[root].hex(), "dependents": n}
+            for root, n in dependents.most_common(worst)
+        ],
+        "amplification": sum(depth + 1 for depth in depths.values())
+        / (count or 1),
+        "repacked_amplification": sum(
+            min(depth, max_depth) + 1 for depth in depths.values())
+        / (count or 1),
+        "byte_amplification": chain_bytes / total_bytes,
+        "repacked_byte_amplification": capped_bytes / total_bytes,
+    }
@@ -0,0 +1,263 @@
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha1
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import os
+import struct
+
+from guardian.object_scanner import (
+    IDX_MAGIC,
+    RIDX_MAGIC,
+    PackIndex,
+    PackReader,
+    TYPE_MAP,
+    apply_delta,
+)
+
+# below this many deltas starting worker processes costs more than it saves
+PARALLEL_MIN_DELTAS = 1000
+
+Children = Dict[object, List[int]]  # base offset or base SHA -> delta offsets
+
+
+def _object_sha(type_id: int, data: bytes) -> bytes:
+    header = f"{TYPE_MAP[type_id]} {len(data)}\0".encode("ascii")
+    hasher = sha1(header)
+    hasher.update(data)
+    return hasher.digest()
+
+
+def scan_pack_entries(
+    pack: PackReader,
+) -> Tuple[List[int], List[int], List[Optional[bytes]], Children]:
+    """
+    Walk a pack front to back without its idx, inflating each entry to
+    find where the next one starts.
+
+    Returns (offsets, crc32s, shas, children) in pack order. The SHA of
+    every non-delta object is computed on the way; deltas get None and
+    are listed in children under their base offset (ofs_delta) or base
+    SHA (ref_delta).
+    """
+    offsets, crcs, shas = [], [], []
+    children: Children = defaultdict(list)
+    end = len(pack) - 20
+    pos = 12
+    pack.advise(sequential=True)
+    try:
+        for _ in range(pack.object_count):
+            type_id, size, data_pos, base = pack.read_entry(pos)
+            what = "object" if base is None else "delta"
+            data, consumed = pack.inflate(data_pos, size, what)
+            next_pos = data_pos + consumed
+            offsets.append(pos)
+            crcs.append(pack.crc32(pos, next_pos))
+            if base is None:
+                shas.append(_object_sha(type_id, data))
+            else:
+                shas.append(None)
+                children[base].append(pos)
+            pos = next_pos
+    finally:
+        pack.advise(sequential=False)
+    if pos != end:
+        raise ValueError(f"{end - pos} unexpected bytes after the last object")
+    return offsets, crcs, shas, dict(children)
+
+
+def _resolve_roots(
+    pack: PackReader,
+    children: Children,
+    roots: List[Tuple[int, bytes]],
+) -> List[Tuple[int, bytes]]:
+    """
+    Apply every delta built on top of the given non-delta objects.
+    Returns (offset, sha) for each delta resolved.
+
+    The walk is depth first and a delta only holds a reference to its
+    base's data, so memory stays proportional to the chain depth.
+    """
+    resolved = []
+    for root_offset, root_sha in roots:
+        type_id, data = pack.resolve(root_offset)
+        stack = [
+            (child, data)
+            for child in children.get(root_offset, []) + children.get(root_sha, [])
+        ]
+        while stack:
+            offset, base = stack.pop()
+            _, size, data_pos, _ = pack.read_entry(offset)
+            delta, _ = pack.inflate(data_pos, size, "delta")
+            data = apply_delta(base, delta)
+            sha = _object_sha(type_id, data)
+            resolved.append((offset, sha))
+            stack.extend(
+                (child, data)
+                for child in children.get(offset, []) + children.get(sha, [])
+            )
+    return resolved
+
+
+_worker_pack: Optional[PackReader] = None
+_worker_children: Children = {}
+
+
+def _init_worker(packfile_path: Path, children: Children) -> None:
+    global _worker_pack, _worker_children
+    _worker_pack = PackReader(packfile_path)
+    _worker_children = children
+
+
+def _resolve_batch(roots: List[Tuple[int, bytes]]) -> List[Tuple[int, bytes]]:
+    return _resolve_roots(_worker_pack, _worker_children, roots)
+
+
+def resolve_deltas(
+    pack: PackReader,
+    offsets: List[int],
+    shas: List[Optional[bytes]],
+    children: Children,
+    workers: Optional[int] = None,
+) -> None:
+    """
+    Fill in the SHA of every delta in shas (as returned by
+    scan_pack_entries), spreading the delta trees over worker processes.
+    """
+    roots = [
+        (offset, sha) for offset, sha in zip(offsets, shas)
+        if sha is not None and (offset in children or sha in children)
+    ]
+    delta_count = sum(sha is None for sha in shas)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or delta_count < PARALLEL_MIN_DELTAS:
+        results = [_resolve_roots(pack, children, roots)]
+    else:
+        batch = max(1, len(roots) // (workers * 4))
+        batches = [roots[i:i + batch] for i in range(0, len(roots), batch)]
+        with ProcessPoolExecutor(
+            workers, initializer=_init_worker,
+            initargs=(pack.path, children),
+        ) as executor:
+            results = list(executor.map(_resolve_batch, batches))
+
+    positions = {offset: i for i, offset in enumerate(offsets)}
+    for resolved in results:
+        for offset, sha in resolved:
+            shas[positions[offset]] = sha
+    unresolved = sum(sha is None for sha in shas)
+    if unresolved:
+        raise ValueError(
+            f"{unresolved} deltas have no base in the pack (thin pack?)"
+        )
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp_path = path.with_name(f"tmp_{path.name}_{os.getpid()}")
+    tmp_path.write_bytes(data)
+    os.chmod(tmp_path, 0o444)
+    os.replace(tmp_path, path)
+
+
+def pack_index_bytes(
+    objects: List[Tuple[bytes, int, int]], pack_checksum: bytes
+) -> bytes:
+    """
+    Serialize an idx v2 file from (sha, crc32, offset) sorted by SHA.
+    Offsets past 2 GiB go to the 64-bit table, as git writes them.
+    """
+    fanout = [0] * 256
+    for sha, _, _ in objects:
+        fanout[sha[0]] += 1
+    for i in range(1, 256):
+        fanout[i] += fanout[i - 1]
+
+    small_offsets = []
+    large_offsets = []
+    for _, _, offset in objects:
+        if offset < 0x80000000:
+            small_offsets.append(offset)
+        else:
+            small_offsets.append(0x80000000 | len(large_offsets))
+            large_offsets.append(offset)
+
+    out = bytearray(IDX_MAGIC)
+    out += struct.pack(">I256I", 2, *fanout)
+    out += b"".join(sha for sha, _, _ in objects)
+    out += struct.pack(f">{len(objects)}I", *(crc for _, crc, _ in objects))
+    out += struct.pack(f">{len(objects)}I", *small_offsets)
+    out += struct.pack(f">{len(large_offsets)}Q", *large_offsets)
+    out += pack_checksum
+    out += sha1(out).digest()
+    return bytes(out)
+
+
+def reverse_index_bytes(
+    objects: List[Tuple[bytes, int, int]], pack_checksum: bytes
+) -> bytes:
+    """
+    Serialize a .rev file: the idx position of every object in pack order.
+    """
+    order = sorted(range(len(objects)), key=lambda i: objects[i][2])
+    out = bytearray(RIDX_MAGIC)
+    out += struct.pack(">II", 1, 1)  # version, SHA-1
+    out += struct.pack(f">{len(order)}I", *order)
+    out += pack_checksum
+    out += sha1(out).digest()
+    return bytes(out)
+
+
+def index_pack(
+    packfile_path: Path,
+    write_rev: bool = False,
+    workers: Optional[int] = None,
+) -> Path:
+    """
+    Rebuild the .idx of a pack from the pack alone, like git index-pack.
+
+    Args:
+        packfile_path: Path to the .pack file
+        write_rev: Also write the .rev reverse index next to it
+        workers: Processes resolving deltas (CPU count when None)
+
+    Returns:
+        Path of the idx written
+    """
+    with PackReader(packfile_path) as pack:
+        if not pack.verify_checksum():
+            raise ValueError(f"Pack checksum mismatch: {packfile_path}")
+        offsets, crcs, shas, children = scan_pack_entries(pack)
+        resolve_deltas(pack, offsets, shas, children, workers)
+        checksum = pack.checksum
+
+    objects = sorted(zip(shas, crcs, offsets))
+    for (sha, _, _), (next_sha, _, _) in zip(objects, objects[1:]):
+        if sha == next_sha:
+            raise ValueError(f"Duplicate object {sha.hex()} in pack")
+
+    idx_path = packfile_path.with_suffix(".idx")
+    _write_atomic(idx_path, pack_index_bytes(objects, checksum))
+    if write_rev:
+        _write_atomic(
+            packfile_path.with_suffix(".rev"),
+            reverse_index_bytes(objects, checksum),
+        )
+    return idx_path
+
+
+def index_is_usable(packfile_path: Path) -> bool:
+    """
+    True when the pack's .idx exists, is intact and belongs to this pack
+    """
+    idx_path = packfile_path.with_suffix(".idx")
+    if not idx_path.is_file():
+        return False
+    try:
+        with open(packfile_path, "rb") as f:
+            f.seek(-20, os.SEEK_END)
+            pack_checksum = f.read(20)
+        with PackIndex(idx_path) as index:
+            return index.verify_checksum() \
+                and index.pack_checksum == pack_checksum
+    except (ValueError, OSError):
+        return False
@@ -0,0 +1,102 @@
+from hashlib import sha1
+from pathlib import Path
+from typing import List, Optional
+import os
+import struct
+import zlib
+
+from guardian.object_scanner import PackIndex, find_idx_path
+
+VERIFY_CHUNK = 1024 * 1024
+
+
+def verify_pack_fast(
+    packfile_path: Path, index: Optional[PackIndex] = None
+) -> List[str]:
+    """
+    Screen a pack for corruption without inflating a single object.
+
+    The pack is read once, front to back: every entry's raw bytes are
+    checked against the CRC32 recorded in the idx while the same bytes
+    feed the pack's trailing SHA-1. The idx's own checksum and the pack
+    checksum it was built for are checked too.
+
+    Args:
+        packfile_path: Path to the .pack file
+        index: Already open PackIndex of the pack
+
+    Returns:
+        List of the problems found, empty when the pack is intact
+    """
+    own_index = index is None
+    if own_index:
+        index = PackIndex(find_idx_path(packfile_path))
+    try:
+        return _verify_pack(packfile_path, index)
+    finally:
+        if own_index:
+            index.close()
+
+
+def _verify_pack(packfile_path: Path, index: PackIndex) -> List[str]:
+    problems = []
+    if not index.verify_checksum():
+        problems.append("Index checksum mismatch")
+
+    entries = sorted(
+        (offset, position)
+        for position, (_, offset) in enumerate(index)
+    )
+
+    with open(packfile_path, "rb", buffering=VERIFY_CHUNK) as f:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        end = os.fstat(f.fileno()).st_size - 20
+        header = f.read(12)
+        if len(header) < 12 or end < 12 or header[:4] != b"PACK":
+            return problems + ["Not a valid packfile"]
+        count = struct.unpack(">I", header[8:])[0]
+        if count != index.object_count:
+            problems.append(
+                f"Pack has {count} objects but the index lists "
+                f"{index.object_count}"
+            )
+        digest = sha1(header)
+        pos = 12
+
+        for i, (offset, position) in enumerate(entries):
+            next_offset = entries[i + 1][0] if i + 1 < len(entries) else end
+            sha = index.sha_at(position).hex()
+            if offset < pos or next_offset > end:
+                problems.append(f"Bad offset {offset} for {sha}")
+                break
+            if offset > pos:
+                problems.append(f"{offset - pos} unindexed bytes at {pos}")
+                _feed(f, offset - pos, digest)
+            crc = _feed(f, next_offset - offset, digest)
+            if crc != index.crc32_at(position):
+                problems.append(f"CRC32 mismatch for {sha} at offset {offset}")
+            pos = next_offset
+        else:
+            if pos < end:
+                problems.append(f"{end - pos} unindexed bytes at {pos}")
+                _feed(f, end - pos, digest)
+            trailer = f.read(20)
+            if digest.digest() != trailer:
+                problems.append("Pack checksum mismatch")
+            if trailer != index.pack_checksum:
+                problems.append("Index was built for a different pack")
+    return problems
+
+
+def _feed(f, size: int, digest) -> int:
+    """Read size bytes into digest; returns their CRC32"""
+    crc = 0
+    while size:
+        chunk = f.read(min(size, VERIFY_CHUNK))
+        if not chunk:
+            raise ValueError("Packfile is truncated")
+        digest.update(chunk)
+        crc = zlib.crc32(chunk, crc)
+        size -= len(chunk)
+    return crc
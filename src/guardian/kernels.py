@@ -0,0 +1,15 @@
+# The hot loops of object reading: pack entry headers, ofs_delta
+# distances, delta application and commit header parsing. guardian.cy
+# compiles them with Cython when the package is built with it; otherwise
+# the identical pure-Python versions in guardian.pykernels are used.
+try:
+    from guardian import cy as implementation
+except ImportError:
+    from guardian import pykernels as implementation
+
+COMPILED = implementation.__name__ == "guardian.cy"
+
+apply_delta = implementation.apply_delta
+decode_ofs_distance = implementation.decode_ofs_distance
+parse_commit_content = implementation.parse_commit_content
+parse_entry_header = implementation.parse_entry_header
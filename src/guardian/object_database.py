@@ -0,0 +1,219 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Collection, Iterator, List, Optional, Set, Tuple
+
+from guardian.object_scanner import (
+    DeltaBaseCache,
+    GitObject,
+    PackDirectory,
+    PackReader,
+    TYPE_MAP,
+    iter_packfile,
+    read_loose_file,
+    read_loose_header,
+    scan_loose_objects,
+)
+from guardian.utils import list_loose_objects
+
+NEGATIVE_CACHE_SIZE = 4096
+
+
+def read_alternates(objects_dir: Path) -> List[Path]:
+    """
+    Returns the object directories listed in objects/info/alternates.
+    Relative entries are relative to objects_dir.
+    """
+    alternates_file = objects_dir / "info" / "alternates"
+    if not alternates_file.is_file():
+        return []
+    alternates = []
+    for line in alternates_file.read_text().splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        path = Path(line)
+        if not path.is_absolute():
+            path = objects_dir / path
+        alternates.append(path.resolve())
+    return alternates
+
+
+class ObjectDatabase:
+    """
+    One handle on every object of a repository: loose objects, all packs
+    (through the multi-pack-index when present) and the object directories
+    listed in objects/info/alternates.
+
+    Misses are remembered in a small negative cache so repeated lookups of
+    absent objects don't probe every pack again, and the pack list is
+    reloaded when objects/pack changes.
+    """
+
+    def __init__(
+        self,
+        objects_dir: Path,
+        cache: Optional[DeltaBaseCache] = None,
+        _seen: Optional[Set[Path]] = None,
+    ):
+        self.objects_dir = objects_dir
+        self.cache = cache if cache is not None else DeltaBaseCache()
+        self._pack_dir = objects_dir / "pack"
+        self._packs: Optional[PackDirectory] = None
+        self._packs_mtime: Optional[int] = None
+        self._misses: OrderedDict[bytes, None] = OrderedDict()
+
+        seen = _seen if _seen is not None else set()
+        seen.add(objects_dir.resolve())
+        self.alternates: List[ObjectDatabase] = []
+        for alternate in read_alternates(objects_dir):
+            if alternate in seen or not alternate.is_dir():
+                continue
+            self.alternates.append(ObjectDatabase(alternate, self.cache, seen))
+
+    @classmethod
+    def open(cls, git_dir: Path) -> "ObjectDatabase":
+        """Open the object database of a .git directory"""
+        return cls(git_dir / "objects")
+
+    def __enter__(self) -> "ObjectDatabase":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._packs is not None:
+            self._packs.close()
+            self._packs = None
+        for alternate in self.alternates:
+            alternate.close()
+
+    def _pack_dir_mtime(self) -> Optional[int]:
+        try:
+            return self._pack_dir.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _refresh_packs(self) -> bool:
+        """Reload the pack list if objects/pack changed; True if it did"""
+        mtime = self._pack_dir_mtime()
+        if self._packs is not None and mtime == self._packs_mtime:
+            return False
+        if self._packs is not None:
+            self._packs.close()
+        self._packs = PackDirectory(self._pack_dir, self.cache)
+        self._packs_mtime = mtime
+        self._misses.clear()
+        return True
+
+    @property
+    def packs(self) -> PackDirectory:
+        if self._packs is None:
+            self._refresh_packs()
+        return self._packs
+
+    @property
+    def pack_paths(self) -> List[Path]:
+        return self.packs.pack_paths
+
+    def loose_objects(self) -> List[Path]:
+        """Paths of this database's own loose object files"""
+        return list_loose_objects(self.objects_dir)
+
+    def _loose_path(self, hexsha: str) -> Path:
+        return self.objects_dir / hexsha[:2] / hexsha[2:]
+
+    def _find_packed(self, binsha: bytes) -> Optional[Tuple[Path, int]]:
+        if binsha in self._misses:
+            if not self._refresh_packs():
+                self._misses.move_to_end(binsha)
+                return None
+        location = self.packs.find(binsha)
+        if location is None and self._refresh_packs():
+            location = self.packs.find(binsha)
+        if location is None:
+            self._misses[binsha] = None
+            if len(self._misses) > NEGATIVE_CACHE_SIZE:
+                self._misses.popitem(last=False)
+        return location
+
+    def locate(self, sha) -> Optional[Tuple["ObjectDatabase", object]]:
+        """
+        Find where sha lives. Returns (database, loose path) or
+        (database, (pack path, offset)), or None when it's missing.
+        """
+        binsha, hexsha = _both_forms(sha)
+        loose_path = self._loose_path(hexsha)
+        if loose_path.is_file():
+            return self, loose_path
+        location = self._find_packed(binsha)
+        if location is not None:
+            return self, location
+        for alternate in self.alternates:
+            found = alternate.locate(binsha)
+            if found is not None:
+                return found
+        return None
+
+    def __contains__(self, sha) -> bool:
+        return self.locate(sha) is not None
+
+    def reader(self, pack_path: Path) -> PackReader:
+        """Shared PackReader for one of this database's packs"""
+        return self.packs.reader(pack_path)
+
+    def read_object(self, sha) -> GitObject:
+        """Read and verify any object by SHA (hex or 20 raw bytes)"""
+        found = self.locate(sha)
+        if found is None:
+            raise ValueError(f"Object with SHA {_both_forms(sha)[1]} not found")
+        odb, location = found
+        if isinstance(location, Path):
+            return read_loose_file(location)
+        pack_path, offset = location
+        return odb.reader(pack_path).extract_object(offset)
+
+    def object_info(self, sha) -> Tuple[str, int]:
+        """(obj_type, size) of an object without inflating its body"""
+        found = self.locate(sha)
+        if found is None:
+            raise ValueError(f"Object with SHA {_both_forms(sha)[1]} not found")
+        odb, location = found
+        if isinstance(location, Path):
+            return read_loose_header(location)
+        pack_path, offset = location
+        type_id, size = odb.reader(pack_path).object_info(offset)
+        return TYPE_MAP[type_id], size
+
+    def iter_objects(
+        self,
+        types: Optional[Collection[str]] = None,
+        skip_errors: bool = True,
+        lazy: bool = False,
+    ) -> Iterator[GitObject]:
+        """
+        Yield every object of the database (alternates included)
+        one at a time, loose objects first.
+        """
+        for obj in scan_loose_objects(
+            self.loose_objects(), skip_errors=skip_errors, lazy=lazy
+        ):
+            if types is None or obj.obj_type in types:
+                yield obj
+        for pack_path in self.pack_paths:
+            try:
+                yield from iter_packfile(
+                    pack_path, types, self.reader(pack_path), skip_errors, lazy
+                )
+            except Exception as e:
+                if not skip_errors:
+                    raise
+                print(f"Error reading packfile {pack_path}: {e}")
+        for alternate in self.alternates:
+            yield from alternate.iter_objects(types, skip_errors, lazy)
+
+
+def _both_forms(sha) -> Tuple[bytes, str]:
+    if isinstance(sha, str):
+        return bytes.fromhex(sha), sha
+    return sha, sha.hex()
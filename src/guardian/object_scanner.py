@@ -1,22 +1,129 @@
-from dataclasses import dataclass
-from typing import Literal, List, Dict
+from functools import partial
+from typing import Literal, Union, List, Dict, Optional, Tuple, Iterator, \
+    Collection, Callable, Iterable, Deque, TypeVar, Hashable
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, \
+    ThreadPoolExecutor
 from pathlib import Path
 from hashlib import sha1
+import itertools
+import mmap
+import os
 import zlib
 import struct
+import sys
+
+from guardian.kernels import apply_delta, decode_ofs_distance, \
+    parse_entry_header
+from guardian.pykernels import Body, read_delta_size
+from guardian.utils import find_loose_objects, find_packfiles
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+TYPE_MAP = {
+    1: "commit",
+    2: "tree",
+    3: "blob",
+    4: "tag",
+}
+
+TYPE_IDS = {name: type_id for type_id, name in TYPE_MAP.items()}
+
+ObjectType = Literal["blob", "tree", "commit", "tag"]
+
+# "commit 18446744073709551615\0" is the longest possible loose header
+LOOSE_HEADER_MAX = 32
 
 
-@dataclass
 class GitObject:
-    """Class representing a Git object and its metadata"""
-    obj_type: Literal["blob", "tree", "commit", "tag"]
-    sha: str
-    size: int
-    content: bytes
+    """
+    Class representing a Git object and its metadata.
+
+    Stored compactly: a 20-byte binary SHA, the pack type code and the size.
+    Content is either held directly or produced by a loader callable each
+    time it's accessed, so metadata-only scans never keep bodies around.
+    Bodies are bytes or read-only memoryviews over the buffer they were
+    inflated into; both compare equal to bytes and work with hashlib,
+    zlib and the parsers here. Pickling turns a view into bytes and
+    drops the loader.
+    """
+
+    __slots__ = ("binsha", "type_id", "size", "_content", "_loader")
+
+    def __init__(
+        self,
+        obj_type: Union[ObjectType, int],
+        sha: Union[str, bytes],
+        size: int,
+        content: Optional[Body] = None,
+        loader: Optional[Callable[[], Body]] = None,
+    ):
+        if isinstance(obj_type, str):
+            if obj_type not in TYPE_IDS:
+                raise ValueError(f"Unknown object obj_type -> {obj_type}")
+            obj_type = TYPE_IDS[obj_type]
+        self.type_id = obj_type
+        self.binsha = bytes.fromhex(sha) if isinstance(sha, str) else sha
+        self.size = size
+        self._content = content
+        self._loader = loader
+
+    @property
+    def obj_type(self) -> ObjectType:
+        return TYPE_MAP[self.type_id]
+
+    @property
+    def sha(self) -> str:
+        """Hex view of the binary SHA"""
+        return self.binsha.hex()
+
+    @sha.setter
+    def sha(self, value: str) -> None:
+        self.binsha = bytes.fromhex(value)
+
+    @property
+    def content(self) -> Body:
+        """Object body, loaded on demand (and not kept) for lazy objects"""
+        if self._content is None and self._loader is not None:
+            return self._loader()
+        return self._content
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._content is not None
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, GitObject):
+            return NotImplemented
+        return (self.binsha, self.type_id, self.size) == \
+            (other.binsha, other.type_id, other.size)
+
+    def __hash__(self) -> int:
+        return hash(self.binsha)
+
+    def __reduce__(self):
+        content = self._content
+        if isinstance(content, memoryview):
+            content = content.tobytes()
+        return GitObject, (self.type_id, self.binsha, self.size, content)
+
+    def __repr__(self) -> str:
+        return (f"GitObject(obj_type={self.obj_type!r}, sha={self.sha!r}, "
+                f"size={self.size})")
+
+
+OFS_DELTA = 6   # offset delta
+REF_DELTA = 7   # ref delta
+
+# same default as git's core.deltaBaseCacheLimit
+DELTA_BASE_CACHE_LIMIT = 96 * 1024 * 1024
 
 
 def read_loose(object_dir: Path) -> GitObject:
-    """Read a loose Git object given its path"""
+    """Read the first loose Git object found in a fan-out directory"""
     if not object_dir.is_dir() or len(object_dir.stem) != 2:
         raise ValueError(
             f"Path must be a directory with 2 digits {object_dir.stem}"
@@ -29,39 +136,62 @@ def read_loose(object_dir: Path) -> GitObject:
     if not object_file_path.is_file():
         raise ValueError("Path must be a file!")
 
-    sha_parent = object_dir.name
-    sha_child = object_file_path.name
-    sha = sha_parent + sha_child
+    return read_loose_file(object_file_path)
 
+
+def read_loose_file(object_file_path: Path) -> GitObject:
+    """Read a loose Git object given the path of its file"""
+    sha = object_file_path.parent.name + object_file_path.name
     with open(object_file_path, "rb") as f:
-        compressed_data = f.read()
+        return loose_object_from_bytes(sha, f.read())
+
+
+def loose_object_from_bytes(sha: str, compressed_data: Body) -> GitObject:
+    """
+    Inflate and verify the raw contents of a loose object file,
+    already read from disk, whose name says its SHA is sha.
+    """
+    try:
         decompressed_data = zlib.decompress(compressed_data)
+    except zlib.error as e:
+        raise ValueError(f"Failed to decompress object data: {e}")
 
-        null_pos = decompressed_data.find(b'\0')
-        if null_pos == -1:
-            raise ValueError("Malformed header!!")
+    obj_type, size, body_start = _parse_loose_header(decompressed_data)
 
-        header = decompressed_data[:null_pos].decode('ascii')
-        content = decompressed_data[null_pos+1:]
+    calculated_sha = sha1(decompressed_data).hexdigest()
+    if calculated_sha != sha:
+        raise ValueError(f"SHA mismatch! {sha} is not {calculated_sha}")
 
-        obj_type, size_str = header.split(' ')
-        if obj_type not in ["blob", "tree", "commit", "tag"]:
-            raise ValueError(f"Unknown object obj_type -> {obj_type}")
+    # the body stays in the inflated buffer instead of being sliced out
+    content = memoryview(decompressed_data)[body_start:]
+    if size != len(content):
+        raise ValueError(f"Size mismatch! {size} != {len(content)}")
 
-        calculated_sha = sha1(decompressed_data).hexdigest()
-        if calculated_sha != sha:
-            raise ValueError(f"SHA mismatch! {sha} is not {calculated_sha}")
+    return GitObject(
+        obj_type=obj_type,
+        sha=sha,
+        size=size,
+        content=content,
+    )
 
-        size = int(size_str)
-        if size != len(content):
-            raise ValueError(f"Size mismatch! {size} != {len(content)}")
 
-        return GitObject(
-            obj_type=obj_type,
-            sha=sha,
-            size=size,
-            content=content,
-        )
+def _parse_loose_header(data: bytes) -> Tuple[str, int, int]:
+    """
+    Parse the "<type> <size>\\0" header at the start of an inflated loose
+    object in place. Returns (obj_type, size, offset of the body).
+    """
+    null_pos = data.find(b'\0', 0, LOOSE_HEADER_MAX)
+    space = data.find(b' ', 0, null_pos)
+    if null_pos == -1 or space == -1:
+        raise ValueError("Malformed header!!")
+    obj_type = data[:space].decode('ascii', 'replace')
+    if obj_type not in TYPE_IDS:
+        raise ValueError(f"Unknown object obj_type -> {obj_type}")
+    try:
+        size = int(data[space + 1:null_pos])
+    except ValueError:
+        raise ValueError("Malformed header!!")
+    return obj_type, size, null_pos + 1
 
 
 def find_idx_path(packfile_path: Path) -> Path:
@@ -72,150 +202,1162 @@ def find_idx_path(packfile_path: Path) -> Path:
     return idx_path
 
 
-def get_object_offsets(idx_path: Path) -> Dict[str, int]:
+IDX_MAGIC = b"\xff\x74\x4f\x63"  # magic number for idx files
+RIDX_MAGIC = b"RIDX"  # magic number for .rev reverse indexes
+
+
+def bisect_sha_table(
+    buf, table_start: int, fanout: Tuple[int, ...], sha
+) -> Optional[int]:
     """
-    Extract SHA so we can find the object in the packfile
-    using offsets
+    Binary-search a sorted table of 20-byte SHAs inside the range
+    given by a 256-entry fanout. sha may be raw bytes or hex.
+    """
+    if isinstance(sha, str):
+        sha = bytes.fromhex(sha)
+    first = sha[0]
+    low = fanout[first - 1] if first else 0
+    high = fanout[first]
+    while low < high:
+        mid = (low + high) // 2
+        pos = table_start + 20 * mid
+        probe = buf[pos:pos + 20]
+        if probe < sha:
+            low = mid + 1
+        elif probe > sha:
+            high = mid
+        else:
+            return mid
+    return None
+
+
+class PackIndex:
+    """
+    Memory-mapped pack idx (version 2).
+
+    Lookups use the 256-entry fanout to narrow the range and then
+    binary-search the raw 20-byte SHA table, so nothing is decoded
+    up front and no per-object Python objects are built.
     """
-    sha_to_offset = {}
 
-    with open(idx_path, "rb") as f:
-        if f.read(4) != b"\xff\x74\x4f\x63":  # magic number for idx files
+    def __init__(self, idx_path: Path):
+        self.path = idx_path
+        with open(idx_path, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty files can't be mapped
+                raise ValueError("Invalid index file header")
+        if self._map[:4] != IDX_MAGIC:
+            self.close()
             raise ValueError("Invalid index file header")
-        if struct.unpack(">I", f.read(4))[0] != 2:  # Version
+        if struct.unpack_from(">I", self._map, 4)[0] != 2:  # Version
+            self.close()
             raise ValueError("Only version 2 index files are supported")
-        fanout = struct.unpack(">" + "I" * 256, f.read(4 * 256))
-        object_count = fanout[255]
-        shas = [f.read(20).hex() for _ in range(object_count)]
-        f.seek(4 * object_count, 1)  # skip CRC32 values
-        offsets = list(
-            struct.unpack(">" + "I" * object_count, f.read(4 * object_count))
-            )
-        for i, sha in enumerate(shas):
-            offset = offsets[i]
-            # this is because the offset is
-            # 0x80000000 + offset for delta objects
-            # and we need to remove the MSB flag
-            if offset & 0x80000000:
-                pass
-            sha_to_offset[sha] = offset & 0x7FFFFFFF  # remove MSB flag
-    return sha_to_offset
+        self.fanout = struct.unpack_from(">256I", self._map, 8)
+        self.object_count = self.fanout[255]
+        self._sha_start = 8 + 4 * 256
+        self._crc_start = self._sha_start + 20 * self.object_count
+        self._offset_start = self._crc_start + 4 * self.object_count
+        self._large_start = self._offset_start + 4 * self.object_count
+        if len(self._map) < self._large_start + 40:
+            self.close()
+            raise ValueError("Index file is truncated")
 
+    def __enter__(self) -> "PackIndex":
+        return self
 
-def extract_object_at_offset(packfile_path: Path, offset: int) -> GitObject:
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.object_count
+
+    def __contains__(self, sha) -> bool:
+        return self.find_position(sha) is not None
+
+    def __iter__(self):
+        """Yield (binary sha, offset) in SHA order"""
+        for position in range(self.object_count):
+            yield self.sha_at(position), self.offset_at(position)
+
+    def close(self) -> None:
+        if not self._map.closed:
+            self._map.close()
+
+    def sha_at(self, position: int) -> bytes:
+        start = self._sha_start + 20 * position
+        return self._map[start:start + 20]
+
+    def crc32_at(self, position: int) -> int:
+        return struct.unpack_from(
+            ">I", self._map, self._crc_start + 4 * position
+        )[0]
+
+    def offset_at(self, position: int) -> int:
+        offset = struct.unpack_from(
+            ">I", self._map, self._offset_start + 4 * position
+        )[0]
+        if not offset & 0x80000000:
+            return offset
+        # with the MSB set the rest is an index into the 64-bit
+        # offset table used for entries past 2 GiB
+        large_pos = self._large_start + 8 * (offset & 0x7FFFFFFF)
+        if large_pos + 8 > len(self._map) - 40:
+            raise ValueError(f"Large offset index out of range at {position}")
+        return struct.unpack_from(">Q", self._map, large_pos)[0]
+
+    @property
+    def pack_checksum(self) -> bytes:
+        """SHA-1 trailer of the packfile this index was built for"""
+        return self._map[-40:-20]
+
+    def verify_checksum(self) -> bool:
+        """Recompute the SHA-1 over the index and compare it to its trailer"""
+        with memoryview(self._map) as view, view[:-20] as body:
+            return sha1(body).digest() == self._map[-20:]
+
+    def find_position(self, sha) -> Optional[int]:
+        """
+        Position of sha (20 raw bytes or 40 hex chars) in the SHA table
+        """
+        return bisect_sha_table(self._map, self._sha_start, self.fanout, sha)
+
+    def find_offset(self, sha) -> Optional[int]:
+        """Pack offset of sha, or None when the pack doesn't have it"""
+        position = self.find_position(sha)
+        if position is None:
+            return None
+        return self.offset_at(position)
+
+
+def get_object_offsets(idx_path: Path) -> Dict[str, int]:
     """
-    Extract Git object using offset
-    """
-    with open(packfile_path, "rb") as f:
-        f.seek(offset, 0)
-        byte = ord(f.read(1))
-        obj_type_id = (byte >> 4) & 7  # extract bits 4-6
-        size = byte & 15  # extract bottom 4 bits
-        shift = 4
-        while byte & 0x80:
-            byte = ord(f.read(1))
-            size |= (byte & 0x7f) << shift
-            shift += 7
-
-        type_map = {
-            1: "commit",
-            2: "tree",
-            3: "blob",
-            4: "tag",
-            6: "ofs_delta",     # offset delta
-            7: "ref_delta"      # ref delta
-        }
-
-        if obj_type_id not in type_map:
-            raise ValueError(f"Unknown object type: {obj_type_id}")
-
-        obj_type = type_map[obj_type_id]
-
-        content = b""
-
-        if obj_type in ["ofs_delta", "ref_delta"]:
-            if obj_type == "ofs_delta":
-                base_offset = 0
-                shift = 0
-                byte = ord(f.read(1))
-                base_offset = byte & 0x7f
-                while byte & 0x80:
-                    byte = ord(f.read(1))
-                    base_offset |= (byte & 0x7f) << shift
-                    shift += 7
-            elif obj_type == "ref_delta":
-                pass
-                # base_sha = f.read(20).hex()
-            compressed_data = b""
-            chunk = f.read(4096)
-
-            while chunk:
-                compressed_data += chunk
-                try:
-                    content = zlib.decompress(compressed_data)
-                    break  # ok decompression
-                except zlib.error:
-                    chunk = f.read(4096)
-                    if not chunk:  # no more data
-                        raise ValueError("Failed to decompress delta data")
-            sha = f"delta_{offset}_{size}"
-        else:
-            compressed_data = b""
-            chunk = f.read(4096)
-
-            while chunk:
-                compressed_data += chunk
-                try:
-                    content = zlib.decompress(compressed_data)
-                    break  # ok decompression
-                except zlib.error:
-                    chunk = f.read(4096)
-                    if not chunk:  # no more data
-                        raise ValueError("Failed to decompress object data")
-
-            header_str = f"{obj_type} {size}".encode('ascii') + b'\0'
-            sha = sha1(header_str + content).hexdigest()
+    Extract SHA so we can find the object in the packfile
+    using offsets.
+    Builds the whole map; use PackIndex for point lookups.
+    """
+    with PackIndex(idx_path) as index:
+        return {sha.hex(): offset for sha, offset in index}
+
+
+def read_reverse_index(rev_path: Path, index: PackIndex) -> Optional[array]:
+    """
+    idx positions in pack order from a .rev file, or None when there is
+    no usable one (missing, malformed, corrupt or written for another
+    pack).
+    """
+    count = len(index)
+    try:
+        data = rev_path.read_bytes()
+    except OSError:
+        return None
+    if len(data) != 12 + 4 * count + 40 or data[:4] != RIDX_MAGIC \
+            or struct.unpack_from(">II", data, 4) != (1, 1):
+        return None
+    if data[12 + 4 * count:12 + 4 * count + 20] != index.pack_checksum:
+        return None
+    with memoryview(data) as view, view[:-20] as body:
+        if sha1(body).digest() != data[-20:]:
+            return None
+    positions = array("I", data[12:12 + 4 * count])
+    if positions.itemsize != 4:
+        return None
+    if sys.byteorder == "little":
+        positions.byteswap()
+    if positions and max(positions) >= count:
+        return None
+    return positions
+
+
+INFLATE_CHUNK = 64 * 1024
+# compressed bytes fed per step when only a delta's header is wanted
+DELTA_HEAD_CHUNK = 256
+# two size varints of up to ten bytes each
+DELTA_HEAD_MAX = 20
+
+
+def inflate_stream(
+    buffer, offset: int, size: int, what: str = "object"
+) -> Tuple[Body, int]:
+    """
+    Inflate the zlib stream starting at offset inside buffer.
+
+    The input is fed through memoryview slices so it's never copied, and
+    only as much of it as the stream needs is consumed. Returns the
+    inflated data and the number of compressed bytes used, which is where
+    the next pack entry starts.
+
+    Objects inflated in one go come back as bytes. Larger ones are
+    written piece by piece into a buffer of the declared size and come
+    back as a view of it, so the pieces are never joined into a copy.
+    """
+    view = memoryview(buffer)
+    end = len(view)
+    inflater = zlib.decompressobj()
+    data = b""
+    out: Optional[bytearray] = None
+    filled = 0
+    pos = offset
+    # incompressible data grows a little; most objects fit the first chunk
+    chunk = min(size + (size >> 10) + 64, INFLATE_CHUNK)
+    try:
+        while not inflater.eof:
+            if pos >= end:
+                raise ValueError(f"Failed to decompress {what} data")
+            with view[pos:pos + chunk] as piece:
+                pos += len(piece)
+                data = inflater.decompress(piece)
+            chunk = INFLATE_CHUNK
+            if out is None:
+                if inflater.eof:
+                    break
+                out = bytearray(size)
+            if filled + len(data) > size:
+                raise ValueError(f"Size mismatch! {size} < {filled + len(data)}")
+            out[filled:filled + len(data)] = data
+            filled += len(data)
+    except zlib.error as e:
+        raise ValueError(f"Failed to decompress {what} data: {e}")
+    finally:
+        view.release()
+
+    consumed = pos - offset - len(inflater.unused_data)
+    if out is not None:
+        if filled != size:
+            raise ValueError(f"Size mismatch! {size} != {filled}")
+        return memoryview(out).toreadonly(), consumed
+    if len(data) != size:
+        raise ValueError(f"Size mismatch! {size} != {len(data)}")
+    return data, consumed
+
+
+class DeltaBaseCache:
+    """
+    LRU cache of resolved delta bases keyed by pack offset,
+    bounded by the total number of bytes it holds.
+    Packs sharing one cache key their entries by (pack id, offset).
+    """
+
+    def __init__(self, limit: int = DELTA_BASE_CACHE_LIMIT):
+        self.limit = limit
+        self.size = 0
+        self._entries: OrderedDict[Hashable, Tuple[int, bytes]] = \
+            OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Tuple[int, bytes]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Hashable, type_id: int, data: bytes) -> None:
+        if len(data) > self.limit or key in self._entries:
+            return
+        self._entries[key] = (type_id, data)
+        self.size += len(data)
+        while self.size > self.limit:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+
+_pack_ids = itertools.count()
+
+
+class PackReader:
+    """
+    Memory-mapped packfile, opened once and shared by every object read.
+
+    Object headers are decoded straight from the mapped buffer so reading
+    an entry costs no extra open()/seek()/read() syscalls.
+    """
+
+    def __init__(
+        self, packfile_path: Path, cache: Optional["DeltaBaseCache"] = None
+    ):
+        self.path = packfile_path
+        self.cache = cache if cache is not None else DeltaBaseCache()
+        self._cache_id = next(_pack_ids)
+        self._index: Optional[PackIndex] = None
+        self._file = open(packfile_path, "rb")
+        try:
+            self._map = mmap.mmap(
+                self._file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        except ValueError:  # empty files can't be mapped
+            self._file.close()
+            raise ValueError("Not a valid packfile")
+        if self._map[:4] != b"PACK":
+            self.close()
+            raise ValueError("Not a valid packfile")
+        self.version, self.object_count = struct.unpack_from(
+            ">II", self._map, 4
+        )
+
+    def __enter__(self) -> "PackReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        """Size of the packfile in bytes"""
+        return len(self._map)
+
+    def close(self) -> None:
+        """Release the mapping and the file handle"""
+        if not self._map.closed:
+            self._map.close()
+        self._file.close()
+        if self._index is not None:
+            self._index.close()
+
+    def read_header(self, offset: int) -> Tuple[int, int, int]:
+        """
+        Decode the type/size varint of the entry at offset.
+        Returns (type_id, size, data_offset).
+        """
+        if not 12 <= offset < len(self._map) - 20:
+            raise ValueError(f"Offset {offset} is outside the packfile")
+        return parse_entry_header(self._map, offset)
+
+    def read_entry(self, offset: int) -> Tuple[int, int, int, object]:
+        """
+        Decode the whole header of the entry at offset, delta base included.
+        Returns (type_id, size, data_offset, base) where base is the base
+        offset of an ofs_delta, the base SHA of a ref_delta, or None.
+        """
+        type_id, size, pos = self.read_header(offset)
+        if type_id == OFS_DELTA:
+            distance, pos = decode_ofs_distance(self._map, pos)
+            if distance <= 0 or distance > offset:
+                raise ValueError(f"Bad delta base offset at {offset}")
+            return type_id, size, pos, offset - distance
+        if type_id == REF_DELTA:
+            return type_id, size, pos + 20, self._map[pos:pos + 20]
+        if type_id not in TYPE_MAP:
+            raise ValueError(f"Unknown object type: {type_id}")
+        return type_id, size, pos, None
+
+    def inflate(
+        self, data_offset: int, size: int, what: str = "object"
+    ) -> Tuple[bytes, int]:
+        """inflate_stream over the mapped pack; returns (data, consumed)"""
+        return inflate_stream(self._map, data_offset, size, what)
+
+    def crc32(self, start: int, end: int) -> int:
+        """CRC32 of the raw pack bytes in [start, end)"""
+        with memoryview(self._map) as view, view[start:end] as raw:
+            return zlib.crc32(raw)
+
+    def pack_order(self) -> array:
+        """
+        idx positions sorted by pack offset, read from the pack's .rev file
+        when it has a valid one and computed from the idx otherwise
+        """
+        index = self.index
+        positions = read_reverse_index(self.path.with_suffix(".rev"), index)
+        if positions is None:
+            positions = array("I", sorted(range(len(index)), key=index.offset_at))
+        return positions
+
+    def iter_entries(self) -> Iterator[Tuple[bytes, int]]:
+        """
+        Yield (binary sha, offset) of every object front to back through
+        the pack, so a full scan reads the file sequentially instead of
+        seeking around in SHA order.
+        """
+        index = self.index
+        self.advise(sequential=True)
+        try:
+            for position in self.pack_order():
+                yield index.sha_at(position), index.offset_at(position)
+        finally:
+            self.advise(sequential=False)
+
+    def advise(self, sequential: bool) -> None:
+        """
+        Hint the kernel that the pack is about to be read front to back
+        (more readahead, pages dropped behind) or back to random access.
+        """
+        if self._map.closed:
+            return
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            self._map.madvise(
+                mmap.MADV_SEQUENTIAL if sequential else mmap.MADV_NORMAL
+            )
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(
+                self._file.fileno(), 0, 0,
+                os.POSIX_FADV_SEQUENTIAL if sequential
+                else os.POSIX_FADV_NORMAL,
+            )
+
+    @property
+    def checksum(self) -> bytes:
+        """The pack's SHA-1 trailer"""
+        return self._map[-20:]
+
+    def verify_checksum(self) -> bool:
+        """Recompute the SHA-1 over the pack and compare it to its trailer"""
+        with memoryview(self._map) as view, view[:-20] as body:
+            return sha1(body).digest() == self._map[-20:]
+
+    @property
+    def index(self) -> PackIndex:
+        """The pack's idx, mapped on first use"""
+        if self._index is None:
+            self._index = PackIndex(find_idx_path(self.path))
+        return self._index
+
+    def _find_base_offset(self, base_sha: bytes) -> int:
+        offset = self.index.find_offset(base_sha)
+        if offset is None:
+            raise ValueError(
+                f"Delta base {base_sha.hex()} not found in packfile"
+            )
+        return offset
+
+    def read_type(
+        self, offset: int, memo: Optional[Dict[int, int]] = None
+    ) -> int:
+        """
+        Type of the object stored at offset, read from entry headers only.
+        Delta chains are followed to their base without inflating anything;
+        memo (offset -> type_id) short-cuts chains already walked.
+        """
+        chain = []
+        current = offset
+        while True:
+            if memo is not None and current in memo:
+                type_id = memo[current]
+                break
+            type_id, _, pos = self.read_header(current)
+            if type_id == OFS_DELTA:
+                distance, _ = decode_ofs_distance(self._map, pos)
+                if distance <= 0 or distance > current:
+                    raise ValueError(f"Bad delta base offset at {current}")
+                chain.append(current)
+                current -= distance
+            elif type_id == REF_DELTA:
+                chain.append(current)
+                current = self._find_base_offset(self._map[pos:pos + 20])
+            elif type_id in TYPE_MAP:
+                break
+            else:
+                raise ValueError(f"Unknown object type: {type_id}")
+
+            if len(chain) > self.object_count:
+                raise ValueError(f"Delta chain loop at offset {offset}")
+
+        if memo is not None:
+            for entry_offset in chain:
+                memo[entry_offset] = type_id
+        return type_id
+
+    def resolve(self, offset: int) -> Tuple[int, Body]:
+        """
+        Inflate the entry at offset, applying its delta chain if needed.
+        Returns (type_id, data) where type_id is the base object type.
+
+        Chains are walked iteratively so deep ones can't hit the recursion
+        limit; every intermediate base goes into the delta base cache.
+        """
+        chain = []  # (entry offset, data offset, delta size), target first
+        current = offset
+        while True:
+            cached = self.cache.get((self._cache_id, current))
+            if cached is not None:
+                type_id, data = cached
+                break
+
+            type_id, size, pos = self.read_header(current)
+            if type_id == OFS_DELTA:
+                distance, pos = decode_ofs_distance(self._map, pos)
+                chain.append((current, pos, size))
+                if distance <= 0 or distance > current:
+                    raise ValueError(f"Bad delta base offset at {current}")
+                current -= distance
+            elif type_id == REF_DELTA:
+                base_sha = self._map[pos:pos + 20]
+                chain.append((current, pos + 20, size))
+                current = self._find_base_offset(base_sha)
+            elif type_id in TYPE_MAP:
+                data, _ = inflate_stream(self._map, pos, size)
+                if chain:
+                    self.cache.put((self._cache_id, current), type_id, data)
+                break
+            else:
+                raise ValueError(f"Unknown object type: {type_id}")
+
+            if len(chain) > self.object_count:
+                raise ValueError(f"Delta chain loop at offset {offset}")
+
+        for entry_offset, pos, size in reversed(chain):
+            delta, _ = inflate_stream(self._map, pos, size, "delta")
+            data = apply_delta(data, delta)
+            if entry_offset != offset:
+                self.cache.put((self._cache_id, entry_offset), type_id, data)
+        return type_id, data
+
+    def resolve_delta(
+        self, offset: int, base: object, delta: Body
+    ) -> Tuple[int, Body]:
+        """
+        Rebuild the delta entry at offset from a delta the caller already
+        inflated and its base (offset or SHA, as read_entry returns it).
+        The base is resolved through this reader, and the result is
+        cached, as later entries often build on it.
+        """
+        if not isinstance(base, int):
+            base = self._find_base_offset(bytes(base))
+        type_id, base_data = self.resolve(base)
+        data = apply_delta(base_data, delta)
+        self.cache.put((self._cache_id, offset), type_id, data)
+        return type_id, data
+
+    def extract_object(self, offset: int) -> GitObject:
+        """
+        Extract Git object using offset, resolving deltas against their base
+        """
+        type_id, content = self.resolve(offset)
+        header_str = f"{TYPE_MAP[type_id]} {len(content)}\0".encode('ascii')
+        hasher = sha1(header_str)
+        hasher.update(content)
+        sha = hasher.digest()
 
         return GitObject(
-            obj_type=obj_type,
+            obj_type=type_id,
             sha=sha,
-            size=size,
+            size=len(content),
             content=content
         )
 
+    def read_content(self, offset: int) -> Body:
+        """Body of the object at offset, with deltas applied"""
+        return self.resolve(offset)[1]
+
+    def object_info(
+        self, offset: int, memo: Optional[Dict[int, int]] = None
+    ) -> Tuple[int, int]:
+        """
+        (type_id, size) of the object at offset without inflating its body.
+        For deltas the size comes from the first bytes of the delta stream.
+        """
+        type_id = self.read_type(offset, memo)
+        entry_type, size, pos = self.read_header(offset)
+        if entry_type == OFS_DELTA:
+            _, pos = decode_ofs_distance(self._map, pos)
+        elif entry_type == REF_DELTA:
+            pos += 20
+        else:
+            return type_id, size
+
+        # a block's Huffman tables come before its first output byte, so
+        # keep feeding input until both size varints have come out
+        inflater = zlib.decompressobj()
+        delta_head = b""
+        end = len(self._map) - 20
+        with memoryview(self._map) as view:
+            while len(delta_head) < DELTA_HEAD_MAX \
+                    and not inflater.eof and pos < end:
+                with view[pos:min(pos + DELTA_HEAD_CHUNK, end)] as piece:
+                    pos += len(piece)
+                    try:
+                        delta_head += inflater.decompress(
+                            piece, DELTA_HEAD_MAX - len(delta_head)
+                        )
+                    except zlib.error as e:
+                        raise ValueError(
+                            f"Failed to decompress delta data: {e}"
+                        )
+        try:
+            _, delta_pos = read_delta_size(delta_head, 0)
+            size, _ = read_delta_size(delta_head, delta_pos)
+        except IndexError:
+            raise ValueError(f"Truncated delta header at offset {offset}")
+        return type_id, size
+
 
-def read_packfile(packfile_path: Path) -> List[GitObject]:
+def extract_object_at_offset(packfile_path: Path, offset: int) -> GitObject:
     """
-    Read objects from packfile
+    Extract Git object using offset.
+    Prefer a shared PackReader when reading more than one object.
     """
-    if not packfile_path.is_file():
-        raise ValueError(f"Packfile doesn't exist: {packfile_path}")
+    with PackReader(packfile_path) as pack:
+        return pack.extract_object(offset)
 
-    with open(packfile_path, "rb") as f:
-        if f.read(4) != b"PACK":
-            raise ValueError("Not a valid packfile")
 
-    idx_path = find_idx_path(packfile_path)
-    sha_to_offset = get_object_offsets(idx_path)
+def iter_packfile(
+    packfile_path: Path,
+    types: Optional[Collection[str]] = None,
+    pack: Optional[PackReader] = None,
+    skip_errors: bool = True,
+    lazy: bool = False,
+    jobs: Optional[int] = None,
+    content: bool = True,
+) -> Iterator[GitObject]:
+    """
+    Yield objects from packfile one at a time.
+
+    Args:
+        packfile_path: Path to the .pack file
+        types: Only yield objects of these types (all when None)
+        pack: Already open PackReader to reuse
+        skip_errors: Print and skip objects that fail to extract
+        lazy: Yield metadata only; content is inflated when accessed,
+            which works as long as the pack is open
+        jobs: Worker processes sharing the work (see iter_packfile_parallel)
+        content: Keep the inflated bodies; when False entries are still
+            inflated, so broken ones are found, but only metadata is
+            yielded (and sent back by worker processes)
+
+    Yields:
+        GitObject instances in pack (offset) order
+
+    With a type filter the type is read from entry headers first, so
+    entries of other types (and deltas on top of them) are never inflated.
+    """
+    if pack is None:
+        if not packfile_path.is_file():
+            raise ValueError(f"Packfile doesn't exist: {packfile_path}")
+        with PackReader(packfile_path) as pack:
+            yield from iter_packfile(
+                packfile_path, types, pack, skip_errors, lazy, jobs, content
+            )
+        return
+
+    if jobs is not None and jobs > 1:
+        yield from iter_packfile_parallel(
+            packfile_path, jobs, types, pack, skip_errors, lazy, content
+        )
+        return
+
+    try:
+        yield from _extract_entries(
+            pack, pack.iter_entries(), types, skip_errors, lazy, content
+        )
+    except BaseException:
+        # the traceback keeps iter_entries, and so the sequential hint,
+        # alive until the exception is gone
+        pack.advise(sequential=False)
+        raise
+
+
+def _extract_entries(
+    pack: PackReader,
+    entries: Iterable[Tuple[bytes, int]],
+    types: Optional[Collection[str]],
+    skip_errors: bool,
+    lazy: bool,
+    content: bool = True,
+) -> Iterator[GitObject]:
+    wanted = None
+    delta_types: Dict[int, int] = {}
+    if types is not None:
+        wanted = {TYPE_IDS[t] for t in types if t in TYPE_IDS}
+
+    for sha, offset in entries:
+        try:
+            if lazy:
+                type_id, size = pack.object_info(offset, delta_types)
+                if wanted is not None and type_id not in wanted:
+                    continue
+                obj = GitObject(
+                    type_id, sha, size,
+                    loader=partial(pack.read_content, offset),
+                )
+            else:
+                if wanted is not None:
+                    if pack.read_type(offset, delta_types) not in wanted:
+                        continue
+                obj = pack.extract_object(offset)
+                if not content:
+                    obj = GitObject(obj.type_id, sha, obj.size)
+        except Exception as e:
+            if not skip_errors:
+                raise
+            print(f"Error! extracting obj {sha.hex()} at offset {offset}: {e}")
+            continue
+        obj.binsha = sha
+        yield obj
+
+
+# ranges per worker: enough to balance uneven ranges and stream results
+# early, few enough that per-range overhead stays small
+RANGES_PER_JOB = 16
+
+# PackReaders opened by worker processes, one per pack and process
+_process_packs: Dict[Path, PackReader] = {}
+
+
+def _scan_range(
+    packfile_path: Path,
+    entries: List[Tuple[bytes, int]],
+    types: Optional[Collection[str]],
+    skip_errors: bool,
+    lazy: bool,
+    content: bool,
+) -> List[Tuple[int, GitObject]]:
+    """Worker side of iter_packfile_parallel: one contiguous range"""
+    pack = _process_packs.get(packfile_path)
+    if pack is None:
+        pack = _process_packs[packfile_path] = PackReader(packfile_path)
+    offsets = dict(entries)
+    results = []
+    for obj in _extract_entries(
+        pack, entries, types, skip_errors, lazy, content
+    ):
+        if lazy:  # the loader is bound to this process' reader
+            obj = GitObject(obj.type_id, obj.binsha, obj.size)
+        results.append((offsets[obj.binsha], obj))
+    return results
+
+
+def _pack_ranges(
+    pack: PackReader, count: int
+) -> Iterator[List[Tuple[bytes, int]]]:
+    """Split the pack's entries, in offset order, into count ranges"""
+    size = max(1, -(-pack.object_count // count))
+    entries = pack.iter_entries()
+    while True:
+        chunk = list(itertools.islice(entries, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_packfile_parallel(
+    packfile_path: Path,
+    jobs: int,
+    types: Optional[Collection[str]] = None,
+    pack: Optional[PackReader] = None,
+    skip_errors: bool = True,
+    lazy: bool = False,
+    content: bool = True,
+) -> Iterator[GitObject]:
+    """
+    iter_packfile spread over worker processes.
+
+    The offset-sorted entries are cut into contiguous ranges handed to a
+    ProcessPoolExecutor. Every worker maps the same pack file, so the
+    pages are shared through the page cache, and results stream back in
+    pack order. A delta whose base lies in another worker's range is
+    resolved by following the chain through the worker's own mapping
+    (and its delta base cache), so ranges never wait on each other.
+
+    Args:
+        packfile_path: Path to the .pack file
+        jobs: Number of worker processes
+        types: Only yield objects of these types (all when None)
+        pack: Already open PackReader, used for the idx and lazy loaders
+        skip_errors: Print and skip objects that fail to extract
+        lazy: Yield metadata only; content is inflated in this process
+            when accessed
+        content: Keep the inflated bodies; when False workers still
+            inflate every entry but only send its metadata back
+
+    Yields:
+        GitObject instances in pack (offset) order
+    """
+    if pack is None:
+        with PackReader(packfile_path) as pack:
+            yield from iter_packfile_parallel(
+                packfile_path, jobs, types, pack, skip_errors, lazy, content
+            )
+        return
+
+    task = partial(
+        _scan_range, packfile_path,
+        types=types, skip_errors=skip_errors, lazy=lazy, content=content,
+    )
+    ranges = _pack_ranges(pack, jobs * RANGES_PER_JOB)
+    for _, future in map_in_pool(
+        ProcessPoolExecutor(max_workers=jobs), task, ranges, jobs * 2
+    ):
+        for offset, obj in future.result():
+            if lazy:
+                obj = GitObject(
+                    obj.type_id, obj.binsha, obj.size,
+                    loader=partial(pack.read_content, offset),
+                )
+            yield obj
+
+
+def read_packfile(
+    packfile_path: Path,
+    pack: Optional[PackReader] = None,
+    jobs: Optional[int] = None,
+) -> List[GitObject]:
+    """
+    Read objects from packfile.
+    An already open PackReader can be passed to avoid mapping it again.
+    Prefer iter_packfile, which doesn't hold every object in memory.
+    """
+    return list(iter_packfile(packfile_path, pack=pack, jobs=jobs))
+
+
+def read_loose_header(object_file_path: Path) -> Tuple[str, int]:
+    """
+    Read (obj_type, size) of a loose object by inflating only
+    the first bytes of the file
+    """
+    with open(object_file_path, "rb") as f:
+        head = f.read(256)
+    try:
+        data = zlib.decompressobj().decompress(head, LOOSE_HEADER_MAX)
+    except zlib.error as e:
+        raise ValueError(f"Failed to decompress object header: {e}")
+    obj_type, size, _ = _parse_loose_header(data)
+    return obj_type, size
+
+
+def _load_loose_content(object_file_path: Path) -> Body:
+    return read_loose_file(object_file_path).content
+
+
+def read_loose_lazy(object_file_path: Path) -> GitObject:
+    """
+    Loose object with only its header read;
+    content is inflated and verified when accessed
+    """
+    obj_type, size = read_loose_header(object_file_path)
+    return GitObject(
+        obj_type=obj_type,
+        sha=object_file_path.parent.name + object_file_path.name,
+        size=size,
+        loader=partial(_load_loose_content, object_file_path),
+    )
+
+
+def _map_in_threads(
+    func: Callable[[T], R], items: Iterable[T], workers: int
+) -> Iterator[Tuple[T, "Future[R]"]]:
+    """
+    Run func over items in a thread pool and yield (item, future) in
+    input order, keeping at most a few tasks per worker in flight.
+    """
+    return map_in_pool(
+        ThreadPoolExecutor(max_workers=workers), func, items, workers * 4
+    )
+
 
-    objects = []
-    for sha, offset in sha_to_offset.items():
+def map_in_pool(
+    pool: Executor,
+    func: Callable[[T], R],
+    items: Iterable[T],
+    in_flight: int,
+) -> Iterator[Tuple[T, "Future[R]"]]:
+    """
+    Run func over items in pool and yield (item, future) in input order
+    with at most in_flight tasks submitted; the pool is shut down after.
+    """
+    pending: Deque[Tuple[T, "Future[R]"]] = deque()
+    try:
+        for item in items:
+            pending.append((item, pool.submit(func, item)))
+            if len(pending) >= in_flight:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def scan_loose_objects(
+    object_paths: Iterable[Path],
+    workers: Optional[int] = None,
+    skip_errors: bool = True,
+    lazy: bool = False,
+) -> Iterator[GitObject]:
+    """
+    Read and verify loose object files in a thread pool.
+
+    zlib and hashlib release the GIL, so inflating and hashing scale
+    with the workers; results stream back in input order.
+
+    Args:
+        object_paths: Paths of loose object files
+        workers: Number of threads (defaults to the CPU count + 4, max 32)
+        skip_errors: Print and skip objects that fail to read
+        lazy: Only read headers; content is inflated when accessed
+
+    Yields:
+        GitObject instances
+    """
+    if workers is None:
+        workers = min(32, (os.cpu_count() or 1) + 4)
+    reader = read_loose_lazy if lazy else read_loose_file
+    for path, future in _map_in_threads(reader, object_paths, workers):
         try:
-            obj = extract_object_at_offset(packfile_path, offset)
-            obj.sha = sha
-            objects.append(obj)
+            yield future.result()
         except Exception as e:
-            print(f"Error! extracting obj {sha} at offset {offset}: {e}")
-    return objects
+            if not skip_errors:
+                raise
+            print(f"Error reading loose object {path}: {e}")
+
+
+def iter_loose_objects(
+    git_dir: Path,
+    types: Optional[Collection[str]] = None,
+    skip_errors: bool = True,
+    workers: Optional[int] = None,
+    lazy: bool = False,
+) -> Iterator[GitObject]:
+    """
+    Yield every loose object of a repository one at a time.
 
+    Args:
+        git_dir: Path to the .git directory
+        types: Only yield objects of these types (all when None)
+        skip_errors: Print and skip objects that fail to read
+        workers: Number of reader threads
+        lazy: Only read headers; content is inflated when accessed
 
-def read_single_object(packfile_path: Path, target_sha: str) -> GitObject:
+    Yields:
+        GitObject instances
     """
-    Read one object from packfile using its SHA
+    for obj in scan_loose_objects(
+        find_loose_objects(git_dir), workers, skip_errors, lazy
+    ):
+        if types is None or obj.obj_type in types:
+            yield obj
+
+
+def iter_repository_objects(
+    git_dir: Path,
+    types: Optional[Collection[str]] = None,
+    skip_errors: bool = True,
+    lazy: bool = False,
+) -> Iterator[GitObject]:
     """
-    idx_path = find_idx_path(packfile_path)
-    sha_to_offset = get_object_offsets(idx_path)
-    if target_sha not in sha_to_offset:
+    Yield every loose and packed object of a repository one at a time,
+    so memory use doesn't grow with the repository size.
+
+    Args:
+        git_dir: Path to the .git directory
+        types: Only yield objects of these types (all when None)
+        skip_errors: Print and skip unreadable objects and packs
+        lazy: Yield metadata only and load content when it's accessed
+
+    Yields:
+        GitObject instances, loose objects first
+    """
+    yield from iter_loose_objects(git_dir, types, skip_errors, lazy=lazy)
+    for pack_file in find_packfiles(git_dir):
+        try:
+            yield from iter_packfile(
+                pack_file, types, skip_errors=skip_errors, lazy=lazy
+            )
+        except Exception as e:
+            if not skip_errors:
+                raise
+            print(f"Error reading packfile {pack_file}: {e}")
+
+
+def read_single_object(
+    packfile_path: Path, target_sha: str, pack: Optional[PackReader] = None
+) -> GitObject:
+    """
+    Read one object from packfile using its SHA.
+    Pass an open PackReader to reuse its mapped idx across lookups.
+    """
+    if pack is None:
+        with PackReader(packfile_path) as pack:
+            return read_single_object(packfile_path, target_sha, pack)
+
+    offset = pack.index.find_offset(target_sha)
+    if offset is None:
         raise ValueError(f"Object with SHA {target_sha} not found in packfile")
-    offset = sha_to_offset[target_sha]
-    return extract_object_at_offset(packfile_path, offset)
+    return pack.extract_object(offset)
+
+
+MIDX_MAGIC = b"MIDX"
+
+
+class MultiPackIndex:
+    """
+    Memory-mapped objects/pack/multi-pack-index.
+
+    One fanout plus binary search over the SHAs of every covered pack
+    returns (pack name, offset), instead of probing each pack's idx.
+    """
+
+    def __init__(self, midx_path: Path):
+        self.path = midx_path
+        with open(midx_path, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty files can't be mapped
+                raise ValueError("Invalid multi-pack-index header")
+        try:
+            self._parse()
+        except (ValueError, struct.error, KeyError) as e:
+            self.close()
+            raise ValueError(f"Invalid multi-pack-index: {e}")
+
+    def _parse(self) -> None:
+        buf = self._map
+        if buf[:4] != MIDX_MAGIC:
+            raise ValueError("bad signature")
+        version, hash_version, chunk_count, base_count, pack_count = \
+            struct.unpack_from(">BBBBI", buf, 4)
+        if version != 1:
+            raise ValueError(f"unsupported version {version}")
+        if hash_version != 1:
+            raise ValueError("only SHA-1 is supported")
+        if base_count != 0:
+            raise ValueError("incremental multi-pack-index is not supported")
+
+        chunks = {}
+        for i in range(chunk_count):
+            chunk_id, offset = struct.unpack_from(">4sQ", buf, 12 + 12 * i)
+            chunks[chunk_id] = offset
+
+        pnam = chunks[b"PNAM"]
+        names = []
+        pos = pnam
+        while len(names) < pack_count:
+            end = buf.find(b"\0", pos)
+            if end == -1:
+                raise ValueError("unterminated pack name")
+            names.append(buf[pos:end].decode())
+            pos = end + 1
+        self.pack_names = [
+            str(Path(name).with_suffix(".pack")) for name in names
+        ]
+
+        self.fanout = struct.unpack_from(">256I", buf, chunks[b"OIDF"])
+        self.object_count = self.fanout[255]
+        self._sha_start = chunks[b"OIDL"]
+        self._offset_start = chunks[b"OOFF"]
+        self._large_start = chunks.get(b"LOFF")
+
+    def __enter__(self) -> "MultiPackIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.object_count
+
+    def close(self) -> None:
+        if not self._map.closed:
+            self._map.close()
+
+    def sha_at(self, position: int) -> bytes:
+        start = self._sha_start + 20 * position
+        return self._map[start:start + 20]
+
+    def location_at(self, position: int) -> Tuple[str, int]:
+        """(pack name, offset) of the object at position"""
+        pack_id, offset = struct.unpack_from(
+            ">II", self._map, self._offset_start + 8 * position
+        )
+        # git writes LOFF only when some offset needs more than 32 bits;
+        # without it, offsets of 2-4 GiB are stored as they are
+        if offset & 0x80000000 and self._large_start is not None:
+            offset = struct.unpack_from(
+                ">Q", self._map,
+                self._large_start + 8 * (offset & 0x7FFFFFFF)
+            )[0]
+        return self.pack_names[pack_id], offset
+
+    def find(self, sha) -> Optional[Tuple[str, int]]:
+        """(pack name, offset) of sha, or None when no covered pack has it"""
+        position = bisect_sha_table(
+            self._map, self._sha_start, self.fanout, sha
+        )
+        if position is None:
+            return None
+        return self.location_at(position)
+
+
+class PackDirectory:
+    """
+    Every pack under objects/pack, looked up through the multi-pack-index
+    when there is one and through per-pack idx files for packs it
+    doesn't cover. PackReaders are opened on first use and shared.
+    """
+
+    def __init__(self, pack_dir: Path, cache: Optional[DeltaBaseCache] = None):
+        self.path = pack_dir
+        self.cache = cache if cache is not None else DeltaBaseCache()
+        self._readers: Dict[Path, PackReader] = {}
+        self.midx: Optional[MultiPackIndex] = None
+        # packs whose idx can't be read, with the reason; lookups skip them
+        self.unreadable: Dict[Path, str] = {}
+
+        pack_paths = sorted(pack_dir.glob("*.pack")) \
+            if pack_dir.is_dir() else []
+        midx_path = pack_dir / "multi-pack-index"
+        if midx_path.is_file():
+            try:
+                self.midx = MultiPackIndex(midx_path)
+            except (ValueError, OSError) as e:
+                print(f"Ignoring {midx_path}: {e}")
+        covered = set(self.midx.pack_names) if self.midx else set()
+        self.pack_paths = pack_paths
+        self.uncovered = [p for p in pack_paths if p.name not in covered]
+
+    def __enter__(self) -> "PackDirectory":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for reader in self._readers.values():
+            reader.close()
+        self._readers.clear()
+        if self.midx is not None:
+            self.midx.close()
+
+    def reader(self, pack_path: Path) -> PackReader:
+        """Shared PackReader for one of the packs"""
+        reader = self._readers.get(pack_path)
+        if reader is None:
+            reader = PackReader(pack_path, self.cache)
+            self._readers[pack_path] = reader
+        return reader
+
+    def find(self, sha) -> Optional[Tuple[Path, int]]:
+        """(pack path, offset) of sha, or None when no pack has it"""
+        if self.midx is not None:
+            location = self.midx.find(sha)
+            if location is not None:
+                pack_path = self.path / location[0]
+                if pack_path.is_file():
+                    return pack_path, location[1]
+        for pack_path in self.uncovered:
+            index = self.index(pack_path)
+            if index is None:
+                continue
+            offset = index.find_offset(sha)
+            if offset is not None:
+                return pack_path, offset
+        return None
+
+    def index(self, pack_path: Path) -> Optional[PackIndex]:
+        """The idx of one of the packs, or None when it can't be read"""
+        if pack_path in self.unreadable:
+            return None
+        try:
+            return self.reader(pack_path).index
+        except (ValueError, OSError) as e:
+            print(f"Ignoring {pack_path}: {e}")
+            self.unreadable[pack_path] = str(e)
+            return None
+
+    def read_object(self, sha) -> GitObject:
+        """Read a packed object by SHA from whichever pack holds it"""
+        location = self.find(sha)
+        if location is None:
+            if isinstance(sha, bytes):
+                sha = sha.hex()
+            raise ValueError(f"Object with SHA {sha} not found in packfiles")
+        pack_path, offset = location
+        return self.reader(pack_path).extract_object(offset)
@@ -0,0 +1,350 @@
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha1
+from pathlib import Path
+from queue import Empty, Full, Queue
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, TypeVar
+import os
+import threading
+
+from guardian.object_scanner import (
+    DELTA_BASE_CACHE_LIMIT,
+    OFS_DELTA,
+    REF_DELTA,
+    TYPE_MAP,
+    Body,
+    DeltaBaseCache,
+    GitObject,
+    PackReader,
+    decode_ofs_distance,
+    inflate_stream,
+    loose_object_from_bytes,
+    map_in_pool,
+    parse_entry_header,
+)
+
+T = TypeVar("T")
+
+# bytes read from a pack per system call by the I/O stage
+READ_BLOCK = 8 * 1024 * 1024
+# items waiting between the I/O stage and the workers
+QUEUE_DEPTH = 256
+# raw bytes read by the I/O stage and not inflated by a worker yet
+BYTES_IN_FLIGHT = 64 * 1024 * 1024
+
+_DONE = object()
+
+
+class _Failure:
+    """An exception raised in the I/O thread, handed to the consumer"""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _produce(items: Iterable[T], queue: Queue, stop: threading.Event) -> None:
+    try:
+        for item in items:
+            while True:
+                try:
+                    queue.put(item, timeout=0.1)
+                    break
+                except Full:
+                    if stop.is_set():
+                        return
+    except BaseException as e:
+        queue.put(_Failure(e))
+    finally:
+        queue.put(_DONE)
+
+
+def staged(items: Iterable[T], depth: int = QUEUE_DEPTH) -> Iterator[T]:
+    """
+    Iterate items in a separate I/O thread, which runs ahead of the
+    consumer by at most depth items. Exceptions raised while producing
+    are re-raised in the consumer.
+    """
+    queue: Queue = Queue(maxsize=depth)
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=_produce, args=(items, queue, stop),
+        name="guardian-io", daemon=True,
+    )
+    thread.start()
+    try:
+        while True:
+            item = queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        while thread.is_alive():  # unblock a producer waiting on put()
+            try:
+                queue.get(timeout=0.1)
+            except Empty:
+                pass
+        thread.join()
+
+
+class _ByteBudget:
+    """
+    Bytes held between the stages, capped at limit: the I/O stage waits
+    in acquire() until the workers have released enough of them.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._closed = False
+        self._changed = threading.Condition()
+
+    def acquire(self, size: int) -> None:
+        with self._changed:
+            # an item larger than the whole budget goes through alone
+            while self.used and self.used + size > self.limit \
+                    and not self._closed:
+                self._changed.wait()
+            self.used += size
+
+    def release(self, size: int) -> None:
+        with self._changed:
+            self.used -= size
+            self._changed.notify_all()
+
+    def close(self) -> None:
+        """Stop waiting, so a blocked I/O stage can wind down"""
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+
+
+def read_loose_files(paths: Iterable[Path]) -> Iterator[Tuple[Path, bytes]]:
+    """I/O stage for loose objects: (path, raw file contents)"""
+    for path in paths:
+        with open(path, "rb") as f:
+            yield path, f.read()
+
+
+def read_pack_entries(
+    pack: PackReader, block_size: int = READ_BLOCK
+) -> Iterator[Tuple[bytes, int, Body]]:
+    """
+    I/O stage for a pack: yield (binary sha, offset, raw entry bytes) in
+    pack order, reading the file front to back in large blocks. Entries
+    are views of the blocks, so handing them over copies nothing.
+    """
+    index = pack.index
+    entries = [
+        (index.offset_at(position), index.sha_at(position))
+        for position in pack.pack_order()
+    ]
+    end = len(pack) - 20
+    with open(pack.path, "rb", buffering=0) as f:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        block = memoryview(b"")
+        block_start = 0
+        for i, (offset, sha) in enumerate(entries):
+            next_offset = entries[i + 1][0] if i + 1 < len(entries) else end
+            if next_offset > block_start + len(block):
+                f.seek(offset)
+                block = memoryview(
+                    f.read(max(block_size, next_offset - offset))
+                )
+                block_start = offset
+                if len(block) < next_offset - offset:
+                    raise ValueError(f"Packfile is truncated at {offset}")
+            start = offset - block_start
+            yield sha, offset, block[start:start + next_offset - offset]
+
+
+def _check_sha(sha: bytes, type_id: int, data: Body) -> None:
+    hasher = sha1(f"{TYPE_MAP[type_id]} {len(data)}\0".encode("ascii"))
+    hasher.update(data)
+    if hasher.digest() != sha:
+        raise ValueError(
+            f"SHA mismatch! {sha.hex()} is not {hasher.hexdigest()}"
+        )
+
+
+class _ThreadReaders:
+    """
+    One PackReader per worker thread: delta base caches aren't thread
+    safe, so each worker resolves chains through its own mapping with
+    an equal share of the cache budget.
+    """
+
+    def __init__(self, packfile_path: Path, workers: int):
+        self.path = packfile_path
+        self.cache_limit = DELTA_BASE_CACHE_LIMIT // workers
+        self._local = threading.local()
+        self._readers: List[PackReader] = []
+        self._lock = threading.Lock()
+
+    def get(self) -> PackReader:
+        reader = getattr(self._local, "reader", None)
+        if reader is None:
+            reader = PackReader(self.path, DeltaBaseCache(self.cache_limit))
+            self._local.reader = reader
+            with self._lock:
+                self._readers.append(reader)
+        return reader
+
+    def close(self) -> None:
+        for reader in self._readers:
+            reader.close()
+
+
+def _verify_entry(
+    readers: _ThreadReaders, entry: Tuple[bytes, int, Body]
+) -> GitObject:
+    """
+    CPU stage for a pack entry: inflate it from the bytes the I/O stage
+    read, apply it to its base if it's a delta, and verify it
+    """
+    sha, offset, raw = entry
+    type_id, size, pos = parse_entry_header(raw, 0)
+    if type_id in TYPE_MAP:
+        data, _ = inflate_stream(raw, pos, size)
+    elif type_id == OFS_DELTA:
+        distance, pos = decode_ofs_distance(raw, pos)
+        if distance <= 0 or distance > offset:
+            raise ValueError(f"Bad delta base offset at {offset}")
+        delta, _ = inflate_stream(raw, pos, size, "delta")
+        type_id, data = readers.get().resolve_delta(
+            offset, offset - distance, delta
+        )
+    elif type_id == REF_DELTA:
+        delta, _ = inflate_stream(raw, pos + 20, size, "delta")
+        type_id, data = readers.get().resolve_delta(
+            offset, bytes(raw[pos:pos + 20]), delta
+        )
+    else:
+        raise ValueError(f"Unknown object type: {type_id}")
+    _check_sha(sha, type_id, data)
+    return GitObject(type_id, sha, len(data), content=data)
+
+
+def _verify_loose(entry: Tuple[Path, bytes]) -> GitObject:
+    """CPU stage for a loose object: inflate and verify"""
+    path, raw = entry
+    return loose_object_from_bytes(path.parent.name + path.name, raw)
+
+
+def _run_stages(
+    items: Iterable[T],
+    verify: Callable[[T], GitObject],
+    describe: Callable[[T], str],
+    weigh: Callable[[T], int],
+    source: str,
+    workers: Optional[int],
+    skip_errors: bool,
+) -> Iterator[GitObject]:
+    if workers is None:
+        workers = os.cpu_count() or 1
+    budget = _ByteBudget(BYTES_IN_FLIGHT)
+    failures: List[Exception] = []
+
+    def work(item: T) -> GitObject:
+        # released by the worker, not the consumer, so a budget smaller
+        # than the tasks kept in flight can't stall the pool
+        try:
+            return verify(item)
+        finally:
+            budget.release(weigh(item))
+
+    def read() -> Iterator[T]:
+        # runs in the I/O thread; a failure there ends the input, and the
+        # objects already read are still verified before it's reported
+        try:
+            for item in items:
+                budget.acquire(weigh(item))
+                yield item
+        except Exception as e:
+            failures.append(e)
+
+    stage = staged(read())
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for item, future in map_in_pool(pool, work, stage, workers * 4):
+            try:
+                yield future.result()
+            except Exception as e:
+                if not skip_errors:
+                    raise
+                print(f"Error! verifying {describe(item)}: {e}")
+    finally:
+        budget.close()
+        stage.close()
+    for e in failures:
+        if not skip_errors:
+            raise e
+        print(f"Error! reading {source}: {e}")
+
+
+def verify_pack_objects(
+    pack: PackReader,
+    workers: Optional[int] = None,
+    skip_errors: bool = True,
+) -> Iterator[GitObject]:
+    """
+    Read, inflate and SHA-1 verify every object of a pack in three
+    overlapping stages.
+
+    An I/O thread reads the pack sequentially in READ_BLOCK blocks and
+    cuts it into raw entries; a thread pool inflates them and checks each
+    object against the SHA the idx lists (zlib and hashlib release the
+    GIL); the caller consumes the objects in pack order. At most
+    BYTES_IN_FLIGHT bytes read and not inflated yet wait between the
+    stages, and a few objects per worker between the workers and the
+    caller, which caps memory while disk and CPU are kept busy.
+    Deltas are inflated from the bytes read too; only their bases are
+    resolved through each worker's own PackReader.
+
+    When the pack can't be read (no idx, truncated), the objects read so
+    far are still yielded and the error is printed, or raised without
+    skip_errors.
+
+    Args:
+        pack: Open PackReader of the pack to verify
+        workers: Number of inflating threads (defaults to the CPU count)
+        skip_errors: Print and skip objects that fail to verify
+
+    Yields:
+        Verified GitObject instances in pack order
+    """
+    readers = _ThreadReaders(pack.path, workers or os.cpu_count() or 1)
+    try:
+        yield from _run_stages(
+            read_pack_entries(pack),
+            lambda entry: _verify_entry(readers, entry),
+            lambda entry: f"obj {entry[0].hex()} at offset {entry[1]}",
+            lambda entry: len(entry[2]),
+            f"packfile {pack.path}",
+            workers, skip_errors,
+        )
+    finally:
+        readers.close()
+
+
+def verify_loose_objects(
+    object_paths: Iterable[Path],
+    workers: Optional[int] = None,
+    skip_errors: bool = True,
+) -> Iterator[GitObject]:
+    """
+    verify_pack_objects for loose object files: the I/O thread reads the
+    files, the thread pool inflates and verifies them.
+
+    Yields:
+        Verified GitObject instances in input order
+    """
+    yield from _run_stages(
+        read_loose_files(object_paths), _verify_loose,
+        lambda entry: f"loose object {entry[0]}",
+        lambda entry: len(entry[1]),
+        "loose objects",
+        workers, skip_errors,
+    )
@@ -0,0 +1,141 @@
+from collections import defaultdict
+from typing import Dict, List, Tuple, Union
+import re
+
+# an object body: bytes, or a read-only view over its inflated buffer
+Body = Union[bytes, memoryview]
+
+NEWLINE = re.compile(rb"\n")
+
+
+def parse_entry_header(buffer, offset: int) -> Tuple[int, int, int]:
+    """
+    Decode the type/size varint of a pack entry starting at offset.
+    Returns (type_id, size, data_offset).
+    """
+    byte = buffer[offset]
+    obj_type_id = (byte >> 4) & 7  # extract bits 4-6
+    size = byte & 15  # extract bottom 4 bits
+    shift = 4
+    pos = offset + 1
+    while byte & 0x80:
+        byte = buffer[pos]
+        pos += 1
+        size |= (byte & 0x7f) << shift
+        shift += 7
+    return obj_type_id, size, pos
+
+
+def decode_ofs_distance(buffer, pos: int) -> Tuple[int, int]:
+    """
+    Decode the ofs_delta base distance starting at pos.
+    Returns (distance, next_pos).
+    """
+    byte = buffer[pos]
+    pos += 1
+    distance = byte & 0x7f
+    while byte & 0x80:
+        byte = buffer[pos]
+        pos += 1
+        # every continuation byte adds one, so encodings are unique
+        distance = ((distance + 1) << 7) | (byte & 0x7f)
+    return distance, pos
+
+
+def read_delta_size(delta: Body, pos: int) -> Tuple[int, int]:
+    size = 0
+    shift = 0
+    while True:
+        byte = delta[pos]
+        pos += 1
+        size |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return size, pos
+
+
+def apply_delta(base: Body, delta: Body) -> memoryview:
+    """
+    Rebuild an object from its base and a git delta
+    made of copy (from base) and insert (literal) opcodes.
+
+    The result is written into a buffer of the size the delta declares
+    and returned as a read-only view of it, without a final copy.
+    """
+    src_size, pos = read_delta_size(delta, 0)
+    if src_size != len(base):
+        raise ValueError(f"Delta base size mismatch! {src_size} != {len(base)}")
+    dest_size, pos = read_delta_size(delta, pos)
+
+    result = bytearray(dest_size)
+    written = 0
+    delta_len = len(delta)
+    with memoryview(base) as base_view, memoryview(delta) as delta_view:
+        while pos < delta_len:
+            opcode = delta[pos]
+            pos += 1
+            if opcode & 0x80:  # copy from base
+                copy_offset = 0
+                copy_size = 0
+                for i in range(4):
+                    if opcode & (1 << i):
+                        copy_offset |= delta[pos] << (8 * i)
+                        pos += 1
+                for i in range(3):
+                    if opcode & (0x10 << i):
+                        copy_size |= delta[pos] << (8 * i)
+                        pos += 1
+                if copy_size == 0:
+                    copy_size = 0x10000
+                if copy_offset + copy_size > src_size:
+                    raise ValueError("Delta copy out of base bounds")
+                source = base_view[copy_offset:copy_offset + copy_size]
+            elif opcode:  # insert literal data
+                source = delta_view[pos:pos + opcode]
+                if len(source) != opcode:
+                    raise ValueError("Truncated delta insert")
+                pos += opcode
+            else:
+                raise ValueError("Invalid delta opcode 0")
+            if written + len(source) > dest_size:
+                raise ValueError(
+                    f"Delta size mismatch! {dest_size} < {written + len(source)}"
+                )
+            result[written:written + len(source)] = source
+            written += len(source)
+
+    if written != dest_size:
+        raise ValueError(f"Delta size mismatch! {dest_size} != {written}")
+    return memoryview(result).toreadonly()
+
+
+def parse_commit_content(content: Body) -> Dict[str, List[str]]:
+    """
+    Parse a commit object content to extract metadata including parent commits.
+    Returns a dictionary with keys tree, parent, author, committer.
+
+    content may be a memoryview: lines are found with a regex, which
+    scans views in place, and only header lines are copied, never the
+    message after them.
+    """
+    result = defaultdict(list)
+    pos = 0
+    end = len(content)
+
+    while pos < end:
+        newline = NEWLINE.search(content, pos)
+        line_end = newline.start() if newline else end
+        line = bytes(content[pos:line_end])
+        pos = line_end + 1
+        if not line:
+            break
+
+        try:
+            key_value = line.split(b' ', 1)
+            if len(key_value) == 2:
+                key, value = key_value
+                result[key.decode('utf-8')].append(value.decode('utf-8'))
+        except Exception:
+            continue
+
+    return dict(result)
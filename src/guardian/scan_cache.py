@@ -0,0 +1,294 @@
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import sqlite3
+
+CACHE_DIR = "guardian"
+CACHE_FILE = "scan-cache.sqlite"
+CACHE_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS packs (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    scanned INTEGER NOT NULL DEFAULT 0,
+    commits_indexed INTEGER NOT NULL DEFAULT 0,
+    problems TEXT
+);
+CREATE TABLE IF NOT EXISTS pack_objects (
+    pack TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    sha BLOB NOT NULL,
+    type INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (pack, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS pack_commits (
+    pack TEXT NOT NULL,
+    sha BLOB NOT NULL,
+    PRIMARY KEY (pack, sha)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS loose_objects (
+    sha BLOB PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    type INTEGER NOT NULL,
+    size INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS commits (
+    sha BLOB PRIMARY KEY,
+    tree BLOB,
+    parents BLOB NOT NULL,
+    commit_time INTEGER,
+    size INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+# (binary sha, tree, parent SHAs, commit time, size)
+CommitRecord = Tuple[bytes, Optional[bytes], List[bytes], Optional[int], int]
+
+
+def loose_sha(path: Path) -> bytes:
+    """Binary SHA of a loose object from its objects/xx/yyyy path"""
+    return bytes.fromhex(path.parent.name + path.name)
+
+
+class ScanCache:
+    """
+    Results of earlier scans kept in .git/guardian/scan-cache.sqlite.
+
+    Packs never change once written, so everything learned about one
+    (object types and sizes, commit parents, fast verification results)
+    is stored under its name and reused until its size or mtime changes.
+    Loose objects are remembered by SHA together with the file's mtime.
+    Commit parents are stored by commit SHA, shared by every source.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        try:
+            version = self._db.execute("PRAGMA user_version").fetchone()[0]
+            if version != CACHE_VERSION:
+                self._reset()
+            self._db.executescript(SCHEMA)
+        except sqlite3.DatabaseError:
+            self._db.close()
+            raise
+
+    @classmethod
+    def open(cls, git_dir: Path) -> Optional["ScanCache"]:
+        """Open (creating it if needed) the cache of a .git directory"""
+        cache_dir = git_dir / CACHE_DIR
+        try:
+            cache_dir.mkdir(exist_ok=True)
+            return cls(cache_dir / CACHE_FILE)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Scan cache disabled: {e}")
+            return None
+
+    def _reset(self) -> None:
+        tables = [row[0] for row in self._db.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        )]
+        for table in tables:
+            self._db.execute(f"DROP TABLE {table}")
+        self._db.execute(f"PRAGMA user_version = {CACHE_VERSION}")
+        self._db.commit()
+
+    def __enter__(self) -> "ScanCache":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._db.close()
+
+    # packs
+
+    def _pack_row(self, pack_path: Path) -> Optional[tuple]:
+        """The pack's row, dropping what's stored when the file changed"""
+        stat = pack_path.stat()
+        row = self._db.execute(
+            "SELECT size, mtime_ns, scanned, commits_indexed, problems "
+            "FROM packs WHERE name = ?", (pack_path.name,)
+        ).fetchone()
+        if row is not None and row[:2] == (stat.st_size, stat.st_mtime_ns):
+            return row
+        with self._db:
+            self._forget_pack(pack_path.name)
+            self._db.execute(
+                "INSERT INTO packs (name, size, mtime_ns) VALUES (?, ?, ?)",
+                (pack_path.name, stat.st_size, stat.st_mtime_ns),
+            )
+        return None
+
+    def _forget_pack(self, name: str) -> None:
+        self._db.execute("DELETE FROM packs WHERE name = ?", (name,))
+        self._db.execute("DELETE FROM pack_objects WHERE pack = ?", (name,))
+        self._db.execute("DELETE FROM pack_commits WHERE pack = ?", (name,))
+
+    def prune_packs(self, pack_paths: Iterable[Path]) -> None:
+        """Drop what's stored about packs that are gone (e.g. after gc)"""
+        names = {path.name for path in pack_paths}
+        stale = [row[0] for row in self._db.execute("SELECT name FROM packs")
+                 if row[0] not in names]
+        with self._db:
+            for name in stale:
+                self._forget_pack(name)
+
+    def pack_objects(self, pack_path: Path) -> Optional[List[Tuple[bytes, int, int]]]:
+        """(sha, type_id, size) of every object of a scanned pack, scan order"""
+        row = self._pack_row(pack_path)
+        if row is None or not row[2]:
+            return None
+        return self._db.execute(
+            "SELECT sha, type, size FROM pack_objects WHERE pack = ? "
+            "ORDER BY position", (pack_path.name,)
+        ).fetchall()
+
+    def store_pack_objects(
+        self, pack_path: Path, objects: Iterable[Tuple[bytes, int, int]]
+    ) -> None:
+        self._pack_row(pack_path)
+        with self._db:
+            self._db.execute(
+                "DELETE FROM pack_objects WHERE pack = ?", (pack_path.name,))
+            self._db.executemany(
+                "INSERT INTO pack_objects VALUES (?, ?, ?, ?, ?)",
+                ((pack_path.name, position, sha, type_id, size)
+                 for position, (sha, type_id, size) in enumerate(objects)),
+            )
+            self._db.execute(
+                "UPDATE packs SET scanned = 1 WHERE name = ?",
+                (pack_path.name,))
+
+    def pack_commits(self, pack_path: Path) -> Optional[List[CommitRecord]]:
+        """Commits of a pack whose commits were indexed before"""
+        row = self._pack_row(pack_path)
+        if row is None or not row[3]:
+            return None
+        rows = self._db.execute(
+            "SELECT c.sha, c.tree, c.parents, c.commit_time, c.size "
+            "FROM pack_commits p JOIN commits c ON c.sha = p.sha "
+            "WHERE p.pack = ?", (pack_path.name,)
+        ).fetchall()
+        return [_commit_record(row) for row in rows]
+
+    def store_pack_commits(
+        self, pack_path: Path, commits: List[CommitRecord]
+    ) -> None:
+        self._pack_row(pack_path)
+        with self._db:
+            self._insert_commits(commits)
+            self._db.executemany(
+                "INSERT OR IGNORE INTO pack_commits VALUES (?, ?)",
+                ((pack_path.name, record[0]) for record in commits),
+            )
+            self._db.execute(
+                "UPDATE packs SET commits_indexed = 1 WHERE name = ?",
+                (pack_path.name,))
+
+    def pack_problems(self, pack_path: Path) -> Optional[List[str]]:
+        """Result of an earlier fast verification, None if never verified"""
+        row = self._pack_row(pack_path)
+        if row is None or row[4] is None:
+            return None
+        return row[4].splitlines()
+
+    def store_pack_problems(self, pack_path: Path, problems: List[str]) -> None:
+        self._pack_row(pack_path)
+        with self._db:
+            self._db.execute(
+                "UPDATE packs SET problems = ? WHERE name = ?",
+                ("\n".join(problems), pack_path.name),
+            )
+
+    # loose objects
+
+    def loose_manifest(self) -> Dict[bytes, Tuple[int, int, int]]:
+        """sha -> (mtime_ns, type_id, size) of the loose objects seen"""
+        return {
+            sha: (mtime_ns, type_id, size)
+            for sha, mtime_ns, type_id, size in self._db.execute(
+                "SELECT sha, mtime_ns, type, size FROM loose_objects")
+        }
+
+    def split_loose(
+        self, loose_paths: Iterable[Path]
+    ) -> Tuple[List[Tuple[Path, int, int]], List[Path]]:
+        """
+        Separate loose objects whose file is unchanged since it was cached
+        from the new ones. Returns ([(path, type_id, size)], [new paths]).
+        """
+        manifest = self.loose_manifest()
+        known, new = [], []
+        for path in loose_paths:
+            cached = manifest.get(loose_sha(path))
+            try:
+                mtime_ns = path.stat().st_mtime_ns
+            except OSError:
+                mtime_ns = None
+            if cached is not None and cached[0] == mtime_ns:
+                known.append((path, cached[1], cached[2]))
+            else:
+                new.append(path)
+        return known, new
+
+    def store_loose_objects(
+        self, objects: Iterable[Tuple[Path, int, int]]
+    ) -> None:
+        """Remember (path, type_id, size) of loose objects just read"""
+        rows = []
+        for path, type_id, size in objects:
+            try:
+                mtime_ns = path.stat().st_mtime_ns
+            except OSError:
+                continue
+            rows.append((loose_sha(path), mtime_ns, type_id, size))
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO loose_objects VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+    def prune_loose(self, loose_paths: Iterable[Path]) -> None:
+        """Forget loose objects that were packed or pruned"""
+        present = {loose_sha(path) for path in loose_paths}
+        stale = [(sha,) for sha in self.loose_manifest() if sha not in present]
+        with self._db:
+            self._db.executemany(
+                "DELETE FROM loose_objects WHERE sha = ?", stale)
+
+    # commits
+
+    def commits(self, shas: Iterable[bytes]) -> Dict[bytes, CommitRecord]:
+        """Cached commit records for the given SHAs, when known"""
+        found = {}
+        for sha in shas:
+            row = self._db.execute(
+                "SELECT sha, tree, parents, commit_time, size "
+                "FROM commits WHERE sha = ?", (sha,)
+            ).fetchone()
+            if row is not None:
+                found[sha] = _commit_record(row)
+        return found
+
+    def store_commits(self, commits: List[CommitRecord]) -> None:
+        with self._db:
+            self._insert_commits(commits)
+
+    def _insert_commits(self, commits: List[CommitRecord]) -> None:
+        self._db.executemany(
+            "INSERT OR IGNORE INTO commits VALUES (?, ?, ?, ?, ?)",
+            ((sha, tree, b"".join(parents), commit_time, size)
+             for sha, tree, parents, commit_time, size in commits),
+        )
+
+
+def _commit_record(row: tuple) -> CommitRecord:
+    sha, tree, parents, commit_time, size = row
+    return sha, tree, [
+        parents[i:i + 20] for i in range(0, len(parents), 20)
+    ], commit_time, size
+
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 
@@ -11,6 +12,13 @@ def get_git_dir(repo_path: Path) -> Path | None:
     return None
 
 
+HEX_DIGITS = frozenset("0123456789abcdef")
+
+
+def _is_hex(name: str) -> bool:
+    return all(c in HEX_DIGITS for c in name.lower())
+
+
 def find_loose_object_dirs(git_dir: Path) -> list[Path]:
     """
     Returns a list of paths for loose object directories .
@@ -20,17 +28,40 @@ def find_loose_object_dirs(git_dir: Path) -> list[Path]:
     if not objects_dir.is_dir():
         return loose_dirs
     for d in objects_dir.iterdir():
-        if d.is_dir() and len(d.name) == 2:
-            is_hex = True
-            for c in d.name.lower():
-                if c not in "0123456789abcdef":
-                    is_hex = False
-                    break
-            if is_hex:
-                loose_dirs.append(d)
+        if d.is_dir() and len(d.name) == 2 and _is_hex(d.name):
+            loose_dirs.append(d)
     return loose_dirs
 
 
+def find_loose_objects(git_dir: Path) -> list[Path]:
+    """
+    Returns a list of paths for every loose object file,
+    across all the fan-out directories.
+    """
+    return list_loose_objects(git_dir / "objects")
+
+
+def list_loose_objects(objects_dir: Path) -> list[Path]:
+    """
+    Returns a list of paths for every loose object file inside an objects
+    directory (a repository's own or one listed in its alternates).
+    Uses os.scandir inside the fan-out directories so file types come
+    from the directory listing instead of one stat() per object.
+    """
+    loose_objects = []
+    if not objects_dir.is_dir():
+        return loose_objects
+    for d in objects_dir.iterdir():
+        if len(d.name) != 2 or not _is_hex(d.name) or not d.is_dir():
+            continue
+        with os.scandir(d) as entries:
+            for entry in entries:
+                if len(entry.name) == 38 and _is_hex(entry.name) \
+                        and entry.is_file():
+                    loose_objects.append(Path(entry.path))
+    return loose_objects
+
+
 def find_packfiles(git_dir: Path) -> list[Path]:
     """
     Returns a list of paths for packfiles.
@@ -43,3 +74,60 @@ def find_packfiles(git_dir: Path) -> list[Path]:
         if f.is_file() and f.name.endswith(".pack"):
             packfiles.append(f)
     return packfiles
+
+
+def read_refs(git_dir: Path) -> dict[str, str]:
+    """
+    Returns a mapping of ref name to SHA for HEAD, every loose ref under
+    refs/ and the entries of packed-refs. Symbolic refs are followed;
+    loose refs win over packed ones, as in git.
+    """
+    refs = {}
+    packed_refs = git_dir / "packed-refs"
+    if packed_refs.is_file():
+        for line in packed_refs.read_text().splitlines():
+            if not line or line[0] in "#^":
+                continue
+            sha, _, name = line.partition(" ")
+            refs[name] = sha
+
+    refs_dir = git_dir / "refs"
+    if refs_dir.is_dir():
+        for path in refs_dir.rglob("*"):
+            if path.is_file():
+                name = path.relative_to(git_dir).as_posix()
+                refs[name] = path.read_text().strip()
+
+    head = git_dir / "HEAD"
+    if head.is_file():
+        refs["HEAD"] = head.read_text().strip()
+
+    resolved = {}
+    for name, value in refs.items():
+        for _ in range(10):  # symbolic ref depth, like git's limit
+            if not value.startswith("ref: "):
+                break
+            value = refs.get(value[5:].strip(), "")
+        if len(value) == 40 and _is_hex(value):
+            resolved[name] = value
+    return resolved
+
+
+def read_reflog_shas(git_dir: Path) -> set[str]:
+    """
+    Returns every SHA recorded in the reflogs under logs/, so commits
+    that only the reflog still points to (e.g. history from before a
+    rebase) can be reached too.
+    """
+    shas = set()
+    logs_dir = git_dir / "logs"
+    if not logs_dir.is_dir():
+        return shas
+    for path in logs_dir.rglob("*"):
+        if not path.is_file():
+            continue
+        for line in path.read_text(errors="replace").splitlines():
+            for value in line.split(" ", 2)[:2]:
+                if len(value) == 40 and _is_hex(value) and value != "0" * 40:
+                    shas.add(value)
+    return shas
@@ -0,0 +1,133 @@
+import os
+import random
+import string
+import subprocess
+import zlib
+from pathlib import Path
+
+import pytest
+
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "Guardian Test",
+    "GIT_AUTHOR_EMAIL": "guardian@test.com",
+    "GIT_COMMITTER_NAME": "Guardian Test",
+    "GIT_COMMITTER_EMAIL": "guardian@test.com",
+    "GIT_AUTHOR_DATE": "2024-01-01T00:00:00 +0000",
+    "GIT_COMMITTER_DATE": "2024-01-01T00:00:00 +0000",
+    "GIT_CONFIG_NOSYSTEM": "1",
+    "HOME": "/nonexistent",
+}
+
+
+def run_git(repo: Path, *args: str, input: bytes = None) -> str:
+    """Run git inside repo and return its stdout"""
+    env = {**os.environ, **GIT_ENV}
+    result = subprocess.run(
+        ["git", "-C", str(repo), *args],
+        input=input,
+        capture_output=True,
+        check=True,
+        env=env,
+    )
+    return result.stdout.decode()
+
+
+def make_repo(path: Path, commits: int = 12) -> Path:
+    """
+    Create a repository whose history deltifies well:
+    every commit edits one line of the same large file.
+    """
+    path.mkdir()
+    run_git(path, "init", "-q", "-b", "main")
+    lines = [f"line {i} " + "x" * 60 for i in range(200)]
+    for i in range(commits):
+        lines[i] = f"changed in commit {i}"
+        (path / "data.txt").write_text("\n".join(lines))
+        (path / f"file{i % 3}.txt").write_text(f"content {i}\n")
+        run_git(path, "add", "-A")
+        run_git(path, "commit", "-q", "-m", f"commit {i}")
+    return path
+
+
+def make_varied_repo(path: Path, commits: int = 8) -> Path:
+    """
+    Create a repository whose deltas carry lots of literal text, so git
+    compresses them with dynamic Huffman blocks as it does in real repos.
+    """
+    path.mkdir()
+    run_git(path, "init", "-q", "-b", "main")
+    rng = random.Random(7)
+    words = [
+        "".join(rng.choice(string.ascii_lowercase)
+                for _ in range(rng.randint(2, 9)))
+        for _ in range(500)
+    ]
+    lines = [" ".join(rng.choices(words, k=10)) for _ in range(400)]
+    for i in range(commits):
+        for j in rng.sample(range(len(lines)), 60):
+            lines[j] = " ".join(rng.choices(words, k=10))
+        (path / "data.txt").write_text("\n".join(lines))
+        run_git(path, "add", "-A")
+        run_git(path, "commit", "-q", "-m", f"commit {i}")
+    run_git(path, "repack", "-a", "-d", "-f", "-q")
+    return path
+
+
+@pytest.fixture
+def git_repo(tmp_path) -> Path:
+    """A repository with only loose objects"""
+    return make_repo(tmp_path / "repo")
+
+
+@pytest.fixture
+def packed_repo(tmp_path) -> Path:
+    """A repository fully packed into a single deltified pack"""
+    repo = make_repo(tmp_path / "repo")
+    run_git(repo, "repack", "-a", "-d", "-f", "-q", "--depth=50", "--window=50")
+    run_git(repo, "prune-packed")
+    return repo
+
+
+@pytest.fixture
+def packfile(packed_repo) -> Path:
+    """Path to the single packfile of packed_repo"""
+    return next((packed_repo / ".git" / "objects" / "pack").glob("*.pack"))
+
+
+def corrupt_loose_object(repo: Path, sha: str) -> None:
+    """
+    Rewrite a loose object so its header still reads
+    but its content no longer hashes to its name
+    """
+    path = repo / ".git" / "objects" / sha[:2] / sha[2:]
+    data = zlib.decompress(path.read_bytes())
+    os.chmod(path, 0o644)
+    path.write_bytes(zlib.compress(data[:-1] + b"!"))
+
+
+def corrupt_packed_object(packfile: Path, sha: str) -> None:
+    """
+    Break the zlib stream of a packed object,
+    leaving its entry header intact
+    """
+    offsets = {}
+    with open(packfile.with_suffix(".idx"), "rb") as idx:
+        for line in run_git(packfile.parent, "show-index",
+                            input=idx.read()).splitlines():
+            offset, name = line.split()[:2]
+            offsets[name] = int(offset)
+    data = bytearray(packfile.read_bytes())
+    pos = offsets[sha]
+    obj_type = data[pos] >> 4 & 7
+    while data[pos] & 0x80:
+        pos += 1
+    pos += 1
+    if obj_type == 6:  # ofs_delta: skip the base offset
+        while data[pos] & 0x80:
+            pos += 1
+        pos += 1
+    elif obj_type == 7:  # ref_delta: skip the base name
+        pos += 20
+    os.chmod(packfile, 0o644)
+    data[pos:pos + 2] = b"\xff\xff"
+    packfile.write_bytes(bytes(data))
@@ -0,0 +1,149 @@
+from collections import defaultdict
+from unittest.mock import patch
+
+from typer.testing import CliRunner
+
+from guardian.census import TypeCensus, largest_objects, object_census, \
+    object_paths
+from guardian.cli import app
+from guardian.object_database import ObjectDatabase
+from guardian.object_scanner import PackReader
+from tests.conftest import run_git
+
+
+def git_census(repo):
+    """(count, size, disk size) per type as git cat-file reports them"""
+    out = run_git(
+        repo, "cat-file", "--batch-all-objects",
+        "--batch-check=%(objecttype) %(objectsize) %(objectsize:disk)",
+    )
+    totals = defaultdict(lambda: [0, 0, 0])
+    for line in out.splitlines():
+        obj_type, size, disk_size = line.split()
+        totals[obj_type][0] += 1
+        totals[obj_type][1] += int(size)
+        totals[obj_type][2] += int(disk_size)
+    return totals
+
+
+def test_census_matches_git(packed_repo):
+    (packed_repo / "new.txt").write_text("loose\n")
+    run_git(packed_repo, "add", "new.txt")
+    expected = git_census(packed_repo)
+
+    with ObjectDatabase.open(packed_repo / ".git") as odb, \
+            patch.object(PackReader, "extract_object") as mock_extract, \
+            patch.object(PackReader, "resolve") as mock_resolve:
+        census = object_census(odb)
+    mock_extract.assert_not_called()
+    mock_resolve.assert_not_called()
+
+    for obj_type, row in census.items():
+        count, size, disk_size = expected.get(obj_type, [0, 0, 0])
+        assert (row["count"], row["size"], row["compressed"]) == \
+            (count, size, disk_size)
+    assert census["blob"]["deltas"] > 0
+
+
+def test_percentiles():
+    census = TypeCensus()
+    for size in range(1, 101):
+        census.add(size, 1)
+    summary = census.summary()
+    assert (summary["p50"], summary["p90"], summary["p99"], summary["max"]) == \
+        (50, 90, 99, 100)
+    assert TypeCensus().summary()["p50"] == 0
+
+
+def test_scan_summary(packed_repo):
+    result = CliRunner().invoke(app, ["scan", str(packed_repo), "--summary"])
+    assert result.exit_code == 0
+    assert "p: t=" not in result.stdout
+    rows = {line.split()[0]: line.split() for line in result.stdout.splitlines()}
+    assert rows["commit"][1] == "12"
+    assert rows["total"][1] == str(sum(
+        count for count, _, _ in git_census(packed_repo).values()))
+
+
+def test_scan_summary_skips_pack_without_idx(packed_repo, packfile):
+    (packed_repo / "new.txt").write_text("loose\n")
+    run_git(packed_repo, "add", "new.txt")
+    packfile.with_suffix(".idx").unlink()
+    result = CliRunner().invoke(app, ["scan", str(packed_repo), "--summary"])
+    assert result.exit_code == 0, result.output
+    assert f"Error reading packfile {packfile}" in result.stdout
+    rows = {line.split()[0]: line.split() for line in result.stdout.splitlines()}
+    assert rows["blob"][1] == "1"
+
+
+def test_largest_objects_match_git(packed_repo):
+    out = run_git(
+        packed_repo, "cat-file", "--batch-all-objects",
+        "--batch-check=%(objectsize:disk) %(objectsize) %(deltabase)",
+    )
+    rows = [line.split() for line in out.splitlines()]
+    with ObjectDatabase.open(packed_repo / ".git") as odb:
+        report = largest_objects(odb, 5)
+        assert largest_objects(odb, 0)["by_disk"] == []
+
+    assert [row["disk"] for row in report["by_disk"]] == \
+        sorted((int(disk) for disk, _, _ in rows), reverse=True)[:5]
+    assert [row["size"] for row in report["by_size"]] == \
+        sorted((int(size) for _, size, _ in rows), reverse=True)[:5]
+    deltas = [row for row in rows if set(row[2]) != {"0"}]
+    assert report["storage"]["delta"] == {
+        "count": len(deltas), "disk": sum(int(row[0]) for row in deltas)}
+    assert report["storage"]["full"]["count"] == len(rows) - len(deltas)
+    assert report["storage"]["loose"]["count"] == 0
+
+
+def test_object_paths(packed_repo):
+    listed = run_git(packed_repo, "rev-list", "--objects", "--all")
+    expected = {}
+    for line in listed.splitlines():
+        sha, _, path = line.partition(" ")
+        if path:
+            expected[bytes.fromhex(sha)] = path
+    data_blobs = {sha for sha, path in expected.items() if path == "data.txt"}
+    root_tree = run_git(packed_repo, "rev-parse", "HEAD^{tree}").strip()
+
+    with ObjectDatabase.open(packed_repo / ".git") as odb:
+        paths = object_paths(
+            odb, data_blobs | {bytes.fromhex(root_tree)},
+            [run_git(packed_repo, "rev-parse", "HEAD").strip()],
+        )
+    assert paths == {
+        **{sha: "data.txt" for sha in data_blobs},
+        bytes.fromhex(root_tree): "/",
+    }
+
+
+def test_scan_top(packed_repo):
+    result = CliRunner().invoke(app, ["scan", str(packed_repo), "--top", "2"])
+    assert result.exit_code == 0
+    lines = result.stdout.splitlines()
+    assert "Largest 2 objects inflated:" in lines
+    largest = lines[lines.index("Largest 2 objects inflated:") + 1].split()
+    assert largest[1] == "blob" and largest[-1] == "data.txt"
+
+
+def test_scan_top_skips_pack_without_idx(packed_repo, packfile):
+    (packed_repo / "new.txt").write_text("the only object left\n")
+    run_git(packed_repo, "add", "new.txt")
+    packfile.with_suffix(".idx").unlink()
+    result = CliRunner().invoke(app, ["scan", str(packed_repo), "--top", "3"])
+    assert result.exit_code == 0, result.output
+    assert f"Error reading packfile {packfile}" in result.stdout
+    assert "Largest 1 objects on disk:" in result.stdout
+
+
+def test_scan_modes_are_exclusive(packed_repo):
+    runner = CliRunner()
+    for flags in (
+        ["--summary", "--verify", "sha"],
+        ["--top", "2", "--verify", "fast"],
+        ["--summary", "--top", "2"],
+    ):
+        result = runner.invoke(app, ["scan", str(packed_repo), *flags])
+        assert result.exit_code == 2
+        assert "can't be combined" in result.stdout
@@ -1,10 +1,11 @@
 import pytest
 from pathlib import Path
-from unittest.mock import patch
+from unittest.mock import patch, PropertyMock
 import networkx as nx
 from typer.testing import CliRunner
 from guardian.cli import app, build_dag
 from guardian.object_scanner import GitObject
+from guardian.object_database import ObjectDatabase
 
 
 @pytest.fixture
@@ -38,10 +39,12 @@ def test_scan_non_git_repo(runner):
 
 
 def test_scan_empty_repo(runner, mock_git_repo):
-    with patch(
-        "guardian.cli.find_loose_object_dirs", return_value=[]
+    with patch.object(
+        ObjectDatabase, "loose_objects", return_value=[]
     ) as mock_find_loose:
-        with patch("guardian.cli.find_packfiles", return_value=[]) as mock_find_packs:
+        with patch.object(
+            ObjectDatabase, "pack_paths", new_callable=PropertyMock, return_value=[]
+        ) as mock_find_packs:
             result = runner.invoke(app, ["scan", "/repo"])
             assert result.exit_code == 0
             assert "Tenemos 0 loose objects y 0 packs" in result.stdout
@@ -50,14 +53,15 @@ def test_scan_empty_repo(runner, mock_git_repo):
 
 
 def test_scan_with_loose_error(runner, mock_git_repo):
-    loose_dirs = [Path("/repo/.git/objects/ab/cd1234")]
-    with patch(
-        "guardian.cli.find_loose_object_dirs", return_value=loose_dirs
+    loose_objects = [Path("/repo/.git/objects/ab/cd1234")]
+    with patch.object(
+        ObjectDatabase, "loose_objects", return_value=loose_objects
     ) as mock_find_loose:
-        with patch("guardian.cli.find_packfiles", return_value=[]) as mock_find_packs:
+        with patch.object(
+            ObjectDatabase, "pack_paths", new_callable=PropertyMock, return_value=[]
+        ) as mock_find_packs:
             with patch(
-                "guardian.cli.read_loose",
-                return_value=mock_loose_object,
+                "guardian.cli.scan_loose_objects",
                 side_effect=ValueError("Corrupted object"),
             ) as mock_read_loose:
                 res = runner.invoke(app, ["scan", "/repo"])
@@ -70,14 +74,17 @@ def test_scan_with_loose_error(runner, mock_git_repo):
 
 def test_scan_with_packfile_error(runner, mock_git_repo):
     pack_files = [Path("/repo/.git/objects/pack/pack-abc123.pack")]
-    with patch(
-        "guardian.cli.find_loose_object_dirs", return_value=[]
+    with patch.object(
+        ObjectDatabase, "loose_objects", return_value=[]
     ) as mock_find_loose:
-        with patch(
-            "guardian.cli.find_packfiles", return_value=pack_files
-        ) as mock_find_packs:
+        with patch.object(
+            ObjectDatabase,
+            "pack_paths",
+            new_callable=PropertyMock,
+            return_value=pack_files,
+        ) as mock_find_packs, patch.object(ObjectDatabase, "reader"):
             with patch(
-                "guardian.cli.read_packfile",
+                "guardian.cli.iter_packfile",
                 side_effect=ValueError("Corrupted packfile"),
             ) as mock_read_pack:
                 result = runner.invoke(app, ["scan", "/repo"])
@@ -91,19 +98,24 @@ def test_scan_with_packfile_error(runner, mock_git_repo):
 def test_scan_with_objects_and_packfiles(
     runner, mock_git_repo, mock_loose_object, mock_pack_object
 ):
-    loose_dirs = [Path("/repo/.git/objects/ab/cd1234")]
+    loose_objects = [Path("/repo/.git/objects/ab/cd1234")]
     pack_files = [Path("/repo/.git/objects/pack/pack-abc123.pack")]
-    with patch(
-        "guardian.cli.find_loose_object_dirs", return_value=loose_dirs
+    with patch.object(
+        ObjectDatabase, "loose_objects", return_value=loose_objects
     ) as mock_find_loose:
-        with patch(
-            "guardian.cli.find_packfiles", return_value=pack_files
-        ) as mock_find_packs:
+        with patch.object(
+            ObjectDatabase,
+            "pack_paths",
+            new_callable=PropertyMock,
+            return_value=pack_files,
+        ) as mock_find_packs, patch.object(ObjectDatabase, "reader"):
             with patch(
-                "guardian.cli.read_loose", return_value=mock_loose_object
+                "guardian.cli.scan_loose_objects",
+                return_value=iter([mock_loose_object]),
             ) as mock_read_loose:
                 with patch(
-                    "guardian.cli.read_packfile", return_value=[mock_pack_object]
+                    "guardian.cli.iter_packfile",
+                    return_value=iter([mock_pack_object]),
                 ) as mock_read_pack:
                     res = runner.invoke(app, ["scan", "/repo"])
                     assert "Tenemos 1 loose objects y 1 packs" in res.stdout
@@ -151,7 +163,9 @@ def test_build_dag_success():
     ):
         build_dag(fake_repo_path)
         mock_get_git_dir.assert_called_once_with(Path(fake_repo_path))
-        mock_build_dag.assert_called_once_with(fake_git_dir)
+        mock_build_dag.assert_called_once()
+        assert mock_build_dag.call_args.args[0] == fake_git_dir
+        assert isinstance(mock_build_dag.call_args.args[1], ObjectDatabase)
         mock_calc_gen.assert_called_once_with(fake_dag)
         mock_get_stats.assert_called_once_with(fake_dag)
         mock_write_graphml.assert_called_once_with(fake_dag, "dag.graphml")
@@ -454,3 +468,20 @@ def test_merge_failure_not_conflict(runner, mock_git_repo):
         assert result.exit_code == 1
         assert "Merge failed" in result.stdout
         assert "not a valid branch" in result.stdout
+
+
+def test_scan_passes_jobs_to_pack_reader(runner, mock_git_repo, mock_pack_object):
+    pack_files = [Path("/repo/.git/objects/pack/pack-abc123.pack")]
+    with patch.object(ObjectDatabase, "loose_objects", return_value=[]), \
+            patch.object(
+                ObjectDatabase, "pack_paths",
+                new_callable=PropertyMock, return_value=pack_files,
+            ), patch.object(ObjectDatabase, "reader"), \
+            patch(
+                "guardian.cli.iter_packfile",
+                return_value=iter([mock_pack_object]),
+            ) as mock_read_pack:
+        res = runner.invoke(app, ["scan", "/repo", "--jobs", "4", "--no-cache"])
+    assert f"p: t={mock_pack_object.obj_type}" in res.stdout
+    assert mock_read_pack.call_args.kwargs["jobs"] == 4
+    assert mock_read_pack.call_args.kwargs["content"] is False
@@ -0,0 +1,165 @@
+from unittest.mock import patch
+
+import networkx as nx
+import pytest
+from typer.testing import CliRunner
+
+from guardian.cli import app
+from guardian.commit_graph import (
+    load_commit_graph,
+    read_graph_chain,
+    write_commit_graph,
+)
+from guardian.dag_builder import (
+    build_dag_from_git_commits,
+    build_graph,
+    calculate_generation_numbers,
+)
+from guardian.object_database import ObjectDatabase
+from tests.conftest import run_git
+
+
+def parsed_dag(repo):
+    with ObjectDatabase.open(repo / ".git") as odb:
+        return build_graph(odb.iter_objects(types={"commit"}, lazy=True))
+
+
+def commit_file(repo, name):
+    (repo / name).write_text(f"{name}\n")
+    run_git(repo, "add", name)
+    run_git(repo, "commit", "-q", "-m", name)
+
+
+def test_no_commit_graph(packed_repo):
+    assert load_commit_graph(packed_repo / ".git" / "objects") is None
+
+
+def test_reads_commit_graph(packed_repo):
+    run_git(packed_repo, "commit-graph", "write", "--reachable")
+    objects_dir = packed_repo / ".git" / "objects"
+    with load_commit_graph(objects_dir) as graph:
+        assert len(graph) == 12
+        head = run_git(packed_repo, "rev-parse", "HEAD").strip()
+        position = graph.find_position(head)
+        assert graph.sha_at(position).hex() == head
+        tree, parents, generation, commit_time = graph.commit_data(position)
+        assert tree.hex() == run_git(
+            packed_repo, "rev-parse", "HEAD^{tree}").strip()
+        assert graph.sha_at(parents[0]).hex() == run_git(
+            packed_repo, "rev-parse", "HEAD~1").strip()
+        assert generation == 12
+        assert commit_time == int(run_git(
+            packed_repo, "log", "-1", "--format=%ct").strip())
+
+
+def test_dag_from_commit_graph_skips_object_scan(packed_repo):
+    expected = parsed_dag(packed_repo)
+    run_git(packed_repo, "commit-graph", "write", "--reachable")
+    with patch.object(ObjectDatabase, "iter_objects") as mock_iter:
+        dag = build_dag_from_git_commits(packed_repo)
+    mock_iter.assert_not_called()
+    assert nx.utils.graphs_equal(
+        nx.DiGraph(dag.edges()), nx.DiGraph(expected.edges()))
+    assert set(dag.nodes()) == set(expected.nodes())
+
+
+def test_dag_picks_up_commits_newer_than_graph(packed_repo):
+    run_git(packed_repo, "commit-graph", "write", "--reachable")
+    commit_file(packed_repo, "after.txt")
+    run_git(packed_repo, "checkout", "-q", "-b", "side", "HEAD~3")
+    commit_file(packed_repo, "side.txt")
+    run_git(packed_repo, "checkout", "-q", "-")
+    run_git(packed_repo, "merge", "-q", "--no-edit", "side")
+
+    expected = parsed_dag(packed_repo)
+    dag = build_dag_from_git_commits(packed_repo)
+    assert set(dag.edges()) == set(expected.edges())
+    assert dag.number_of_nodes() == 15
+
+
+def test_split_commit_graph_chain(packed_repo):
+    run_git(packed_repo, "commit-graph", "write", "--reachable", "--split")
+    commit_file(packed_repo, "one.txt")
+    commit_file(packed_repo, "two.txt")
+    run_git(packed_repo, "commit-graph", "write", "--reachable",
+            "--split=no-merge")
+    objects_dir = packed_repo / ".git" / "objects"
+    with load_commit_graph(objects_dir) as graph:
+        assert len(graph.layers) == 2
+        assert len(graph) == 14
+
+    expected = parsed_dag(packed_repo)
+    with patch.object(ObjectDatabase, "iter_objects") as mock_iter:
+        dag = build_dag_from_git_commits(packed_repo)
+    mock_iter.assert_not_called()
+    assert set(dag.edges()) == set(expected.edges())
+
+
+def octopus(repo):
+    main = run_git(repo, "rev-parse", "--abbrev-ref", "HEAD").strip()
+    for branch in ("a", "b", "c"):
+        run_git(repo, "checkout", "-q", "-b", branch, f"{main}~2")
+        commit_file(repo, f"{branch}.txt")
+    run_git(repo, "checkout", "-q", main)
+    run_git(repo, "merge", "-q", "--no-edit", "a", "b", "c")
+
+
+def test_write_commit_graph_verifies_with_git(packed_repo):
+    octopus(packed_repo)
+    dag = build_dag_from_git_commits(packed_repo)
+    objects_dir = packed_repo / ".git" / "objects"
+    path = write_commit_graph(
+        objects_dir, dag, calculate_generation_numbers(dag))
+    assert path == objects_dir / "info" / "commit-graph"
+    run_git(packed_repo, "commit-graph", "verify")
+
+    written = path.read_bytes()
+    path.unlink()
+    run_git(packed_repo, "-c", "commitGraph.generationVersion=1",
+            "commit-graph", "write", "--reachable")
+    assert path.read_bytes() == written
+
+    with patch.object(ObjectDatabase, "iter_objects") as mock_iter:
+        reread = build_dag_from_git_commits(packed_repo)
+    mock_iter.assert_not_called()
+    assert set(reread.edges()) == set(dag.edges())
+
+
+def test_write_split_chain_appends_layers(packed_repo):
+    objects_dir = packed_repo / ".git" / "objects"
+    dag = build_dag_from_git_commits(packed_repo)
+    first = write_commit_graph(
+        objects_dir, dag, calculate_generation_numbers(dag), split=True)
+    first_bytes = first.read_bytes()
+    assert write_commit_graph(
+        objects_dir, dag, calculate_generation_numbers(dag), split=True) is None
+
+    octopus(packed_repo)
+    dag = build_dag_from_git_commits(packed_repo)
+    second = write_commit_graph(
+        objects_dir, dag, calculate_generation_numbers(dag), split=True)
+    assert first.read_bytes() == first_bytes
+    assert read_graph_chain(objects_dir) == [
+        first.stem[len("graph-"):], second.stem[len("graph-"):]]
+    run_git(packed_repo, "commit-graph", "verify")
+
+    with load_commit_graph(objects_dir) as graph:
+        assert [layer.commit_count for layer in graph.layers] == [12, 4]
+
+
+def test_write_commit_graph_needs_parents(packed_repo):
+    dag = build_dag_from_git_commits(packed_repo)
+    root = next(n for n in dag if dag.in_degree(n) == 0)
+    dag.remove_node(next(iter(dag.successors(root))))
+    with pytest.raises(ValueError, match="missing 1 parent"):
+        write_commit_graph(packed_repo / ".git" / "objects", dag,
+                           calculate_generation_numbers(dag))
+
+
+def test_build_dag_writes_commit_graph(packed_repo, monkeypatch):
+    monkeypatch.chdir(packed_repo)
+    result = CliRunner().invoke(
+        app, ["build-dag", str(packed_repo), "--write-commit-graph"])
+    assert result.exit_code == 0, result.output
+    assert "Commit-graph written" in result.output
+    run_git(packed_repo, "commit-graph", "verify")
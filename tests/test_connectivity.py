@@ -0,0 +1,160 @@
+from typer.testing import CliRunner
+
+from guardian.cli import app
+from guardian.connectivity import (
+    ObjectBitmap,
+    check_connectivity,
+    connectivity_tips,
+    parse_tree,
+)
+from guardian.object_database import ObjectDatabase
+from tests.conftest import corrupt_loose_object, run_git
+
+
+def count_objects(repo):
+    out = run_git(repo, "cat-file", "--batch-all-objects", "--batch-check")
+    return len(out.splitlines())
+
+
+def check(repo):
+    git_dir = repo / ".git"
+    with ObjectDatabase.open(git_dir) as odb:
+        return check_connectivity(odb, connectivity_tips(git_dir))
+
+
+def test_parse_tree(git_repo):
+    tree = run_git(git_repo, "rev-parse", "HEAD^{tree}").strip()
+    with ObjectDatabase.open(git_repo / ".git") as odb:
+        content = odb.read_object(tree).content
+    entries = [
+        (mode.decode(), name.decode(), sha.hex())
+        for mode, name, sha in parse_tree(content)
+    ]
+    listing = run_git(git_repo, "ls-tree", tree).splitlines()
+    assert entries == [
+        (line.split()[0], line.split("\t")[1], line.split()[2])
+        for line in listing
+    ]
+
+
+def test_connected_repo(packed_repo):
+    results = check(packed_repo)
+    assert results["missing"] == []
+    assert results["dangling"] == []
+    assert results["reachable"] == count_objects(packed_repo)
+
+
+def test_missing_blob(git_repo):
+    blob = run_git(git_repo, "rev-parse", "HEAD:data.txt").strip()
+    (git_repo / ".git" / "objects" / blob[:2] / blob[2:]).unlink()
+    results = check(git_repo)
+    assert {"sha": blob, "type": "blob"}.items() <= results["missing"][0].items()
+    assert len(results["missing"]) == 1
+
+
+def test_missing_blob_reported_once(git_repo):
+    (git_repo / "shared.txt").write_text("in every tree from now on\n")
+    run_git(git_repo, "add", "shared.txt")
+    run_git(git_repo, "commit", "-q", "-m", "shared")
+    (git_repo / "other.txt").write_text("more\n")
+    run_git(git_repo, "add", "other.txt")
+    run_git(git_repo, "commit", "-q", "-m", "other")
+    blob = run_git(git_repo, "rev-parse", "HEAD:shared.txt").strip()
+    (git_repo / ".git" / "objects" / blob[:2] / blob[2:]).unlink()
+
+    results = check(git_repo)
+    assert [obj["sha"] for obj in results["missing"]] == [blob]
+
+
+def test_pack_without_idx(packed_repo):
+    (packed_repo / "late.txt").write_text("packed on its own\n")
+    run_git(packed_repo, "add", "late.txt")
+    run_git(packed_repo, "commit", "-q", "-m", "late")
+    run_git(packed_repo, "repack", "-d", "-q")
+    pack_dir = packed_repo / ".git" / "objects" / "pack"
+    late_pack = min(pack_dir.glob("*.pack"), key=lambda p: p.stat().st_size)
+    late_pack.with_suffix(".idx").unlink()
+
+    results = check(packed_repo)
+    assert list(results["unreadable_packs"]) == [str(late_pack)]
+    assert "Index file not found" in results["unreadable_packs"][str(late_pack)]
+    # only the new commit is lost: HEAD points at it
+    assert [obj["type"] for obj in results["missing"]] == ["commit"]
+
+    result = CliRunner().invoke(app, ["connectivity", str(packed_repo)])
+    assert result.exit_code == 1
+    assert f"unreadable pack {late_pack}" in result.output
+
+
+def test_dangling_objects(packed_repo):
+    (packed_repo / "orphan.txt").write_text("nobody points here\n")
+    blob = run_git(packed_repo, "hash-object", "-w", "orphan.txt").strip()
+    run_git(packed_repo, "commit", "-q", "--allow-empty", "-m", "doomed")
+    doomed = run_git(packed_repo, "rev-parse", "HEAD").strip()
+    run_git(packed_repo, "reset", "-q", "--hard", "HEAD~1")
+    run_git(packed_repo, "reflog", "expire", "--expire=now", "--all")
+
+    results = check(packed_repo)
+    assert results["missing"] == []
+    assert sorted(results["dangling"], key=lambda d: d["type"]) == [
+        {"sha": blob, "type": "blob"},
+        {"sha": doomed, "type": "commit"},
+    ]
+
+
+def test_unreadable_reachable_tree(git_repo):
+    tree = run_git(git_repo, "rev-parse", "HEAD^{tree}").strip()
+    corrupt_loose_object(git_repo, tree)
+
+    results = check(git_repo)
+    assert [(obj["sha"], obj["type"]) for obj in results["unreadable"]] == [
+        (tree, "tree")
+    ]
+    assert "SHA mismatch" in results["unreadable"][0]["error"]
+    # what the tree points to would otherwise look dangling
+    assert results["dangling"] == []
+
+    result = CliRunner().invoke(app, ["connectivity", str(git_repo)])
+    assert result.exit_code == 1
+    assert f"unreadable tree {tree}" in result.output
+    assert "All reachable objects are present" not in result.output
+
+
+def test_unreadable_dangling_object(git_repo):
+    (git_repo / "orphan.txt").write_text("nobody points here\n")
+    blob = run_git(git_repo, "hash-object", "-w", "orphan.txt").strip()
+    path = git_repo / ".git" / "objects" / blob[:2] / blob[2:]
+    path.chmod(0o644)
+    path.write_bytes(b"not zlib at all")
+
+    results = check(git_repo)
+    assert [(obj["sha"], obj["type"]) for obj in results["unreadable"]] == [
+        (blob, "unknown")
+    ]
+    assert results["dangling"] == []
+
+
+def test_object_bitmap_marks_pack_positions(packed_repo):
+    with ObjectDatabase.open(packed_repo / ".git") as odb:
+        head = bytes.fromhex(run_git(packed_repo, "rev-parse", "HEAD").strip())
+        found = odb.locate(head)
+        bitmap = ObjectBitmap()
+        assert not bitmap.contains(head, found)
+        assert bitmap.add(head, found)
+        assert not bitmap.add(head, found)
+        assert bitmap.contains(head, found)
+        assert len(bitmap) == 1
+        pack_path = found[1][0]
+        count = len(odb.reader(pack_path).index)
+        assert len(list(bitmap.unmarked_positions(pack_path, count))) == count - 1
+
+
+def test_connectivity_command(git_repo):
+    runner = CliRunner()
+    result = runner.invoke(app, ["connectivity", str(git_repo)])
+    assert result.exit_code == 0, result.output
+    tree = run_git(git_repo, "rev-parse", "HEAD^{tree}").strip()
+    (git_repo / ".git" / "objects" / tree[:2] / tree[2:]).unlink()
+    result = runner.invoke(app, ["connectivity", str(git_repo)])
+    assert result.exit_code == 1
+    assert f"missing tree {tree}" in result.output
@@ -15,6 +15,7 @@ from guardian.dag_builder import (
 from guardian.object_scanner import GitObject
 
 from unittest.mock import patch, MagicMock
+from tests.conftest import corrupt_loose_object, corrupt_packed_object, run_git
 
 
 def test_build_dag_from_git_commits_simple():
@@ -75,6 +76,8 @@ def test_parse_commit_content():
     result_2 = parse_commit_content(commit_content_2)
     assert "tree" in result_2
 
+    assert parse_commit_content(memoryview(commit_content)) == result
+
 
 def test_get_parent_commits():
     commit_obj = MagicMock(spec=GitObject)
@@ -170,6 +173,13 @@ def test_calculate_generation_numbers():
     assert gen_numbers["F"] == 2
 
 
+def test_calculate_generation_numbers_longest_path():
+    # A -> B -> C and a shortcut A -> C: C is two steps from the root
+    dag = nx.DiGraph([("A", "B"), ("B", "C"), ("A", "C")])
+    gen_numbers = calculate_generation_numbers(dag)
+    assert gen_numbers == {"A": 0, "B": 1, "C": 2}
+
+
 def test_get_dag_stats():
     dag = nx.DiGraph()
     # A -> B -> D
@@ -309,3 +319,36 @@ def test_is_likely_rewrite():
     path1 = "A→B→C"
     path2 = "A→B→C"
     assert is_likely_rewrite(path1, path2) == (True, 1.0)
+
+
+def test_build_dag_from_packed_repo(packed_repo):
+    dag = build_dag_from_git_commits(packed_repo)
+    assert dag.number_of_nodes() == 12
+    assert dag.number_of_edges() == 11
+    head = run_git(packed_repo, "rev-parse", "HEAD").strip()
+    assert dag.out_degree(head) == 0
+
+
+def test_build_dag_skips_corrupt_commits(packed_repo, packfile, capsys):
+    root = run_git(packed_repo, "rev-list", "--max-parents=0", "HEAD").strip()
+    corrupt_packed_object(packfile, root)
+    (packed_repo / "loose.txt").write_text("loose\n")
+    run_git(packed_repo, "add", "loose.txt")
+    run_git(packed_repo, "commit", "-q", "-m", "loose")
+    loose = run_git(packed_repo, "rev-parse", "HEAD").strip()
+    corrupt_loose_object(packed_repo, loose)
+
+    dag = build_dag_from_git_commits(packed_repo)
+    out = capsys.readouterr().out
+    assert f"Error! reading commit {root}" in out
+    assert f"Error! reading commit {loose}" in out
+    assert dag.number_of_nodes() == 11
+    assert root not in dag and loose not in dag
+
+
+def test_build_graph_accepts_generator():
+    commit1 = GitObject("commit", "aa" * 20, 10, b"tree t\n")
+    commit2 = GitObject("commit", "bb" * 20, 10,
+                        f"tree t\nparent {'aa' * 20}\n".encode())
+    dag = build_graph(c for c in [commit1, commit2])
+    assert list(dag.edges()) == [("aa" * 20, "bb" * 20)]
@@ -0,0 +1,125 @@
+from unittest.mock import patch
+
+from typer.testing import CliRunner
+
+from guardian.cli import app
+from guardian.delta_chains import (
+    _chain_costs,
+    analyze_delta_chains,
+    chain_depths,
+    delta_bases,
+    entry_sizes,
+)
+from guardian.object_scanner import PackReader, find_idx_path
+from tests.conftest import run_git
+
+
+def verify_pack(packfile):
+    """sha -> (depth, base sha) from git verify-pack -v"""
+    out = run_git(
+        packfile.parent, "verify-pack", "-v", str(find_idx_path(packfile))
+    )
+    chains = {}
+    for line in out.splitlines():
+        fields = line.split()
+        if len(fields) == 5:
+            chains[fields[0]] = (0, None)
+        elif len(fields) == 7:
+            chains[fields[0]] = (int(fields[5]), fields[6])
+    return chains
+
+
+def test_depths_match_git(packfile):
+    expected = verify_pack(packfile)
+    with PackReader(packfile) as pack, \
+            patch.object(PackReader, "inflate") as mock_inflate:
+        report = analyze_delta_chains(pack, worst=3)
+    mock_inflate.assert_not_called()
+
+    assert report["objects"] == len(expected)
+    assert report["deltas"] == sum(1 for d, _ in expected.values() if d)
+    assert report["max_depth"] == max(d for d, _ in expected.values())
+    assert report["max_depth"] > 1
+    histogram = {}
+    for depth, _ in expected.values():
+        histogram[depth] = histogram.get(depth, 0) + 1
+    assert report["histogram"] == histogram
+
+    depths = [chain["depth"] for chain in report["worst"]]
+    assert depths == sorted(depths, reverse=True)
+    assert depths[0] == report["max_depth"]
+    for chain in report["worst"]:
+        assert expected[chain["sha"]][0] == chain["depth"]
+        assert len(chain["chain"]) == chain["depth"] + 1
+        for sha, base in zip(chain["chain"], chain["chain"][1:]):
+            assert expected[sha][1] == base
+        assert expected[chain["root"]] == (0, None)
+    assert report["shared_bases"][0]["dependents"] <= report["deltas"]
+
+
+def test_repack_estimate_caps_depth(packfile):
+    with PackReader(packfile) as pack:
+        uncapped = analyze_delta_chains(pack)
+        capped = analyze_delta_chains(pack, max_depth=1)
+    assert uncapped["repacked_amplification"] == uncapped["amplification"]
+    assert capped["repacked_amplification"] < capped["amplification"]
+    assert capped["repacked_amplification"] <= 2
+    assert capped["repacked_byte_amplification"] < \
+        capped["byte_amplification"]
+
+
+def test_broken_chains_are_left_out():
+    bases = {10: None, 20: 10, 30: 20, 40: 99, 50: 60, 60: 50}
+    assert chain_depths(bases) == {10: 0, 20: 1, 30: 2}
+
+
+def test_entry_sizes_match_git(packfile):
+    out = run_git(
+        packfile.parent, "verify-pack", "-v", str(find_idx_path(packfile))
+    )
+    expected = {
+        int(fields[4]): int(fields[3])
+        for fields in map(str.split, out.splitlines())
+        if len(fields) in (5, 7)
+    }
+    with PackReader(packfile) as pack, \
+            patch.object(PackReader, "read_entry", side_effect=ValueError):
+        assert delta_bases(pack) == {}
+        assert entry_sizes(pack) == expected
+
+
+def test_chain_costs_match_walking_every_chain(packfile):
+    def walk(offset, bases, sizes, limit):
+        cost = 0
+        for _ in range(limit + 1):
+            if offset is None:
+                break
+            cost += sizes[offset]
+            offset = bases[offset]
+        return cost
+
+    with PackReader(packfile) as pack:
+        bases = delta_bases(pack)
+        sizes = entry_sizes(pack)
+    depths = chain_depths(bases)
+    for limit in (0, 1, 3, 50):
+        assert _chain_costs(bases, depths, sizes, limit) == (
+            sum(walk(offset, bases, sizes, len(bases)) for offset in depths),
+            sum(walk(offset, bases, sizes, limit) for offset in depths),
+        )
+
+
+def test_delta_chains_command_skips_pack_without_idx(packed_repo, packfile):
+    packfile.with_suffix(".idx").unlink()
+    result = CliRunner().invoke(app, ["delta-chains", str(packed_repo)])
+    assert result.exit_code == 0, result.output
+    assert "err     packfile: Index file not found" in result.stdout
+
+
+def test_delta_chains_command(packed_repo):
+    result = CliRunner().invoke(
+        app, ["delta-chains", str(packed_repo), "--worst", "1"]
+    )
+    assert result.exit_code == 0
+    assert "depth histogram:" in result.stdout
+    assert "after repack -f --depth=50" in result.stdout
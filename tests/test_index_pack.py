@@ -0,0 +1,101 @@
+import os
+import shutil
+from unittest.mock import patch
+
+import pytest
+from typer.testing import CliRunner
+
+from guardian import index_pack as index_pack_module
+from guardian.cli import app
+from guardian.index_pack import (
+    index_is_usable,
+    index_pack,
+    pack_index_bytes,
+    scan_pack_entries,
+)
+from guardian.object_scanner import PackIndex, PackReader, read_packfile
+from tests.conftest import run_git
+
+
+def remove(path):
+    os.chmod(path, 0o644)
+    path.unlink()
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_rebuilt_idx_matches_git(packfile, tmp_path, monkeypatch, workers):
+    monkeypatch.setattr(index_pack_module, "PARALLEL_MIN_DELTAS", 0)
+    copy = tmp_path / packfile.name
+    shutil.copy(packfile, copy)
+    run_git(tmp_path, "index-pack", "--rev-index", str(copy))
+
+    idx_path = packfile.with_suffix(".idx")
+    remove(idx_path)
+    assert not index_is_usable(packfile)
+    assert index_pack(packfile, write_rev=True, workers=workers) == idx_path
+    assert idx_path.read_bytes() == copy.with_suffix(".idx").read_bytes()
+    assert packfile.with_suffix(".rev").read_bytes() == \
+        copy.with_suffix(".rev").read_bytes()
+    assert index_is_usable(packfile)
+
+
+def test_rebuilds_ref_delta_pack(git_repo):
+    run_git(git_repo, "-c", "repack.useDeltaBaseOffset=false",
+            "repack", "-a", "-d", "-f", "-q", "--depth=50")
+    packfile = next((git_repo / ".git" / "objects" / "pack").glob("*.pack"))
+    expected = packfile.with_suffix(".idx").read_bytes()
+    remove(packfile.with_suffix(".idx"))
+    index_pack(packfile, workers=1)
+    assert packfile.with_suffix(".idx").read_bytes() == expected
+
+
+def test_large_offsets(tmp_path):
+    objects = sorted([
+        (b"\x01" * 20, 1, 12),
+        (b"\x02" * 20, 2, 5 << 30),
+    ])
+    idx_path = tmp_path / "big.idx"
+    idx_path.write_bytes(pack_index_bytes(objects, b"\0" * 20))
+    with PackIndex(idx_path) as index:
+        assert index.verify_checksum()
+        assert list(index) == [(b"\x01" * 20, 12), (b"\x02" * 20, 5 << 30)]
+        assert index.crc32_at(1) == 2
+
+
+def test_corrupt_pack_is_rejected(packfile):
+    os.chmod(packfile, 0o644)
+    data = bytearray(packfile.read_bytes())
+    data[30] ^= 0xFF
+    packfile.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="Pack checksum mismatch"):
+        index_pack(packfile)
+
+
+def test_failed_scan_stops_hinting_sequential_reads(packfile):
+    os.chmod(packfile, 0o644)
+    data = bytearray(packfile.read_bytes())
+    data[-30] ^= 0xFF  # inside the last entry
+    packfile.write_bytes(bytes(data))
+    with PackReader(packfile) as pack, \
+         patch.object(PackReader, "advise") as mock_advise:
+        with pytest.raises(ValueError):
+            scan_pack_entries(pack)
+    assert mock_advise.call_args.kwargs == {"sequential": False}
+
+
+def test_index_pack_command(packed_repo, packfile):
+    expected = {obj.sha for obj in read_packfile(packfile)}
+    idx_path = packfile.with_suffix(".idx")
+    remove(idx_path)
+    with pytest.raises(ValueError, match="Index file not found"):
+        read_packfile(packfile)
+
+    runner = CliRunner()
+    result = runner.invoke(app, ["index-pack", str(packed_repo)])
+    assert result.exit_code == 0, result.output
+    assert f"Wrote {idx_path.name}" in result.output
+    assert {obj.sha for obj in read_packfile(packfile)} == expected
+
+    result = runner.invoke(app, ["index-pack", str(packed_repo)])
+    assert result.exit_code == 0
+    assert "Wrote" not in result.output
@@ -0,0 +1,56 @@
+import os
+
+from typer.testing import CliRunner
+
+from guardian.cli import app
+from guardian.integrity import verify_pack_fast
+from guardian.object_scanner import PackIndex, find_idx_path
+
+
+def flip_byte(path, offset):
+    os.chmod(path, 0o644)
+    data = bytearray(path.read_bytes())
+    data[offset] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+
+def test_intact_pack(packfile):
+    assert verify_pack_fast(packfile) == []
+
+
+def test_corrupt_entry(packfile):
+    with PackIndex(find_idx_path(packfile)) as index:
+        sha, offset = next(iter(index))
+    flip_byte(packfile, offset + 3)
+    problems = verify_pack_fast(packfile)
+    assert problems == [
+        f"CRC32 mismatch for {sha.hex()} at offset {offset}",
+        "Pack checksum mismatch",
+    ]
+
+
+def test_corrupt_trailer(packfile):
+    flip_byte(packfile, packfile.stat().st_size - 1)
+    assert verify_pack_fast(packfile) == [
+        "Pack checksum mismatch",
+        "Index was built for a different pack",
+    ]
+
+
+def test_corrupt_index(packfile):
+    idx_path = find_idx_path(packfile)
+    flip_byte(idx_path, idx_path.stat().st_size - 1)
+    assert verify_pack_fast(packfile) == ["Index checksum mismatch"]
+
+
+def test_scan_verify_fast(packed_repo, packfile):
+    runner = CliRunner()
+    result = runner.invoke(app, ["scan", str(packed_repo), "--verify", "fast"])
+    assert result.exit_code == 0, result.output
+    assert f"{packfile.name}: ok" in result.output
+    assert "p: t=" not in result.output
+
+    flip_byte(packfile, 20)
+    result = runner.invoke(app, ["scan", str(packed_repo), "--verify", "fast"])
+    assert result.exit_code == 1
+    assert "CRC32 mismatch" in result.output
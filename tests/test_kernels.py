@@ -0,0 +1,160 @@
+import importlib
+import sys
+import zlib
+
+import pytest
+
+import guardian
+from guardian import kernels, pykernels
+from guardian.object_database import ObjectDatabase
+from guardian.object_scanner import OFS_DELTA, REF_DELTA, PackReader
+from tests.conftest import run_git
+
+try:
+    from guardian import cy
+except ImportError:
+    cy = None
+
+
+@pytest.fixture(params=[
+    pykernels,
+    pytest.param(cy, marks=pytest.mark.skipif(
+        cy is None, reason="guardian.cy was not built")),
+], ids=["python", "compiled"])
+def impl(request):
+    return request.param
+
+
+def test_kernels_prefer_the_compiled_module():
+    assert kernels.COMPILED == (cy is not None)
+    assert kernels.apply_delta is (cy or pykernels).apply_delta
+
+
+def test_fallback_when_not_built(monkeypatch):
+    monkeypatch.setitem(sys.modules, "guardian.cy", None)
+    monkeypatch.delattr(guardian, "cy", raising=False)
+    try:
+        reloaded = importlib.reload(kernels)
+        assert not reloaded.COMPILED
+        assert reloaded.parse_entry_header is pykernels.parse_entry_header
+    finally:
+        monkeypatch.undo()
+        importlib.reload(kernels)
+
+
+def test_entry_headers(impl, packfile):
+    with PackReader(packfile) as pack:
+        data = packfile.read_bytes()
+        for _, offset in pack.iter_entries():
+            expected = pykernels.parse_entry_header(data, offset)
+            assert impl.parse_entry_header(pack._map, offset) == expected
+            assert impl.parse_entry_header(memoryview(data), offset) == expected
+            if expected[0] == OFS_DELTA:
+                pos = expected[2]
+                assert impl.decode_ofs_distance(data, pos) == \
+                    pykernels.decode_ofs_distance(data, pos)
+
+
+@pytest.mark.parametrize("header", [
+    bytes([0x35]),                       # blob, size 5
+    bytes([0x9f, 0x7f]),                 # continuation byte
+    bytes([0xff] * 9 + [0x01]),          # size past 64 bits
+])
+def test_entry_header_sizes(impl, header):
+    buffer = b"xx" + header + b"rest"
+    assert impl.parse_entry_header(buffer, 2) == \
+        pykernels.parse_entry_header(buffer, 2)
+    assert impl.parse_entry_header(buffer, 2)[2] == 2 + len(header)
+
+
+@pytest.mark.parametrize("encoded", [
+    bytes([0x05]), bytes([0x80, 0x00]), bytes([0xff, 0x7f]),
+    bytes([0xff] * 10 + [0x7f]),         # distance past 64 bits
+])
+def test_ofs_distances(impl, encoded):
+    assert impl.decode_ofs_distance(encoded + b"\0", 0) == \
+        pykernels.decode_ofs_distance(encoded + b"\0", 0)
+
+
+def test_truncated_headers_raise_index_error(impl):
+    with pytest.raises(IndexError):
+        impl.parse_entry_header(bytes([0x95]), 0)
+    with pytest.raises(IndexError):
+        impl.decode_ofs_distance(bytes([0x81]), 0)
+
+
+def test_apply_real_deltas(impl, packfile):
+    with PackReader(packfile) as pack:
+        deltas = 0
+        for _, offset in pack.iter_entries():
+            type_id, size, data_pos, base = pack.read_entry(offset)
+            if type_id not in (OFS_DELTA, REF_DELTA):
+                continue
+            if isinstance(base, bytes):
+                base = pack.index.find_offset(base)
+            _, base_data = pack.resolve(base)
+            delta, _ = pack.inflate(data_pos, size, "delta")
+            result = impl.apply_delta(base_data, delta)
+            assert result == pack.read_content(offset)
+            assert isinstance(result, memoryview) and result.readonly
+            deltas += 1
+    assert deltas
+
+
+@pytest.mark.parametrize("base, delta, error, match", [
+    (b"abc", bytes([4, 1, 1, 0x41]), ValueError, "Delta base size mismatch"),
+    (b"abcd", bytes([4, 2, 3, *b"xyz"]), ValueError, "Delta size mismatch"),
+    (b"abcd", bytes([4, 5, 3, *b"xyz"]), ValueError, "Delta size mismatch"),
+    (b"abcd", bytes([4, 3, 3, *b"xy"]), ValueError, "Truncated delta insert"),
+    (b"abcd", bytes([4, 1, 0]), ValueError, "Invalid delta opcode 0"),
+    (b"abcd", bytes([4, 4, 0x91, 2, 4]), ValueError, "out of base bounds"),
+    (b"abcd", bytes([4, 4, 0x91, 2]), IndexError, None),
+    (b"abcd", bytes([4]), IndexError, None),
+])
+def test_bad_deltas(impl, base, delta, error, match):
+    with pytest.raises(error, match=match):
+        impl.apply_delta(base, delta)
+    with pytest.raises(error, match=match):
+        pykernels.apply_delta(base, delta)
+
+
+def test_copy_size_zero_means_64k(impl):
+    base = bytes(range(256)) * 256
+    delta = bytes([0x80, 0x80, 0x04, 0x80, 0x80, 0x04, 0x80])
+    assert impl.apply_delta(base, delta) == base
+
+
+COMMITS = [
+    b"",
+    b"tree 123456\nparent abc123\nauthor A <a@a> 1 +0000\n\nmessage\nkey x",
+    b"tree 123456\nparent\nauthor Test user <test@test.com> 1800 +0000\n",
+    b"tree t\ngpgsig -----BEGIN-----\n line two\n -----END-----\n\nmsg",
+    b"tree t\nencoding latin-1\nauthor \xe9\xe9 <a@a> 1 +0000\n\nbody \xe9",
+    b"tree t\n\n",
+    b"no-newline-at-all value",
+    "tree t\nauthor Zoë <z@z> 1 +0100\n\n".encode(),
+]
+
+
+@pytest.mark.parametrize("content", COMMITS)
+def test_commit_headers(impl, content):
+    expected = pykernels.parse_commit_content(content)
+    assert impl.parse_commit_content(content) == expected
+    assert impl.parse_commit_content(memoryview(content)) == expected
+
+
+def test_commit_headers_of_real_commits(impl, git_repo):
+    shas = run_git(git_repo, "rev-list", "--all").split()
+    with ObjectDatabase.open(git_repo / ".git") as odb:
+        for sha in shas:
+            content = odb.read_object(sha).content
+            parsed = impl.parse_commit_content(content)
+            assert parsed == pykernels.parse_commit_content(bytes(content))
+            assert parsed["tree"][0] == run_git(
+                git_repo, "rev-parse", f"{sha}^{{tree}}").strip()
+
+
+def test_inflated_views(impl):
+    body = zlib.decompress(zlib.compress(b"tree t\nparent p\n\nmsg"))
+    assert impl.parse_commit_content(memoryview(body)[:16]) == \
+        {"tree": ["t"], "parent": ["p"]}
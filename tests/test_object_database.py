@@ -0,0 +1,76 @@
+from unittest.mock import patch
+
+import pytest
+
+from guardian.object_database import ObjectDatabase, read_alternates
+from guardian.object_scanner import PackDirectory
+from tests.conftest import run_git
+
+
+def all_objects(repo):
+    out = run_git(
+        repo, "cat-file", "--batch-all-objects",
+        "--batch-check=%(objectname) %(objecttype) %(objectsize)",
+    )
+    return [line.split() for line in out.splitlines()]
+
+
+def commit_file(repo, name):
+    (repo / name).write_text(f"{name}\n")
+    run_git(repo, "add", name)
+    run_git(repo, "commit", "-q", "-m", name)
+
+
+def test_reads_loose_and_packed_objects(packed_repo):
+    commit_file(packed_repo, "loose.txt")
+    with ObjectDatabase.open(packed_repo / ".git") as odb:
+        assert odb.loose_objects()
+        for sha, obj_type, size in all_objects(packed_repo):
+            assert sha in odb
+            obj = odb.read_object(sha)
+            assert (obj.sha, obj.obj_type, obj.size) == (sha, obj_type, int(size))
+            assert odb.object_info(sha) == (obj_type, int(size))
+
+
+def test_missing_object(packed_repo):
+    with ObjectDatabase.open(packed_repo / ".git") as odb:
+        assert "00" * 20 not in odb
+        with pytest.raises(ValueError, match="not found"):
+            odb.read_object("00" * 20)
+
+
+def test_negative_cache_skips_pack_probes(packed_repo):
+    with ObjectDatabase.open(packed_repo / ".git") as odb, \
+         patch.object(PackDirectory, "find", return_value=None) as mock_find:
+        for _ in range(5):
+            assert odb.locate("00" * 20) is None
+        assert mock_find.call_count == 1
+
+
+def test_refreshes_when_packs_change(packed_repo):
+    with ObjectDatabase.open(packed_repo / ".git") as odb:
+        assert len(odb.pack_paths) == 1
+        commit_file(packed_repo, "new.txt")
+        head = run_git(packed_repo, "rev-parse", "HEAD").strip()
+        assert head in odb  # still loose
+        run_git(packed_repo, "repack", "-d", "-q")
+        run_git(packed_repo, "prune-packed")
+        assert odb.read_object(head).obj_type == "commit"
+        assert len(odb.pack_paths) == 2
+
+
+def test_alternates(packed_repo, tmp_path):
+    clone = tmp_path / "clone"
+    run_git(tmp_path, "clone", "-q", "--shared", str(packed_repo), str(clone))
+    commit_file(clone, "only-in-clone.txt")
+    objects_dir = clone / ".git" / "objects"
+    assert read_alternates(objects_dir) == [
+        (packed_repo / ".git" / "objects").resolve()
+    ]
+    with ObjectDatabase.open(clone / ".git") as odb:
+        assert len(odb.alternates) == 1
+        assert not odb.pack_paths
+        for sha, _, _ in all_objects(clone):
+            assert odb.read_object(sha).sha == sha
+        shas = {obj.sha for obj in odb.iter_objects(lazy=True)}
+        assert shas == {sha for sha, _, _ in all_objects(clone)}
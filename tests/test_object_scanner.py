@@ -1,8 +1,11 @@
 from guardian import object_scanner
+import pickle
 import pytest
 from pathlib import Path
 import tempfile
 import zlib
+from tests.conftest import run_git
+from unittest.mock import patch
 
 OBJECT_DIR_PATH = Path("features/corrupt-blob.git/objects/1d")
 
@@ -66,3 +69,101 @@ def test_hash_mismatch():
 
         with pytest.raises(ValueError, match="SHA mismatch"):
             object_scanner.read_loose(hash_mismatch_dir)
+
+
+def test_iter_repository_objects_loose_and_packed(git_repo):
+    git_dir = git_repo / ".git"
+    run_git(git_repo, "gc", "-q")
+    (git_repo / "late.txt").write_text("added after gc\n")
+    run_git(git_repo, "add", "late.txt")
+    run_git(git_repo, "commit", "-q", "-m", "late commit")
+
+    commits = list(
+        object_scanner.iter_repository_objects(git_dir, types={"commit"})
+    )
+    assert len(commits) == 13
+    assert all(obj.obj_type == "commit" for obj in commits)
+    head = run_git(git_repo, "rev-parse", "HEAD").strip()
+    assert head in {obj.sha for obj in commits}
+
+
+def test_iter_loose_objects_reads_every_object(git_repo):
+    git_dir = git_repo / ".git"
+    count = int(run_git(git_repo, "count-objects").split()[0])
+    objects = list(object_scanner.iter_loose_objects(git_dir, workers=4))
+    assert len(objects) == count
+    assert len({obj.sha for obj in objects}) == count
+    commits = list(
+        object_scanner.iter_loose_objects(git_dir, types={"commit"})
+    )
+    assert len(commits) == 12
+
+
+def test_scan_loose_objects_errors(tmp_path):
+    good_dir = tmp_path / "objects" / "aa"
+    good_dir.mkdir(parents=True)
+    bad = good_dir / ("0" * 38)
+    bad.write_bytes(zlib.compress(b"blob 3\0foo"))
+
+    assert list(object_scanner.scan_loose_objects([bad], workers=2)) == []
+    with pytest.raises(ValueError, match="SHA mismatch"):
+        list(object_scanner.scan_loose_objects([bad], skip_errors=False))
+
+
+def test_git_object_is_compact():
+    obj = object_scanner.GitObject("blob", "ab" * 20, 3, b"foo")
+    assert not hasattr(obj, "__dict__")
+    assert obj.binsha == bytes.fromhex("ab" * 20)
+    assert obj.type_id == 3
+    assert obj.obj_type == "blob"
+    assert obj.sha == "ab" * 20
+    with pytest.raises(ValueError, match="Unknown object obj_type"):
+        object_scanner.GitObject("unknown", "ab" * 20, 3, b"foo")
+
+
+def test_git_object_lazy_content():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return b"lazy body"
+
+    obj = object_scanner.GitObject("blob", "ab" * 20, 9, loader=loader)
+    assert not obj.is_loaded
+    assert calls == []
+    assert obj.content == b"lazy body"
+    assert not obj.is_loaded  # not kept after loading
+    assert len(calls) == 1
+
+
+def test_lazy_loose_objects_read_headers_only(git_repo):
+    git_dir = git_repo / ".git"
+    eager = {o.sha: o for o in object_scanner.iter_loose_objects(git_dir)}
+    with patch(
+        "guardian.object_scanner.read_loose_file",
+        wraps=object_scanner.read_loose_file,
+    ) as mock_read:
+        lazy = list(object_scanner.iter_loose_objects(git_dir, lazy=True))
+        assert mock_read.call_count == 0
+        for obj in lazy:
+            assert obj == eager[obj.sha]
+        assert lazy[0].content == eager[lazy[0].sha].content
+        assert mock_read.call_count == 1
+
+
+def test_loose_body_is_a_view_of_the_inflated_buffer(git_repo):
+    path = next((git_repo / ".git" / "objects").glob("??/*"))
+    obj = object_scanner.read_loose_file(path)
+    assert isinstance(obj.content, memoryview) and obj.content.readonly
+    inflated = zlib.decompress(path.read_bytes())
+    assert obj.content.obj == inflated
+    assert obj.content == inflated[inflated.index(b"\0") + 1:]
+
+
+def test_git_object_pickles_views_as_bytes():
+    obj = object_scanner.GitObject(
+        "blob", "ab" * 20, 3, memoryview(b"xfoo")[1:]
+    )
+    copy = pickle.loads(pickle.dumps(obj))
+    assert copy == obj
+    assert copy.content == b"foo" and isinstance(copy.content, bytes)
@@ -1,33 +1,60 @@
-from guardian.object_scanner import GitObject, find_idx_path, read_packfile, \
-    get_object_offsets, read_single_object
+from guardian.object_scanner import GitObject, PackReader, find_idx_path, \
+    read_packfile, get_object_offsets, read_single_object, inflate_stream, \
+    apply_delta, DeltaBaseCache, PackIndex, OFS_DELTA, REF_DELTA, \
+    iter_packfile, TYPE_IDS, MultiPackIndex, PackDirectory, read_reverse_index
+from tests.conftest import make_varied_repo, run_git
+import gc
+import hashlib
+import os
+import struct
+import types
+import zlib
 import pytest
 from pathlib import Path
-from unittest.mock import patch, MagicMock, mock_open
+from unittest.mock import patch, MagicMock
 
 
 def test_read_packfile_with_mocks():
     fake_pack_path = MagicMock()
-    fake_idx_path = MagicMock()
+    fake_pack = MagicMock(spec=PackReader)
     fake_sha = "a" * 40
     fake_offset = 123
     fake_obj = GitObject("blob", fake_sha, 6, b"foobar")
+    fake_pack.extract_object.return_value = fake_obj
+    fake_pack.iter_entries.return_value = [(bytes.fromhex(fake_sha), fake_offset)]
 
-    m = mock_open(read_data=b"PACK")
-    with patch("guardian.object_scanner.Path.is_file", return_value=True), \
-         patch("guardian.object_scanner.open", m), \
-         patch(
-             "guardian.object_scanner.find_idx_path",
-             return_value=fake_idx_path), \
-         patch(
-             "guardian.object_scanner.get_object_offsets",
-             return_value={fake_sha: fake_offset}), \
-         patch(
-             "guardian.object_scanner.extract_object_at_offset",
-             return_value=fake_obj):
-        objs = read_packfile(fake_pack_path)
-        assert len(objs) == 1
-        assert objs[0].sha == fake_sha
-        assert objs[0].content == b"foobar"
+    objs = read_packfile(fake_pack_path, fake_pack)
+    assert len(objs) == 1
+    assert objs[0].sha == fake_sha
+    assert objs[0].content == b"foobar"
+    fake_pack.extract_object.assert_called_once_with(fake_offset)
+
+
+def test_pack_reader_header(packfile):
+    with PackReader(packfile) as pack:
+        assert pack.version == 2
+        assert pack.object_count == len(get_object_offsets(
+            find_idx_path(packfile)))
+
+
+def test_pack_reader_rejects_non_pack(tmp_path):
+    bogus = tmp_path / "bogus.pack"
+    bogus.write_bytes(b"NOPE" + b"\0" * 8)
+    with pytest.raises(ValueError, match="Not a valid packfile"):
+        PackReader(bogus)
+
+
+def test_read_packfile_opens_pack_once(packfile):
+    with patch(
+        "guardian.object_scanner.open", side_effect=open
+    ) as mock_file_open:
+        objs = read_packfile(packfile)
+    pack_opens = [
+        c for c in mock_file_open.call_args_list if c.args[0] == packfile
+    ]
+    assert len(pack_opens) == 1
+    commits = [obj for obj in objs if obj.obj_type == "commit"]
+    assert len(commits) == 12
 
 
 def test_find_idx_path_exists():
@@ -47,58 +74,480 @@ def test_find_idx_path_not_exists():
             find_idx_path(fake_pack)
 
 
-# TODO: rewrite this...
-def test_get_object_offsets_valid_idx():
-    fake_idx_path = MagicMock()
-    fake_sha = b"\xaa" * 20
-    fake_offset = 123
-    fanout = (0,) * 255 + (1,)
-    data = (
+def make_idx(shas, offsets, large_offsets=()):
+    """Build a minimal idx v2 for sorted binary shas"""
+    fanout = [sum(1 for sha in shas if sha[0] <= i) for i in range(256)]
+    return (
         b"\xff\x74\x4f\x63" +
         (2).to_bytes(4, "big") +
         b"".join((i).to_bytes(4, "big") for i in fanout) +
-        fake_sha +
-        (0).to_bytes(4, "big") +
-        (fake_offset).to_bytes(4, "big")
+        b"".join(shas) +
+        b"\0\0\0\0" * len(shas) +
+        b"".join((o).to_bytes(4, "big") for o in offsets) +
+        b"".join((o).to_bytes(8, "big") for o in large_offsets) +
+        b"\0" * 40
     )
-    m = mock_open(read_data=data)
-    with patch("builtins.open", m):
-        offsets = get_object_offsets(fake_idx_path)
-        assert list(offsets.keys())[0] == fake_sha.hex()
 
 
-def test_get_object_offsets_invalid_header():
-    fake_idx_path = MagicMock()
-    m = mock_open(read_data=b"BAD!")
-    with patch("builtins.open", m):
-        with pytest.raises(ValueError, match="Invalid index file header"):
-            get_object_offsets(fake_idx_path)
+def test_get_object_offsets_valid_idx(tmp_path):
+    fake_idx_path = tmp_path / "pack-fake.idx"
+    fake_sha = b"\xaa" * 20
+    fake_offset = 123
+    fake_idx_path.write_bytes(make_idx([fake_sha], [fake_offset]))
+    offsets = get_object_offsets(fake_idx_path)
+    assert list(offsets.keys())[0] == fake_sha.hex()
+    assert offsets[fake_sha.hex()] == fake_offset
 
 
-def test_read_single_object_success():
-    fake_pack_path = MagicMock()
-    fake_idx_path = MagicMock()
+def test_get_object_offsets_invalid_header(tmp_path):
+    fake_idx_path = tmp_path / "pack-fake.idx"
+    fake_idx_path.write_bytes(b"BAD!")
+    with pytest.raises(ValueError, match="Invalid index file header"):
+        get_object_offsets(fake_idx_path)
+
+
+def test_pack_index_binary_search(packfile):
+    expected = get_object_offsets(find_idx_path(packfile))
+    with PackIndex(find_idx_path(packfile)) as index:
+        assert len(index) == len(expected)
+        for sha, offset in expected.items():
+            assert index.find_offset(sha) == offset
+            assert index.find_offset(bytes.fromhex(sha)) == offset
+        assert index.find_offset("00" * 20) is None
+        assert "ff" * 20 not in index
+
+
+def test_read_single_object_success(packfile):
+    offsets = get_object_offsets(find_idx_path(packfile))
+    with PackReader(packfile) as pack:
+        for sha in offsets:
+            obj = read_single_object(packfile, sha, pack)
+            assert obj.sha == sha
+    obj = read_single_object(packfile, sha)
+    assert obj.sha == sha
+
+
+def test_read_single_object_reuses_index(packfile):
+    sha = next(iter(get_object_offsets(find_idx_path(packfile))))
+    with PackReader(packfile) as pack, \
+         patch("guardian.object_scanner.PackIndex",
+               wraps=PackIndex) as mock_index:
+        read_single_object(packfile, sha, pack)
+        read_single_object(packfile, sha, pack)
+        assert mock_index.call_count == 1
+
+
+def test_read_single_object_not_found(packfile):
     fake_sha = "a" * 40
-    fake_offset = 123
-    fake_obj = GitObject("blob", fake_sha, 6, b"foobar")
+    with pytest.raises(ValueError, match="Object with SHA"):
+        read_single_object(packfile, fake_sha)
+
+
+def test_inflate_stream_reports_consumed_bytes():
+    payload = b"hello inflate " * 50
+    compressed = zlib.compress(payload)
+    buffer = b"junk" + compressed + b"next entry"
+    data, consumed = inflate_stream(buffer, 4, len(payload))
+    assert data == payload
+    assert consumed == len(compressed)
+
+
+def test_inflate_stream_large_object_over_many_chunks():
+    payload = os.urandom(300 * 1024)
+    compressed = zlib.compress(payload)
+    data, consumed = inflate_stream(compressed + b"tail", 0, len(payload))
+    assert data == payload
+    assert consumed == len(compressed)
+    assert isinstance(data, memoryview) and data.readonly
+
+
+def test_inflate_stream_large_object_size_mismatch():
+    compressed = zlib.compress(os.urandom(300 * 1024))
+    with pytest.raises(ValueError, match="Size mismatch"):
+        inflate_stream(compressed, 0, 200 * 1024)
+    with pytest.raises(ValueError, match="Size mismatch"):
+        inflate_stream(compressed, 0, 400 * 1024)
+
+
+def test_inflate_stream_truncated():
+    compressed = zlib.compress(b"a" * 1000)
+    with pytest.raises(ValueError, match="Failed to decompress"):
+        inflate_stream(compressed[:-6], 0, 1000)
+
+
+def test_inflate_stream_size_mismatch():
+    compressed = zlib.compress(b"abc")
+    with pytest.raises(ValueError, match="Size mismatch"):
+        inflate_stream(compressed, 0, 4)
+
+
+def test_pack_reader_closes_after_inflating(packfile):
+    pack = PackReader(packfile)
+    offsets = get_object_offsets(find_idx_path(packfile))
+    for offset in offsets.values():
+        pack.extract_object(offset)
+    pack.close()
+
+
+def test_extract_resolves_deltas(packfile):
+    offsets = get_object_offsets(find_idx_path(packfile))
+    with PackReader(packfile) as pack:
+        delta_entries = [
+            offset for offset in offsets.values()
+            if pack.read_header(offset)[0] in (OFS_DELTA, REF_DELTA)
+        ]
+        assert delta_entries
+        for sha, offset in offsets.items():
+            obj = pack.extract_object(offset)
+            assert obj.sha == sha
+            assert obj.obj_type in ("commit", "tree", "blob", "tag")
+
+
+def test_extract_resolves_ref_deltas(packed_repo):
+    run_git(
+        packed_repo, "-c", "repack.useDeltaBaseOffset=false",
+        "repack", "-a", "-d", "-f", "-q", "--depth=50", "--window=50",
+    )
+    packfile = next((packed_repo / ".git/objects/pack").glob("*.pack"))
+    offsets = get_object_offsets(find_idx_path(packfile))
+    with PackReader(packfile) as pack:
+        types = {pack.read_header(o)[0] for o in offsets.values()}
+        assert REF_DELTA in types
+        for sha, offset in offsets.items():
+            assert pack.extract_object(offset).sha == sha
+
+
+def test_apply_delta_copy_and_insert():
+    base = b"0123456789abcdef"
+    delta = bytes([
+        16, 11,                 # source size, target size
+        0x80 | 0x01 | 0x10, 10, 6,  # copy 6 bytes from offset 10
+        5, *b"-xyz-",           # insert 5 literal bytes
+    ])
+    result = apply_delta(base, delta)
+    assert result == b"abcdef-xyz-"
+    assert isinstance(result, memoryview) and result.readonly
+    assert apply_delta(memoryview(base), memoryview(delta)) == result
+
+
+def test_apply_delta_rejects_bad_sizes():
+    with pytest.raises(ValueError, match="Delta size mismatch"):
+        apply_delta(b"abcd", bytes([4, 2, 3, *b"xyz"]))
+    with pytest.raises(ValueError, match="Delta size mismatch"):
+        apply_delta(b"abcd", bytes([4, 5, 3, *b"xyz"]))
+    with pytest.raises(ValueError, match="Truncated delta insert"):
+        apply_delta(b"abcd", bytes([4, 3, 3, *b"xy"]))
+
+
+def test_apply_delta_rejects_wrong_base():
+    with pytest.raises(ValueError, match="Delta base size mismatch"):
+        apply_delta(b"abc", bytes([4, 1, 1, 0x41]))
+
+
+def test_delta_base_cache_is_bounded():
+    cache = DeltaBaseCache(limit=10)
+    cache.put(1, 3, b"aaaa")
+    cache.put(2, 3, b"bbbb")
+    assert cache.get(1) == (3, b"aaaa")  # 1 is now most recent
+    cache.put(3, 3, b"cccc")
+    assert cache.get(2) is None
+    assert cache.get(1) is not None
+    assert cache.size <= 10
+    cache.put(4, 3, b"x" * 11)  # larger than the whole cache
+    assert cache.get(4) is None
+
+
+def test_pack_index_large_offsets(tmp_path):
+    fake_idx_path = tmp_path / "pack-fake.idx"
+    shas = [b"\x01" * 20, b"\x02" * 20]
+    large = 5 * 2**30
+    fake_idx_path.write_bytes(
+        make_idx(shas, [12, 0x80000000 | 0], large_offsets=[large])
+    )
+    with PackIndex(fake_idx_path) as index:
+        assert index.find_offset(shas[0]) == 12
+        assert index.find_offset(shas[1]) == large
+
+
+def test_read_object_past_2gib_in_sparse_pack(tmp_path):
+    content = b"far away blob\n"
+    header = f"blob {len(content)}".encode() + b"\0"
+    sha = hashlib.sha1(header + content).digest()
+    offset = 2**31 + 4096
+    pack_path = tmp_path / "pack-big.pack"
+    with open(pack_path, "wb") as f:
+        f.write(b"PACK" + (2).to_bytes(4, "big") + (1).to_bytes(4, "big"))
+        f.seek(offset)
+        f.write(bytes([0x30 | len(content)]) + zlib.compress(content))
+        f.write(b"\0" * 20)
+    (tmp_path / "pack-big.idx").write_bytes(
+        make_idx([sha], [0x80000000], large_offsets=[offset])
+    )
+    with PackReader(pack_path) as pack:
+        obj = read_single_object(pack_path, sha.hex(), pack)
+    assert obj.content == content
+    assert obj.sha == sha.hex()
+
+
+def test_iter_packfile_streams_with_type_filter(packfile):
+    objects = iter_packfile(packfile, types={"commit"})
+    assert isinstance(objects, types.GeneratorType)
+    commits = list(objects)
+    assert len(commits) == 12
+    assert all(obj.obj_type == "commit" for obj in commits)
+    assert len(read_packfile(packfile)) == len(
+        get_object_offsets(find_idx_path(packfile)))
+
+
+def test_read_type_follows_delta_chains(packfile):
+    offsets = get_object_offsets(find_idx_path(packfile))
+    memo = {}
+    with PackReader(packfile) as pack:
+        for offset in offsets.values():
+            expected = TYPE_IDS[pack.extract_object(offset).obj_type]
+            assert pack.read_type(offset) == expected
+            assert pack.read_type(offset, memo) == expected
+    assert memo
+
+
+def test_commit_only_scan_skips_inflating_other_types(packfile):
     with patch(
-        "guardian.object_scanner.find_idx_path",
-        return_value=fake_idx_path), \
-        patch("guardian.object_scanner.get_object_offsets",
-              return_value={fake_sha: fake_offset}), \
-        patch("guardian.object_scanner.extract_object_at_offset",
-              return_value=fake_obj):
-        obj = read_single_object(fake_pack_path, fake_sha)
-        assert obj.sha == fake_sha
-        assert obj.content == b"foobar"
-
-
-def test_read_single_object_not_found():
-    fake_pack_path = MagicMock()
-    fake_idx_path = MagicMock()
-    fake_sha = "a" * 40
-    with patch("guardian.object_scanner.find_idx_path",
-               return_value=fake_idx_path), \
-         patch("guardian.object_scanner.get_object_offsets", return_value={}):
-        with pytest.raises(ValueError, match="Object with SHA"):
-            read_single_object(fake_pack_path, fake_sha)
+        "guardian.object_scanner.inflate_stream", wraps=inflate_stream
+    ) as mock_inflate:
+        commits = list(iter_packfile(packfile, types={"commit"}))
+    assert len(commits) == 12
+    assert mock_inflate.call_count == 12
+
+
+def test_lazy_iter_packfile_matches_eager(packfile):
+    eager = {obj.sha: obj for obj in iter_packfile(packfile)}
+    with PackReader(packfile) as pack, patch(
+        "guardian.object_scanner.apply_delta", wraps=apply_delta
+    ) as mock_apply:
+        lazy = list(iter_packfile(packfile, pack=pack, lazy=True))
+        assert mock_apply.call_count == 0
+        assert len(lazy) == len(eager)
+        for obj in lazy:
+            assert obj == eager[obj.sha]
+            assert not obj.is_loaded
+            assert obj.content == eager[obj.sha].content
+
+
+def test_object_info_of_huffman_coded_deltas(tmp_path):
+    repo = make_varied_repo(tmp_path / "repo")
+    packfile = next((repo / ".git/objects/pack").glob("*.pack"))
+    with PackReader(packfile) as pack:
+        slow_starts = 0
+        for _, offset in pack.iter_entries():
+            type_id, size, pos, _ = pack.read_entry(offset)
+            if type_id in (OFS_DELTA, REF_DELTA):
+                # the block header alone outgrows a short read
+                head = zlib.decompressobj().decompress(pack._map[pos:pos + 64])
+                slow_starts += len(head) < 2
+            content = pack.read_content(offset)
+            assert pack.object_info(offset) == \
+                (pack.read_type(offset), len(content))
+        assert slow_starts
+
+        lazy = list(iter_packfile(packfile, pack=pack, lazy=True))
+        assert len(lazy) == pack.object_count
+
+
+def all_objects(repo):
+    out = run_git(
+        repo, "cat-file", "--batch-all-objects", "--batch-check=%(objectname)"
+    )
+    return out.split()
+
+
+def add_pack(repo, name):
+    (repo / f"{name}.txt").write_text(f"{name} contents\n")
+    run_git(repo, "add", "-A")
+    run_git(repo, "commit", "-q", "-m", name)
+    run_git(repo, "repack", "-d", "-q")
+
+
+def test_multi_pack_index_lookup(packed_repo):
+    add_pack(packed_repo, "second")
+    run_git(packed_repo, "multi-pack-index", "write")
+    add_pack(packed_repo, "third")  # not covered by the midx
+    pack_dir = packed_repo / ".git/objects/pack"
+
+    with MultiPackIndex(pack_dir / "multi-pack-index") as midx:
+        assert len(midx.pack_names) == 2
+        for pack_name in midx.pack_names:
+            idx_offsets = get_object_offsets(
+                find_idx_path(pack_dir / pack_name))
+            for sha, offset in idx_offsets.items():
+                assert midx.find(sha) == (pack_name, offset)
+        assert midx.find("00" * 20) is None
+
+    with PackDirectory(pack_dir) as packs:
+        assert len(packs.uncovered) == 1
+        for sha in all_objects(packed_repo):
+            assert packs.read_object(sha).sha == sha
+        with pytest.raises(ValueError, match="not found in packfiles"):
+            packs.read_object("00" * 20)
+
+
+def make_midx(shas, offsets, large_offsets=()):
+    """A multi-pack-index over one pack, x.pack"""
+    chunks = [
+        (b"PNAM", b"x.idx\0\0\0\0"),
+        (b"OIDF", struct.pack(">256I", *[
+            sum(sha[0] <= i for sha in shas) for i in range(256)])),
+        (b"OIDL", b"".join(shas)),
+        (b"OOFF", b"".join(struct.pack(">II", 0, o) for o in offsets)),
+    ]
+    if large_offsets:
+        chunks.append((b"LOFF", struct.pack(
+            f">{len(large_offsets)}Q", *large_offsets)))
+    data = b"MIDX" + struct.pack(">BBBBI", 1, 1, len(chunks), 0, 1)
+    start = len(data) + 12 * (len(chunks) + 1)
+    for chunk_id, chunk in chunks:
+        data += struct.pack(">4sQ", chunk_id, start)
+        start += len(chunk)
+    data += struct.pack(">4sQ", b"\0" * 4, start)
+    return data + b"".join(chunk for _, chunk in chunks)
+
+
+def test_multi_pack_index_offsets_past_2gib(tmp_path):
+    shas = [bytes([i]) * 20 for i in (1, 2)]
+    midx_path = tmp_path / "multi-pack-index"
+    # no LOFF chunk: offsets below 4 GiB are stored with the top bit set
+    midx_path.write_bytes(make_midx(shas, [12, 0x90000000]))
+    with MultiPackIndex(midx_path) as midx:
+        assert midx.find(shas[0]) == ("x.pack", 12)
+        assert midx.find(shas[1]) == ("x.pack", 0x90000000)
+
+    midx_path.write_bytes(
+        make_midx(shas, [12, 0x80000000], large_offsets=[5 << 32]))
+    with MultiPackIndex(midx_path) as midx:
+        assert midx.find(shas[1]) == ("x.pack", 5 << 32)
+
+
+def test_pack_directory_without_midx(packed_repo):
+    add_pack(packed_repo, "second")
+    pack_dir = packed_repo / ".git/objects/pack"
+    with PackDirectory(pack_dir) as packs:
+        assert packs.midx is None
+        assert len(packs.uncovered) == 2
+        for sha in all_objects(packed_repo):
+            pack_path, offset = packs.find(sha)
+            assert packs.reader(pack_path).extract_object(offset).sha == sha
+
+
+def test_iter_entries_walks_pack_front_to_back(packfile):
+    with PackReader(packfile) as pack:
+        entries = list(pack.iter_entries())
+        assert [offset for _, offset in entries] == \
+            sorted(offset for _, offset in pack.index)
+        assert sorted(entries) == sorted(pack.index)
+
+
+def write_rev(rev_path, positions, pack_checksum):
+    data = b"RIDX" + struct.pack(">II", 1, 1)
+    data += struct.pack(f">{len(positions)}I", *positions) + pack_checksum
+    rev_path.write_bytes(data + hashlib.sha1(data).digest())
+
+
+def test_pack_order_uses_rev_file(packfile):
+    rev_path = packfile.with_suffix(".rev")
+    with PackReader(packfile) as pack:
+        assert read_reverse_index(rev_path, pack.index) is None
+        computed = list(pack.pack_order())
+        assert computed == sorted(range(len(pack.index)),
+                                  key=pack.index.offset_at)
+
+        # whatever a valid .rev says wins, so the file is really used
+        write_rev(rev_path, computed[::-1], pack.index.pack_checksum)
+        assert list(pack.pack_order()) == computed[::-1]
+
+        write_rev(rev_path, computed[::-1], b"\0" * 20)
+        assert read_reverse_index(rev_path, pack.index) is None
+        assert list(pack.pack_order()) == computed
+
+
+def test_corrupt_rev_file_is_ignored(packfile):
+    rev_path = packfile.with_suffix(".rev")
+    with PackReader(packfile) as pack:
+        computed = list(pack.pack_order())
+        checksum = pack.index.pack_checksum
+
+        write_rev(rev_path, computed[::-1], checksum)
+        data = bytearray(rev_path.read_bytes())
+        data[12] ^= 0xff  # the trailer no longer matches
+        rev_path.write_bytes(bytes(data))
+        assert read_reverse_index(rev_path, pack.index) is None
+
+        out_of_range = computed[:-1] + [len(computed)]
+        write_rev(rev_path, out_of_range, checksum)
+        assert read_reverse_index(rev_path, pack.index) is None
+        assert list(pack.pack_order()) == computed
+
+
+def test_failed_scans_stop_hinting_sequential_reads(packfile):
+    with PackReader(packfile) as pack, \
+         patch.object(PackReader, "advise") as mock_advise, \
+         patch.object(PackReader, "extract_object",
+                      side_effect=ValueError("corrupt")):
+        with pytest.raises(ValueError):
+            list(iter_packfile(packfile, pack=pack, skip_errors=False))
+        assert mock_advise.call_args.kwargs == {"sequential": False}
+        gc.collect()  # finalize the scan here, not in a later test
+
+
+def test_iter_packfile_hints_sequential_reads(packfile):
+    with PackReader(packfile) as pack, \
+         patch.object(PackReader, "advise") as mock_advise:
+        objs = list(iter_packfile(packfile, pack=pack))
+    assert objs
+    assert [c.kwargs for c in mock_advise.call_args_list] == [
+        {"sequential": True}, {"sequential": False}]
+
+
+
+def test_parallel_iter_packfile_matches_serial(packfile):
+    serial = list(iter_packfile(packfile))
+    parallel = list(iter_packfile(packfile, jobs=2))
+    assert [obj.sha for obj in parallel] == [obj.sha for obj in serial]
+    assert [obj.content for obj in parallel] == [obj.content for obj in serial]
+    assert [obj.type_id for obj in parallel] == [obj.type_id for obj in serial]
+
+    commits = list(iter_packfile(packfile, types={"commit"}, jobs=3))
+    assert commits == list(iter_packfile(packfile, types={"commit"}))
+
+
+def test_parallel_lazy_objects_load_in_parent(packfile):
+    eager = {obj.sha: obj.content for obj in iter_packfile(packfile)}
+    with PackReader(packfile) as pack:
+        lazy = list(iter_packfile(packfile, pack=pack, lazy=True, jobs=2))
+        assert len(lazy) == len(eager)
+        for obj in lazy:
+            assert not obj.is_loaded
+            assert obj.content == eager[obj.sha]
+
+
+def test_parallel_iter_packfile_without_content(packfile):
+    serial = list(iter_packfile(packfile))
+    for jobs in (None, 2):
+        bare = list(iter_packfile(packfile, jobs=jobs, content=False))
+        assert bare == serial
+        assert not any(obj.is_loaded for obj in bare)
+
+
+def test_parallel_iter_packfile_raises_worker_errors(packfile, tmp_path):
+    with PackReader(packfile) as pack:
+        _, offset = list(pack.iter_entries())[-1]
+        _, _, data_pos, _ = pack.read_entry(offset)
+    broken = tmp_path / packfile.name
+    data = bytearray(packfile.read_bytes())
+    data[data_pos:data_pos + 4] = b"\xff" * 4
+    broken.write_bytes(bytes(data))
+    (tmp_path / find_idx_path(packfile).name).write_bytes(
+        find_idx_path(packfile).read_bytes())
+
+    with pytest.raises(ValueError, match="Failed to decompress object data"):
+        list(iter_packfile(broken, jobs=2, skip_errors=False))
+    assert len(list(iter_packfile(broken, jobs=2))) == \
+        len(list(iter_packfile(packfile))) - 1
@@ -0,0 +1,172 @@
+import threading
+import zlib
+from unittest.mock import patch
+
+import pytest
+from typer.testing import CliRunner
+
+from guardian import pipeline
+from guardian.cli import app
+from guardian.object_database import ObjectDatabase
+from guardian.object_scanner import (
+    OFS_DELTA,
+    REF_DELTA,
+    PackReader,
+    iter_packfile,
+    read_loose_file,
+)
+from guardian.pipeline import (
+    _ByteBudget,
+    read_pack_entries,
+    staged,
+    verify_loose_objects,
+    verify_pack_objects,
+)
+from tests.test_integrity import flip_byte
+
+
+def test_pack_pipeline_matches_iter_packfile(packfile):
+    expected = list(iter_packfile(packfile))
+    with PackReader(packfile) as pack:
+        verified = list(verify_pack_objects(pack, workers=3))
+    assert [obj.sha for obj in verified] == [obj.sha for obj in expected]
+    assert [obj.type_id for obj in verified] == \
+        [obj.type_id for obj in expected]
+    assert [obj.content for obj in verified] == \
+        [obj.content for obj in expected]
+
+
+def test_deltas_come_from_the_staged_bytes(packfile):
+    with PackReader(packfile) as pack:
+        deltas = sorted(
+            offset for _, offset in pack.iter_entries()
+            if pack.read_header(offset)[0] in (OFS_DELTA, REF_DELTA)
+        )
+        with patch.object(
+            PackReader, "resolve_delta", autospec=True,
+            side_effect=PackReader.resolve_delta,
+        ) as mock_resolve:
+            verified = list(verify_pack_objects(pack, workers=2))
+    assert len(verified) == pack.object_count
+    assert sorted(c.args[1] for c in mock_resolve.call_args_list) == deltas
+
+
+def test_byte_budget_blocks_until_released():
+    budget = _ByteBudget(10)
+    budget.acquire(8)
+    waiter = threading.Thread(target=budget.acquire, args=(5,))
+    waiter.start()
+    waiter.join(0.1)
+    assert waiter.is_alive()
+    budget.release(8)
+    waiter.join(1)
+    assert not waiter.is_alive() and budget.used == 5
+
+    budget.release(5)
+    budget.acquire(50)  # too large for the budget, but goes alone
+    assert budget.used == 50
+
+
+def test_pack_pipeline_with_a_tiny_budget(packfile):
+    expected = [obj.sha for obj in iter_packfile(packfile)]
+    with patch.object(pipeline, "BYTES_IN_FLIGHT", 1), \
+         PackReader(packfile) as pack:
+        verified = list(verify_pack_objects(pack, workers=4))
+    assert [obj.sha for obj in verified] == expected
+
+
+def test_pack_entries_cover_the_pack(packfile):
+    data = packfile.read_bytes()
+    with PackReader(packfile) as pack:
+        for block_size in (64, 1 << 20):
+            entries = list(read_pack_entries(pack, block_size))
+            assert b"".join(raw for _, _, raw in entries) == data[12:-20]
+            assert [offset for _, offset, _ in entries] == sorted(
+                offset for _, offset, _ in entries)
+
+
+def test_pack_pipeline_reports_corrupt_objects(packfile, capsys):
+    with PackReader(packfile) as pack:
+        sha, offset = next(pack.iter_entries())
+        _, _, data_pos, _ = pack.read_entry(offset)
+        count = pack.object_count
+    flip_byte(packfile, data_pos + 4)
+
+    with PackReader(packfile) as pack:
+        verified = list(verify_pack_objects(pack, workers=2))
+        assert sha not in [obj.binsha for obj in verified]
+        assert len(verified) < count
+        assert f"Error! verifying obj {sha.hex()}" in capsys.readouterr().out
+        with pytest.raises(ValueError):
+            list(verify_pack_objects(pack, skip_errors=False))
+
+
+def test_pack_pipeline_reports_unreadable_packs(packfile, capsys):
+    data = packfile.read_bytes()
+    with PackReader(packfile) as pack:
+        entries = list(pack.iter_entries())
+    # cut the pack after the third entry: the first three still verify
+    packfile.write_bytes(data[:entries[3][1]] + data[-20:])
+    with PackReader(packfile) as pack:
+        verified = list(verify_pack_objects(pack, workers=2))
+        assert [obj.binsha for obj in verified] == \
+            [sha for sha, _ in entries[:3]]
+        assert f"Error! reading packfile {packfile}: Packfile is truncated" \
+            in capsys.readouterr().out
+        with pytest.raises(ValueError, match="truncated"):
+            list(verify_pack_objects(pack, skip_errors=False))
+
+    packfile.with_suffix(".idx").unlink()
+    with PackReader(packfile) as pack:
+        assert list(verify_pack_objects(pack)) == []
+    assert "Index file not found" in capsys.readouterr().out
+
+
+def test_loose_pipeline(git_repo, tmp_path):
+    with ObjectDatabase.open(git_repo / ".git") as odb:
+        paths = sorted(odb.loose_objects())
+    verified = list(verify_loose_objects(paths, workers=4))
+    assert verified == [read_loose_file(path) for path in paths]
+
+    bad = tmp_path / "aa" / ("0" * 38)
+    bad.parent.mkdir()
+    bad.write_bytes(zlib.compress(b"blob 3\0foo"))
+    assert list(verify_loose_objects([bad])) == []
+    with pytest.raises(ValueError, match="SHA mismatch"):
+        list(verify_loose_objects([bad], skip_errors=False))
+
+
+def test_staged_reraises_and_stops_producer():
+    def failing():
+        yield 1
+        raise OSError("disk gone")
+
+    with pytest.raises(OSError, match="disk gone"):
+        list(staged(failing()))
+
+    before = threading.active_count()
+    items = staged(iter(range(10_000)), depth=4)
+    assert next(items) == 0
+    items.close()
+    assert threading.active_count() == before
+
+
+def test_scan_verify_sha(packed_repo, packfile):
+    runner = CliRunner()
+    result = runner.invoke(app, ["scan", str(packed_repo), "--verify", "sha"])
+    assert result.exit_code == 0
+    assert "p: t=commit" in result.stdout
+
+    with PackReader(packfile) as pack:
+        _, offset = next(pack.iter_entries())
+        _, _, data_pos, _ = pack.read_entry(offset)
+    flip_byte(packfile, data_pos + 4)
+    result = runner.invoke(app, ["scan", str(packed_repo), "--verify", "sha"])
+    assert result.exit_code == 1
+    assert "failed verification" in result.stdout
+
+    packfile.with_suffix(".idx").unlink()
+    result = runner.invoke(app, ["scan", str(packed_repo), "--verify", "sha"])
+    assert result.exit_code == 1
+    assert result.exception is None or isinstance(result.exception, SystemExit)
+    assert "Index file not found" in result.stdout
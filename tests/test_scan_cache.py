@@ -0,0 +1,159 @@
+import os
+from unittest.mock import patch
+
+from typer.testing import CliRunner
+
+from guardian import cli, dag_builder
+from guardian.cli import app
+from guardian.dag_builder import build_dag_from_git_commits
+from guardian.object_database import ObjectDatabase
+from guardian.object_scanner import PackReader
+from guardian.scan_cache import ScanCache
+from tests.conftest import corrupt_loose_object, corrupt_packed_object, run_git
+
+
+def commit_file(repo, name):
+    (repo / name).write_text(f"{name}\n")
+    run_git(repo, "add", name)
+    run_git(repo, "commit", "-q", "-m", name)
+
+
+def cached_dag(repo):
+    git_dir = repo / ".git"
+    with ObjectDatabase.open(git_dir) as odb, ScanCache.open(git_dir) as cache:
+        return build_dag_from_git_commits(git_dir, odb, cache)
+
+
+def test_pack_objects_round_trip(packfile, packed_repo):
+    with ScanCache.open(packed_repo / ".git") as cache:
+        assert cache.path == packed_repo / ".git" / "guardian" / "scan-cache.sqlite"
+        assert cache.pack_objects(packfile) is None
+        cache.store_pack_objects(packfile, [(b"\1" * 20, 3, 10)])
+        assert cache.pack_objects(packfile) == [(b"\1" * 20, 3, 10)]
+        cache.store_pack_problems(packfile, ["bad"])
+
+    with ScanCache.open(packed_repo / ".git") as cache:
+        assert cache.pack_problems(packfile) == ["bad"]
+        stat = packfile.stat()
+        os.utime(packfile, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert cache.pack_objects(packfile) is None
+        assert cache.pack_problems(packfile) is None
+
+
+def test_dag_reuses_cached_packs_and_loose_objects(packed_repo):
+    commit_file(packed_repo, "loose.txt")
+    expected = build_dag_from_git_commits(packed_repo)
+    dag = cached_dag(packed_repo)
+    assert set(dag.edges()) == set(expected.edges())
+    assert dag.nodes == expected.nodes
+
+    with patch.object(dag_builder, "iter_packfile") as mock_iter, \
+         patch.object(dag_builder, "scan_loose_objects",
+                      wraps=dag_builder.scan_loose_objects) as mock_loose:
+        again = cached_dag(packed_repo)
+    mock_iter.assert_not_called()
+    assert mock_loose.call_args.args[0] == []
+    assert set(again.edges()) == set(expected.edges())
+    assert dict(again.nodes(data=True)) == dict(dag.nodes(data=True))
+
+
+def test_dag_picks_up_new_objects_and_repacks(packed_repo):
+    cached_dag(packed_repo)
+    commit_file(packed_repo, "new.txt")
+    assert cached_dag(packed_repo).number_of_nodes() == 13
+
+    run_git(packed_repo, "repack", "-a", "-d", "-q")
+    run_git(packed_repo, "prune-packed")
+    dag = cached_dag(packed_repo)
+    assert dag.number_of_nodes() == 13
+    with ScanCache.open(packed_repo / ".git") as cache:
+        assert cache.loose_manifest() == {}
+
+
+def test_dag_cache_reports_pack_without_idx(
+    packed_repo, packfile, capsys, monkeypatch
+):
+    packfile.with_suffix(".idx").unlink()
+    assert cached_dag(packed_repo).number_of_nodes() == 0
+    assert "Error reading packfile" in capsys.readouterr().out
+
+    monkeypatch.chdir(packed_repo)
+    result = CliRunner().invoke(app, ["build-dag", str(packed_repo)])
+    assert not isinstance(result.exception, ValueError), result.output
+
+
+def test_dag_cache_skips_packs_read_partly(packed_repo, packfile, capsys):
+    with PackReader(packfile) as pack:
+        _, bad_offset = next(pack.iter_entries())
+    object_info = PackReader.object_info
+
+    def flaky(self, offset, memo=None):
+        if offset == bad_offset:
+            raise ValueError("corrupt entry")
+        return object_info(self, offset, memo)
+
+    with patch.object(PackReader, "object_info", flaky):
+        cached_dag(packed_repo)
+    assert "corrupt entry" in capsys.readouterr().out
+    with ScanCache.open(packed_repo / ".git") as cache:
+        assert cache.pack_commits(packfile) is None
+
+    assert cached_dag(packed_repo).number_of_nodes() == 12
+    with ScanCache.open(packed_repo / ".git") as cache:
+        assert len(cache.pack_commits(packfile)) == 12
+
+
+def test_scan_second_run_reads_nothing(packed_repo):
+    commit_file(packed_repo, "loose.txt")
+    runner = CliRunner()
+    first = runner.invoke(app, ["scan", str(packed_repo)])
+    assert first.exit_code == 0, first.output
+
+    with patch.object(cli, "iter_packfile") as mock_iter, \
+         patch.object(cli, "scan_loose_objects",
+                      wraps=cli.scan_loose_objects) as mock_loose:
+        second = runner.invoke(app, ["scan", str(packed_repo)])
+    mock_iter.assert_not_called()
+    assert mock_loose.call_args.args[0] == []
+    assert sorted(second.output.splitlines()) == sorted(first.output.splitlines())
+
+    with patch.object(cli, "iter_packfile", wraps=cli.iter_packfile) as mock_iter:
+        runner.invoke(app, ["scan", str(packed_repo), "--no-cache"])
+    mock_iter.assert_called_once()
+
+
+def test_scan_verify_fast_is_cached_on_request(packed_repo):
+    runner = CliRunner()
+    verify = ["scan", str(packed_repo), "--verify", "fast"]
+    result = runner.invoke(app, verify)
+    assert result.exit_code == 0
+    with patch.object(cli, "verify_pack_fast",
+                      wraps=cli.verify_pack_fast) as mock_verify:
+        result = runner.invoke(app, verify)
+    mock_verify.assert_called_once()
+    assert ": ok\n" in result.output
+
+    with patch.object(cli, "verify_pack_fast") as mock_verify:
+        result = runner.invoke(app, verify + ["--cached-verify"])
+    mock_verify.assert_not_called()
+    assert result.exit_code == 0
+    assert ": ok (cached)" in result.output
+
+
+def test_dag_cache_keeps_reading_past_corrupt_commits(packed_repo, packfile, capsys):
+    root = run_git(packed_repo, "rev-list", "--max-parents=0", "HEAD").strip()
+    corrupt_packed_object(packfile, root)
+    commit_file(packed_repo, "loose.txt")
+    loose = run_git(packed_repo, "rev-parse", "HEAD").strip()
+    corrupt_loose_object(packed_repo, loose)
+
+    dag = cached_dag(packed_repo)
+    out = capsys.readouterr().out
+    assert f"Error! reading commit {root}" in out
+    assert f"Error! reading commit {loose}" in out
+    assert dag.number_of_nodes() == 11
+    assert root not in dag and loose not in dag
+    # neither is cached, so both are read again next time
+    with ScanCache.open(packed_repo / ".git") as cache:
+        assert cache.pack_commits(packfile) is None
+        assert bytes.fromhex(loose) not in cache.loose_manifest()
@@ -1,7 +1,8 @@
 import pytest
 from pathlib import Path
 from unittest.mock import patch
-from guardian.utils import get_git_dir, find_loose_object_dirs, find_packfiles
+from guardian.utils import get_git_dir, find_loose_object_dirs, \
+    find_loose_objects, find_packfiles
 
 
 @pytest.fixture
@@ -50,3 +51,18 @@ def test_find_packfiles_empty(mock_git_dir):
         with patch.object(Path, "iterdir", return_value=[]):
             result = find_packfiles(mock_git_dir)
             assert result == []
+
+
+def test_find_loose_objects(tmp_path):
+    objects = tmp_path / "objects"
+    (objects / "ab").mkdir(parents=True)
+    (objects / "cd").mkdir()
+    (objects / "pack").mkdir()
+    (objects / "ab" / ("1" * 38)).write_bytes(b"")
+    (objects / "ab" / ("2" * 38)).write_bytes(b"")
+    (objects / "cd" / ("3" * 38)).write_bytes(b"")
+    (objects / "cd" / "tmp_obj_123").write_bytes(b"")
+    result = find_loose_objects(tmp_path)
+    assert sorted(p.parent.name + p.name for p in result) == [
+        "ab" + "1" * 38, "ab" + "2" * 38, "cd" + "3" * 38
+    ]